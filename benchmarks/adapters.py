@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: adapters.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+"""
+Throughput benchmark of the bank adapters on synthetic accounts and credit cards served in process.
+
+Every case retrieves the whole history of all accounts of a freshly built scenario, on max_workers threads like
+the service does when fetching concurrently, and reports the transactions per second, the requests made and the
+highest number of requests the backends served at once.
+
+Usage: python -m benchmarks.adapters --page-sizes 50,200 --latencies 0,0.05 --workers 1,4 --output results.json
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ynabintegrationslib.testing import SyncScenario
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''26-06-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''benchmarks.adapters'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+TRANSACTIONS = 10000
+ACCOUNTS = 4
+PAGE_SIZES = (50, 200)
+LATENCIES = (0.0, 0.02)
+WORKERS = (1, 4)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _integers(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def _count_transactions(account):
+    return sum(1 for _ in account.transactions)
+
+
+def run_case(kind, page_size, latency, workers, arguments):
+    """Times the retrieval of the whole history of all accounts of a kind.
+
+    Args:
+        kind (str): "account" for bank accounts or "card" for credit cards
+        page_size (int): The number of mutations in a page of the bank
+        latency (float): The seconds every request to the bank takes
+        workers (int): The number of accounts retrieved in parallel
+        arguments (argparse.Namespace): The transactions, accounts and localhost arguments
+
+    Returns:
+        result (dict): The throughput and the request counts of the case
+
+    """
+    accounts, cards = (arguments.accounts, 0) if kind == 'account' else (0, arguments.accounts)
+    with SyncScenario(transactions=arguments.transactions, accounts=accounts, cards=cards, page_size=page_size) \
+            as scenario:
+        backend = scenario.bank if kind == 'account' else scenario.ics
+        service = scenario.create_service(localhost=arguments.localhost)
+        backend.latency = latency
+        requests = backend.requests
+        backend.peak_concurrency = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            transactions = sum(executor.map(_count_transactions, service.accounts))
+        seconds = time.perf_counter() - start
+        return {'kind': kind,
+                'page_size': page_size,
+                'latency': latency,
+                'workers': workers,
+                'transactions': transactions,
+                'seconds': seconds,
+                'transactions_per_second': transactions / seconds if seconds else None,
+                'requests': backend.requests - requests,
+                'peak_concurrency': backend.peak_concurrency}
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--transactions', type=int, default=TRANSACTIONS, help='The total number of transactions')
+    parser.add_argument('--accounts', type=int, default=ACCOUNTS, help='The number of accounts of every kind')
+    parser.add_argument('--kinds', type=lambda value: value.split(','), default=['account', 'card'],
+                        help='Comma separated kinds of accounts, "account" and "card"')
+    parser.add_argument('--page-sizes', type=_integers, default=list(PAGE_SIZES),
+                        help='Comma separated page sizes of the bank accounts')
+    parser.add_argument('--latencies', type=lambda value: [float(item) for item in value.split(',') if item],
+                        default=list(LATENCIES), help='Comma separated latencies of the bank requests in seconds')
+    parser.add_argument('--workers', type=_integers, default=list(WORKERS),
+                        help='Comma separated numbers of accounts retrieved in parallel')
+    parser.add_argument('--localhost', action='store_true', help='Serve the banks on localhost instead of in process')
+    parser.add_argument('--output', help='The file to write the json results to, by default stdout')
+    args = parser.parse_args()
+    results = {'commit': _commit(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'localhost': args.localhost,
+               'results': []}
+    for kind in args.kinds:
+        # Credit cards are paged by period, the page size only applies to bank accounts.
+        for page_size in args.page_sizes if kind == 'account' else args.page_sizes[:1]:
+            for latency in args.latencies:
+                for workers in args.workers:
+                    case = run_case(kind, page_size, latency, workers, args)
+                    print(f'{kind:>8} page {page_size:>5} latency {latency:6.3f}s workers {workers:>3}: '
+                          f'{case["transactions_per_second"]:10.1f} tx/s {case["requests"]:>6} requests '
+                          f'peak {case["peak_concurrency"]}', file=sys.stderr)
+                    results['results'].append(case)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
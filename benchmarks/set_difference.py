@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: set_difference.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Microbenchmark of the set difference between bank and budget transactions.
+
+Compares the hashing through the Comparable interface, which evaluates the comparable attributes on every call,
+with the cached comparison keys of the transactions and the budget records.
+
+Usage: python -m benchmarks.set_difference --size 100000 --repeat 3
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import argparse
+import datetime
+import time
+from types import SimpleNamespace
+
+from abnamrolib import AccountTransaction
+from ynabinterfaceslib import Comparable
+from ynablib.ynablib import Transaction
+
+from ynabintegrationslib.adapters import AbnAmroAccountTransaction
+from ynabintegrationslib.lib import TransactionRecord, YnabServerTransaction
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''26-06-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+ACCOUNT = SimpleNamespace(id='account', budget=SimpleNamespace(id='budget'))
+EPOCH = datetime.datetime(2020, 1, 1)
+
+
+class ComparableAccountTransaction(AbnAmroAccountTransaction):
+    """Bank transaction hashed through the Comparable interface as before the comparison keys."""
+
+    __hash__ = Comparable.__hash__
+    __eq__ = Comparable.__eq__
+    __ne__ = Comparable.__ne__
+
+
+class ComparableServerTransaction(YnabServerTransaction):
+    """Budget transaction hashed through the Comparable interface as before the records."""
+
+    __hash__ = Comparable.__hash__
+    __eq__ = Comparable.__eq__
+    __ne__ = Comparable.__ne__
+
+
+def bank_data(size):
+    """Creates the data of the bank transactions, one per minute."""
+    return [{'amount': -(index % 5000) - 0.25,
+             'counterAccountName': f'Payee  {index % 300}',
+             'descriptionLines': [f'Description of transaction {index}'],
+             'transactionDate': int((EPOCH + datetime.timedelta(minutes=index)).timestamp() * 1000)}
+            for index in range(size)]
+
+
+def budget_data(bank_transactions):
+    """Creates the data of the budget transactions matching every other bank transaction."""
+    return [{'id': str(index),
+             'account_id': transaction.account_id,
+             'amount': transaction.amount,
+             'date': transaction.date,
+             'payee_name': transaction.payee_name,
+             'memo': transaction.memo}
+            for index, transaction in enumerate(bank_transactions) if not index % 2]
+
+
+def measure(bank_factory, budget_factory, repeat):
+    """Measures the best time of the set difference on freshly created transactions.
+
+    Args:
+        bank_factory (callable): Returns the bank transactions
+        budget_factory (callable): Returns the budget transactions
+        repeat (int): The number of measurements to take the best of
+
+    Returns:
+        (seconds, missing) (tuple): The best time in seconds and the number of transactions missing from the budget
+
+    """
+    timings = []
+    missing = None
+    for _ in range(repeat):
+        bank, budget = bank_factory(), budget_factory()
+        start = time.perf_counter()
+        missing = set(bank) - set(budget)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(missing)
+
+
+def main():
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--size', type=int, default=100000, help='The number of bank transactions')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of measurements to take the best of')
+    args = parser.parse_args()
+    bank_rows = [AccountTransaction(data) for data in bank_data(args.size)]
+    budget_rows = budget_data([AbnAmroAccountTransaction(row, ACCOUNT) for row in bank_rows])
+    before = measure(lambda: [ComparableAccountTransaction(row, ACCOUNT) for row in bank_rows],
+                     lambda: [ComparableServerTransaction(Transaction(None, row), None) for row in budget_rows],
+                     args.repeat)
+    after = measure(lambda: [AbnAmroAccountTransaction(row, ACCOUNT) for row in bank_rows],
+                    lambda: [TransactionRecord.from_data(row, ACCOUNT.budget.id) for row in budget_rows],
+                    args.repeat)
+    print(f'{args.size} bank transactions, {len(budget_rows)} in the budget')
+    for name, (seconds, missing) in (('comparable', before), ('comparison keys', after)):
+        print(f'{name:>16}: {seconds * 1000:9.1f} ms, {missing} missing')
+    print(f'{"speedup":>16}: {before[0] / after[0]:9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
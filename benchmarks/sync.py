@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: sync.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+End to end benchmark of the service on synthetic banks and budgets served in process.
+
+Every operation runs on a freshly built scenario and service, so the results do not depend on caches warmed by
+earlier operations. The building of the scenario is not timed. Results are written as json and can be compared
+with the results of another commit with --baseline.
+
+Usage: python -m benchmarks.sync --sizes 10,10000 --accounts 1,10 --output results.json
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+
+from ynabintegrationslib.testing import SyncScenario
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''26-06-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''benchmarks.sync'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+SIZES = (10, 10000, 1000000)
+ACCOUNTS = (1, 10, 50)
+
+
+def _all_bank_transactions(service):
+    return [transaction for account in service.accounts for transaction in account.transactions]
+
+
+OPERATIONS = {'get_latest_transactions': (lambda service: None,
+                                          lambda service, _: service.get_latest_transactions()),
+              'upload_latest_transactions': (lambda service: None,
+                                             lambda service, _: service.upload_latest_transactions()),
+              'upload_all_missing_transactions': (lambda service: None,
+                                                  lambda service, _: service.upload_all_missing_transactions()),
+              'upload_transactions': (_all_bank_transactions,
+                                      lambda service, transactions: service.upload_transactions(transactions))}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(operation, size, accounts, repeat, service_arguments):
+    """Times an operation on a scenario.
+
+    Args:
+        operation (str): The name of the operation
+        size (int): The number of bank transactions
+        accounts (int): The number of bank accounts
+        repeat (int): The number of runs
+        service_arguments (dict): Arguments of the services
+
+    Returns:
+        result (dict): The timings and the request counts of the case
+
+    """
+    prepare, execute = OPERATIONS[operation]
+    timings = []
+    requests = {}
+    for _ in range(repeat):
+        with SyncScenario(transactions=size, accounts=accounts) as scenario:
+            service = scenario.create_service(**service_arguments)
+            argument = prepare(service)
+            ynab_requests, bank_requests = scenario.ynab.requests, scenario.bank.requests
+            start = time.perf_counter()
+            execute(service, argument)
+            timings.append(time.perf_counter() - start)
+            requests = {'ynab': scenario.ynab.requests - ynab_requests,
+                        'bank': scenario.bank.requests - bank_requests}
+    return {'operation': operation,
+            'transactions': size,
+            'accounts': accounts,
+            'seconds': min(timings),
+            'runs': timings,
+            'requests': requests}
+
+
+def compare(results, baseline):
+    """Prints the change of every case against a baseline.
+
+    Args:
+        results (dict): The results of this run
+        baseline (dict): The results of an earlier run
+
+    """
+    previous = {(case['operation'], case['transactions'], case['accounts']): case['seconds']
+                for case in baseline.get('results', [])}
+    print(f'Compared with {baseline.get("commit")}:', file=sys.stderr)
+    for case in results['results']:
+        key = (case['operation'], case['transactions'], case['accounts'])
+        if key in previous:
+            change = case['seconds'] / previous[key] - 1 if previous[key] else 0.0
+            print(f'{key[0]:>32} {key[1]:>8} tx {key[2]:>3} accounts: {previous[key]:9.4f}s -> '
+                  f'{case["seconds"]:9.4f}s ({change:+.1%})', file=sys.stderr)
+
+
+def _integers(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--sizes', type=_integers, default=list(SIZES), help='Comma separated transaction counts')
+    parser.add_argument('--accounts', type=_integers, default=list(ACCOUNTS), help='Comma separated account counts')
+    parser.add_argument('--operations', type=lambda value: value.split(','), default=list(OPERATIONS),
+                        help='Comma separated operations to time')
+    parser.add_argument('--repeat', type=int, default=1, help='The number of runs of every case')
+    parser.add_argument('--streaming', action='store_true', help='Run the services in streaming mode')
+    parser.add_argument('--output', help='The file to write the json results to, by default stdout')
+    parser.add_argument('--baseline', help='A json results file to compare with')
+    args = parser.parse_args()
+    service_arguments = {'streaming': args.streaming}
+    results = {'commit': _commit(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'service': service_arguments,
+               'results': []}
+    for size in args.sizes:
+        for accounts in args.accounts:
+            for operation in args.operations:
+                case = run_case(operation, size, accounts, args.repeat, service_arguments)
+                print(f'{operation:>32} {size:>8} tx {accounts:>3} accounts: {case["seconds"]:9.4f}s',
+                      file=sys.stderr)
+                results['results'].append(case)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
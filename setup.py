@@ -33,11 +33,12 @@ setup(
     author='''Costas Tyfoxylos''',
     author_email='''costas.tyf@gmail.com''',
     url='''https://github.com/costastf/ynabintegrationslib''',
-    packages=find_packages(where='.', exclude=('tests', 'hooks', '_CI*')),
+    packages=find_packages(where='.', exclude=('tests', 'hooks', '_CI*', 'benchmarks*')),
     package_dir={'''ynabintegrationslib''':
                  '''ynabintegrationslib'''},
     include_package_data=True,
     install_requires=requirements,
+    entry_points={'console_scripts': ['ynab-integrations-sync = ynabintegrationslib.cli:main']},
     license='MIT',
     zip_safe=False,
     keywords='''ynabintegrationslib ynab abn amro rabobank''',
@@ -33,8 +33,48 @@ Tests for `ynabintegrationslib` module.
 
 """
 
+import asyncio
+import datetime
+import functools
+import json
+import os
+import pstats
+import tempfile
+import time
+import urllib.request
+from types import SimpleNamespace
+from unittest import TestCase
+
+from abnamrolib import AccountTransaction
 from betamax.fixtures import unittest
 
+from ynabintegrationslib import AsyncService
+from ynabintegrationslib.lib import (assign_occurrences,
+                                     MetricsRegistry,
+                                     RateLimiter,
+                                     TransactionCache,
+                                     TransactionRecord,
+                                     SqliteTransactionStore,
+                                     DbmTransactionStore,
+                                     Tracer,
+                                     NoopTracer,
+                                     InMemoryExporter,
+                                     JsonLinesExporter,
+                                     OpenTelemetryTracer,
+                                     CycleProfiler,
+                                     SyncDaemon,
+                                     ArrivalHistogram,
+                                     AdaptiveInterval)
+from ynabintegrationslib.adapters.abnamro import AbnAmroAccountTransaction
+from ynabintegrationslib.cli import create_daemon, main
+from ynabintegrationslib.lib.tracing import opentelemetry_trace
+from ynabintegrationslib.ynabintegrationslibexceptions import InvalidConfiguration, MissingDependency
+from ynabintegrationslib.testing import (FakeServer,
+                                         SyncScenario,
+                                         generate_mutations,
+                                         iban_for,
+                                         to_ynab_transactions)
+
 __author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
 __docformat__ = '''google'''
 __date__ = '''26-06-2019'''
@@ -63,3 +103,999 @@ class TestYnabintegrationslib(unittest.BetamaxTestCase):
         This is where you should tear down what you've setup in setUp before. This method is called after every test.
         """
         pass
+
+
+class TestServiceOnFakeYnab(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Serves the YNAB side of a synthetic scenario on localhost, the bank side stays in process.
+        """
+        self.scenario = SyncScenario(transactions=40, accounts=2, in_budget=0.5)
+        self.server = FakeServer(self.scenario.ynab).start()
+        self.rate_limiter = RateLimiter(capacity=1000, period=60, reserved=0)
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Stops the server and removes the files of the scenario.
+        """
+        self.server.stop()
+        self.scenario.close()
+
+    def _create_service(self, **kwargs):
+        return self.scenario.create_service(ynab_url=self.server.url, rate_limiter=self.rate_limiter, **kwargs)
+
+    def _budget_size(self):
+        return len(self.scenario.ynab.get_transactions(self.scenario.budget_id))
+
+    def test_upload_all_missing_transactions(self):
+        service = self._create_service()
+        result = service.upload_all_missing_transactions()
+        self.assertTrue(result.success)
+        self.assertEqual(self._budget_size(), 40)
+
+    def test_duplicate_import_ids_are_not_created(self):
+        self._create_service().upload_latest_transactions()
+        size = self._budget_size()
+        result = self._create_service(server_side_dedup=True).upload_latest_transactions()
+        self.assertTrue(result.success)
+        self.assertTrue(result.duplicates)
+        self.assertEqual(self._budget_size(), size)
+
+    def test_throttled_requests_are_retried(self):
+        self.scenario.ynab.retry_after = 0
+        self.scenario.ynab.throttle(2)
+        result = self._create_service().upload_all_missing_transactions()
+        self.assertTrue(result.success)
+        self.assertEqual(self.scenario.ynab.status_codes[429], 2)
+        self.assertEqual(self._budget_size(), 40)
+
+    def test_rate_limit_header_is_reported(self):
+        self.scenario.ynab.rate_limit = 500
+        self._create_service().get_latest_transactions()
+        self.assertLessEqual(self.rate_limiter.remaining, 500 - self.scenario.ynab.requests)
+
+    def test_budget_is_refreshed_with_server_knowledge(self):
+        service = self._create_service()
+        service.upload_latest_transactions()
+        service.upload_latest_transactions()
+        reads = [request for request in self.scenario.ynab.history
+                 if request.method == 'GET' and request.path.endswith('/transactions')]
+        self.assertNotIn('last_knowledge_of_server', reads[0].params)
+        self.assertIn('last_knowledge_of_server', reads[-1].params)
+
+    def test_budget_window_is_kept_for_delta_requests(self):
+        service = self._create_service()
+        dates = sorted(transaction['date'] for transaction in self.scenario.ynab.get_transactions(
+            self.scenario.budget_id))
+        oldest, middle, newest = dates[0], dates[len(dates) // 2], dates[-1]
+
+        def get_since(since_date):
+            transactions = service.get_transactions_for_budget(since_date=since_date)
+            self.assertTrue(all(transaction.date >= since_date for transaction in transactions))
+            self.assertEqual(len(transactions), len([date for date in dates if date >= since_date]))
+            request = [request for request in self.scenario.ynab.history
+                       if request.method == 'GET' and request.path.endswith('/transactions')][-1]
+            return request.params.get('since_date'), 'last_knowledge_of_server' in request.params
+
+        self.assertEqual(get_since(middle), (middle, False))
+        # Narrower windows are served from the wider local copy with delta requests.
+        self.assertEqual(get_since(newest), (middle, True))
+        self.assertEqual(get_since(middle), (middle, True))
+        self.scenario.ynab.add_transactions(self.scenario.budget_id,
+                                            [{'account_id': service.accounts[0].ynab_account.id,
+                                              'amount': -1000,
+                                              'date': newest}])
+        dates.append(newest)
+        self.assertEqual(get_since(newest), (middle, True))
+        # A wider window is retrieved from scratch.
+        self.assertEqual(get_since(oldest), (oldest, False))
+
+    def test_ynab_connections_are_reused_from_a_single_pool(self):
+        service = self._create_service()
+        for _ in range(3):
+            service.get_transactions_for_budget()
+        sessions = service.session_manager
+        self.assertGreater(sessions.requests, 3)
+        self.assertEqual(sessions.connections, 1)
+        self.assertAlmostEqual(sessions.reuse_rate, 1 - 1 / sessions.requests)
+
+    def test_injected_errors_fail_the_upload(self):
+        service = self._create_service()
+        transactions = service.get_all_latest_transactions()
+        self.scenario.ynab.error_rate = 1.0
+        result = service.upload_transactions(transactions)
+        self.assertFalse(result.success)
+        self.assertEqual(self._budget_size(), 20)
+
+    def test_a_failing_chunk_does_not_stop_the_others(self):
+        service = self._create_service(upload_chunk_size=6)
+        transactions = service.get_all_latest_transactions()
+        self.scenario.ynab.fail()
+        result = service.upload_transactions(transactions)
+        self.assertFalse(result)
+        self.assertEqual([chunk.size for chunk in result.chunks], [6] * 6 + [4])
+        self.assertEqual(len(result.failed), 1)
+        failed = result.failed[0]
+        self.assertIs(failed, result.chunks[0])
+        self.assertEqual((failed.budget_id, failed.status_code, failed.created), (self.scenario.budget_id, 503, 0))
+        self.assertTrue(all(chunk.success and chunk.status_code == 201 for chunk in result.chunks[1:]))
+        self.assertEqual(result.uploaded, 34)
+        self.assertEqual(result.created + result.duplicates, 34)
+        self.assertGreater(result.latency, 0)
+        self.assertEqual(result.report.counts['uploaded'], result.created)
+
+    def test_streaming_uploads_the_same_transactions(self):
+        uploads = []
+        for streaming in (False, True):
+            with SyncScenario(transactions=1200, accounts=3, cards=1, in_budget=0.25, page_size=50) as scenario:
+                service = scenario.create_service(streaming=streaming, upload_chunk_size=100)
+                result = service.upload_all_missing_transactions()
+                self.assertTrue(result.success)
+                self.assertTrue(all(chunk.size <= 100 for chunk in result.chunks))
+                uploads.append(sorted((transaction['account_id'], transaction['date'], transaction['import_id'])
+                                      for transaction in scenario.ynab.get_transactions(scenario.budget_id)))
+        self.assertEqual(len(uploads[0]), 1200)
+        self.assertEqual(uploads[0], uploads[1])
+
+    def test_streaming_numbers_dates_that_reappear_in_the_booking_order(self):
+        uploads = []
+        for streaming in (False, True):
+            with SyncScenario(transactions=0, accounts=1) as scenario:
+                iban = scenario.accounts['Account 0']
+                now = datetime.datetime.now()
+                first = generate_mutations(1, iban, end=now - datetime.timedelta(days=10), days=0.1, seed=5)
+                # Three payments of the same amount booked one after the other, where the middle one is dated the
+                # day before, so the date of the other two comes back after an older one in the booking order.
+                payments = generate_mutations(3, iban, end=now, days=0.1, seed=1)
+                for payment in payments:
+                    payment['amount'] = payments[0]['amount']
+                payments[1]['transactionDate'] = int((now - datetime.timedelta(days=1)).timestamp() * 1000)
+                scenario.bank.add_mutations(iban, [*payments, *first])
+                service = scenario.create_service(streaming=streaming)
+                account = service.get_account_by_name('Account 0')
+                scenario.ynab.add_transactions(scenario.budget_id, to_ynab_transactions(first, account.ynab_account.id))
+                expected = sorted(transaction.import_id
+                                  for transaction in assign_occurrences(list(account.transactions)))
+                self.assertTrue(service.upload_all_missing_transactions().success)
+                uploads.append(sorted(transaction['import_id']
+                                      for transaction in scenario.ynab.get_transactions(scenario.budget_id)))
+                self.assertEqual(uploads[-1], expected)
+        self.assertEqual(len(uploads[0]), 4)
+        self.assertEqual(uploads[0], uploads[1])
+
+
+class TestTransactionStores(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Creates a directory for the stores.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the stores.
+        """
+        self.directory.cleanup()
+
+    @staticmethod
+    def _restart(scenario, store_type, path, stores):
+        # The store of the previous service is closed as it would be when its process exits.
+        if stores:
+            stores[-1].close()
+        stores.append(store_type(path))
+        return scenario.create_service(transactions_store=stores[-1])
+
+    def test_handled_transactions_survive_a_restart(self):
+        for store_type in (SqliteTransactionStore, DbmTransactionStore):
+            with self.subTest(store=store_type.__name__), \
+                    SyncScenario(transactions=40, accounts=2, in_budget=0.5) as scenario:
+                path = os.path.join(self.directory.name, store_type.__name__)
+                stores = []
+                restart = functools.partial(self._restart, scenario, store_type, path, stores)
+                self.assertEqual(restart().get_latest_transactions(), [])
+                iban = scenario.accounts['Account 0']
+                mutations = generate_mutations(2, iban, end=datetime.datetime.now(), days=0.01, seed=100)
+                scenario.bank.add_mutations(iban, mutations)
+                # Not a first run, so the new transactions are not discarded.
+                latest = restart().get_latest_transactions()
+                self.assertEqual(len(latest), 2)
+                self.assertEqual(restart().upload_transactions(latest).created, 2)
+                result = restart().upload_latest_transactions()
+                self.assertTrue(result.success)
+                self.assertEqual(result.chunks, [])
+                self.assertEqual(result.report.counts['filtered'], 42)
+                stores[-1].close()
+
+    def test_stores_are_bounded(self):
+        for store_type in (SqliteTransactionStore, DbmTransactionStore):
+            with self.subTest(store=store_type.__name__):
+                path = os.path.join(self.directory.name, f'bounded-{store_type.__name__}')
+                with store_type(path, 20) as store:
+                    store.add([f'first {index}' for index in range(15)])
+                    store.add([f'second {index}' for index in range(6)])
+                    self.assertEqual(store.load()[:2], ['first 1', 'first 2'])
+                    self.assertEqual(store.load(2), ['second 4', 'second 5'])
+                    # Pruning waits until a tenth of the maximum size is added over it.
+                    store.add(['third 0'])
+                    self.assertEqual(len(store.load()), 21)
+                    store.add(['third 1'])
+                    self.assertEqual(store.load()[:2], ['first 3', 'first 4'])
+                with store_type(path, 5) as store:
+                    self.assertEqual(store.load(), ['second 3', 'second 4', 'second 5', 'third 0', 'third 1'])
+
+
+class TestRegistration(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds a service with the contract and the account of a scenario registered.
+        """
+        self.scenario = SyncScenario(transactions=10, accounts=1)
+        self.service = self.scenario.create_service()
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the files of the scenario.
+        """
+        self.scenario.close()
+
+    def test_duplicate_names_are_rejected(self):
+        contract = self.service.get_contract_by_name('abnamro')
+        account = self.service.get_account_by_name('Account 0')
+        self.assertFalse(self.service.register_contract('ABNAMRO', 'AbnAmro', 'Account', {}))
+        self.assertFalse(self.service.register_account('abnamro', 'Synthetic', 'account 0',
+                                                       self.scenario.accounts['Account 0']))
+        self.assertEqual(self.service.contracts, [contract])
+        self.assertEqual(self.service.accounts, [account])
+
+    def test_unregistering_removes_the_entry(self):
+        self.assertTrue(self.service.unregister_account('ACCOUNT 0'))
+        self.assertIsNone(self.service.get_account_by_name('Account 0'))
+        self.assertEqual(self.service.accounts, [])
+        self.assertFalse(self.service.unregister_account('Account 0'))
+        self.assertTrue(self.service.unregister_contract('abnamro'))
+        self.assertEqual(self.service.contracts, [])
+        self.assertFalse(self.service.unregister_contract('abnamro'))
+        self.assertFalse(self.service.register_account('abnamro', 'Synthetic', 'Account 0'))
+
+
+class TestSessions(TestCase):
+
+    def test_contract_sessions_share_the_pooled_adapter(self):
+        with SyncScenario(transactions=10, accounts=1, cards=1) as scenario:
+            service = scenario.create_service()
+            adapters = {id(contract.contract.session.get_adapter('https://example.com/'))
+                        for contract in service.contracts}
+            self.assertEqual(len(service.contracts), 2)
+            self.assertEqual(adapters, {id(service.session_manager.adapter)})
+
+
+class TestMetadataCache(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds a service whose metadata is fresh for a tenth of a second, with counters reset after registering.
+        """
+        self.scenario = SyncScenario(transactions=10, accounts=1)
+        self.cache = self.scenario.create_service(metadata_ttl=0.1).metadata_cache
+        self.cache.hits = self.cache.misses = 0
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the files of the scenario.
+        """
+        self.scenario.close()
+
+    def _lookup(self):
+        requests = self.scenario.ynab.requests
+        self.assertEqual(self.cache.get_budget_by_name('synthetic').id, self.scenario.budget_id)
+        return self.scenario.ynab.requests - requests
+
+    def test_fresh_metadata_is_served_from_the_cache(self):
+        self.assertEqual(self._lookup(), 0)
+        self.assertEqual(self._lookup(), 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 0))
+        self.assertEqual(self.cache.hit_ratio, 1.0)
+
+    def test_expired_metadata_is_retrieved_again(self):
+        time.sleep(0.15)
+        self.assertGreater(self._lookup(), 0)
+        self.assertEqual(self._lookup(), 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.hit_ratio, 0.5)
+
+    def test_invalidated_metadata_is_retrieved_again(self):
+        self.cache.invalidate()
+        self.assertGreater(self._lookup(), 0)
+        self.assertEqual(self.cache.misses, 1)
+        budget = self.cache.get_budget_by_name('Synthetic')
+        self.assertIsNotNone(self.cache.get_account_by_name(budget, 'account 0'))
+        self.assertIsNotNone(self.cache.get_account_by_name(budget, 'Account 0'))
+        # Every account lookup also looks the budgets up.
+        self.assertEqual((self.cache.hits, self.cache.misses), (4, 2))
+
+
+class TestTransactionRecords(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds two accounts of ten transactions with half of them on YNAB.
+        """
+        self.scenario = SyncScenario(transactions=20, accounts=2, in_budget=0.5)
+        self.service = self.scenario.create_service()
+        self.account = self.service.get_account_by_name('Account 0')
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the files of the scenario.
+        """
+        self.scenario.close()
+
+    def test_adapters_build_records_with_the_fields_of_the_transactions(self):
+        records = list(self.account.transactions)
+        bank_transactions = list(self.account.bank_account.transactions)
+        self.assertEqual(len(records), len(bank_transactions))
+        self.assertTrue(all(isinstance(record, TransactionRecord) for record in records))
+        for record, bank_transaction in zip(records, bank_transactions):
+            transaction = AbnAmroAccountTransaction(bank_transaction, self.account.ynab_account)
+            self.assertEqual((record.account_id, record.budget_id, record.account_name),
+                             (self.account.ynab_account.id, self.scenario.budget_id, 'Account 0'))
+            self.assertEqual((record.amount, record.date, record.payee_name, record.memo, record.payload),
+                             (transaction.amount, transaction.date, transaction.payee_name, transaction.memo,
+                              transaction.payload))
+            self.assertEqual(record.fingerprint, transaction.fingerprint)
+            self.assertEqual(record, transaction)
+            self.assertEqual(transaction, record)
+
+    def test_occurrences_are_numbered_on_copies_of_the_records(self):
+        record = next(iter(self.account.transactions))
+        records = assign_occurrences([record, record._replace(payee_name='Other')])
+        self.assertEqual([item.import_id for item in records],
+                         [f'YNAB:{record.amount}:{record.date}:2', f'YNAB:{record.amount}:{record.date}:1'])
+        self.assertEqual(record.import_id, f'YNAB:{record.amount}:{record.date}:1')
+        self.assertEqual(record.with_occurrence(3), record)
+        self.assertEqual(record.with_occurrence(3).import_id, f'YNAB:{record.amount}:{record.date}:3')
+
+    def test_budget_records_are_read_from_the_ynab_data(self):
+        data = {'id': 'transaction-1', 'account_id': 'account-1', 'account_name': 'Checking', 'amount': -2500,
+                'date': '2019-07-08', 'payee_name': 'Albert Heijn', 'memo': 'Groceries', 'import_id': 'YNAB:1'}
+        record = TransactionRecord.from_data(data, 'budget-1')
+        self.assertEqual(record, TransactionRecord('account-1', 'budget-1', -2500, '2019-07-08', 'Other', 'Groceries'))
+        self.assertEqual((record.id, record.budget_id, record.account_name, record.import_id, record.payee_name),
+                         ('transaction-1', 'budget-1', 'Checking', 'YNAB:1', 'Albert Heijn'))
+        self.assertEqual(record.payload, {'account_id': 'account-1', 'amount': -2500, 'payee_name': 'Albert Heijn',
+                                          'memo': 'Groceries', 'date': '2019-07-08', 'import_id': 'YNAB:1'})
+
+    def test_budget_getters_return_records(self):
+        budget_records = self.service.get_transactions_for_budget()
+        account_records = self.service.get_transactions_for_ynab_account('Account 0')
+        self.assertEqual(len(budget_records), 10)
+        self.assertEqual(len(account_records), 5)
+        self.assertTrue(all(isinstance(record, TransactionRecord) for record in budget_records + account_records))
+        self.assertEqual({record.account_name for record in account_records}, {'Account 0'})
+        self.assertEqual(set(account_records),
+                         {record for record in budget_records if record.account_id == self.account.ynab_account.id})
+        self.assertEqual(self.service.get_transactions_for_ynab_account('Missing'), [])
+
+
+class TestComparisonKeys(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Reads a history of ten mutations as bank transactions and its five oldest ones as budget records.
+        """
+        account = SimpleNamespace(id='account-1', name='Checking', budget=SimpleNamespace(id='budget-1'))
+        mutations = generate_mutations(10, iban_for(0), seed=1)
+        self.transactions = [AbnAmroAccountTransaction(AccountTransaction(mutation), account)
+                             for mutation in mutations]
+        self.records = [TransactionRecord.from_data(data, 'budget-1')
+                        for data in to_ynab_transactions(mutations[5:], 'account-1')]
+
+    def test_transactions_equal_the_records_of_the_same_key(self):
+        for transaction, record in zip(self.transactions[5:], self.records):
+            self.assertEqual(transaction.comparison_key, record.comparison_key)
+            self.assertEqual(transaction, record)
+            self.assertEqual(record, transaction)
+            self.assertFalse(transaction != record)
+            self.assertFalse(record != transaction)
+            self.assertEqual(hash(transaction), hash(record))
+        self.assertNotEqual(self.transactions[0], self.records[0])
+        self.assertNotEqual(self.records[0]._replace(memo='Other'), self.transactions[5])
+
+    def test_comparison_key_is_computed_once(self):
+        transaction = self.transactions[0]
+        key = transaction.comparison_key
+        transaction._transaction = None
+        self.assertIs(transaction.comparison_key, key)
+        self.assertEqual(hash(transaction), hash(key))
+
+    def test_set_difference_works_across_transactions_and_records(self):
+        self.assertEqual(set(self.transactions) - set(self.records), set(self.transactions[:5]))
+        self.assertEqual(set(self.records) - set(self.transactions), set())
+        self.assertEqual(set(self.records) - set(self.transactions[:8]), set(self.records[3:]))
+
+
+class TestTransactionCache(TestCase):
+
+    @staticmethod
+    def _transactions(*names):
+        return [SimpleNamespace(fingerprint=name) for name in names]
+
+    def test_oldest_transactions_are_evicted_over_the_size(self):
+        cache = TransactionCache(3)
+        first, second, third, fourth = self._transactions('first', 'second', 'third', 'fourth')
+        cache.extend([first, second, third])
+        # Seeing a transaction again makes it the most recent one.
+        cache.add(first)
+        cache.add(fourth)
+        self.assertEqual(len(cache), 3)
+        self.assertNotIn(second, cache)
+        self.assertTrue(all(transaction in cache for transaction in (first, third, fourth)))
+        self.assertEqual(cache.added, 5)
+
+    def test_transactions_expire_after_the_age(self):
+        cache = TransactionCache(10, max_age=0.1)
+        old, new = self._transactions('old', 'new')
+        cache.add(old)
+        time.sleep(0.15)
+        cache.add(new)
+        self.assertNotIn(old, cache)
+        self.assertIn(new, cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_first_run_with_an_empty_cache_discards_the_latest_transactions(self):
+        with SyncScenario(transactions=20, accounts=1, in_budget=0.5) as scenario:
+            service = scenario.create_service()
+            self.assertEqual(service.get_latest_transactions(), [])
+            self.assertEqual(service.telemetry.last_cycle_report.counts['filtered'], 0)
+            # The discarded transactions are remembered, so they are filtered from now on.
+            self.assertEqual(service.get_latest_transactions(), [])
+            self.assertEqual(service.telemetry.last_cycle_report.counts['filtered'], 20)
+            iban = scenario.accounts['Account 0']
+            scenario.bank.add_mutations(iban, generate_mutations(2, iban, end=datetime.datetime.now(), days=0.01,
+                                                                 seed=100))
+            self.assertEqual(len(service.get_latest_transactions()), 2)
+
+
+class TestAdaptersOnFakeBanks(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds an account with a mutation every two days, paged ten at a time, and a card with the same history.
+        """
+        self.scenario = SyncScenario(transactions=100, accounts=1, cards=1, page_size=10, days=100)
+        self.service = self.scenario.create_service()
+        self.today = datetime.date.today()
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the files of the scenario.
+        """
+        self.scenario.close()
+
+    def _date_range(self, days):
+        return (self.today - datetime.timedelta(days=days - 1)).isoformat(), self.today.isoformat()
+
+    def test_account_history_is_paged(self):
+        account = self.service.get_account_by_name('Account 0')
+        requests = self.scenario.bank.requests
+        self.assertEqual(len(list(account.transactions)), 50)
+        self.assertEqual(self.scenario.bank.requests - requests, 5)
+
+    def test_account_date_range_stops_paging_early(self):
+        account = self.service.get_account_by_name('Account 0')
+        requests = self.scenario.bank.requests
+        transactions = list(account.get_transactions_for_date_range(*self._date_range(20)))
+        self.assertEqual(len(transactions), 10)
+        self.assertEqual(self.scenario.bank.requests - requests, 2)
+
+    def test_account_date_range_follows_the_transaction_dates(self):
+        with SyncScenario(transactions=0, accounts=1, page_size=2) as scenario:
+            iban = scenario.accounts['Account 0']
+            mutations = generate_mutations(5, iban, end=datetime.datetime.now(), days=5, seed=3)
+            # Booked most recently but dated long before the range, like a late booking of an old payment.
+            late = datetime.datetime.now() - datetime.timedelta(days=40)
+            mutations[0]['transactionDate'] = int(late.timestamp() * 1000)
+            scenario.bank.add_mutations(iban, mutations)
+            account = scenario.create_service().get_account_by_name('Account 0')
+            date_from, date_to = self._date_range(3)
+            transactions = list(account.get_transactions_for_date_range(date_from, date_to))
+        self.assertEqual(len(transactions), 2)
+        self.assertTrue(all(date_from <= transaction.date <= date_to for transaction in transactions))
+
+    def _same_day_payments(self, iban, count, day):
+        # Payments of the same amount on the same date, whose import ids only differ in their occurrence.
+        noon = datetime.datetime.combine(day, datetime.time(12))
+        payments = generate_mutations(count, iban, end=noon, days=0.1, seed=1)
+        for payment in payments[1:]:
+            payment.update({key: value for key, value in payments[0].items()
+                            if key not in ('mutationKey', 'transactionTimestamp', 'descriptionLines')})
+        return payments
+
+    def _assert_latest_dates_are_complete(self, scenario, dates):
+        service = scenario.create_service()
+        account = service.get_account_by_name('Account 0')
+        history = {transaction.import_id: transaction.date
+                   for transaction in assign_occurrences(list(account.transactions))}
+        expected = sorted(import_id for import_id, date in history.items() if date in dates)
+        self.assertEqual(sorted(transaction.import_id for transaction in service.get_all_latest_transactions()),
+                         expected)
+        self.assertTrue(service.upload_latest_transactions().success)
+        self.assertEqual(sorted(transaction['import_id']
+                                for transaction in scenario.ynab.get_transactions(scenario.budget_id)),
+                         expected)
+
+    def test_latest_page_that_splits_a_date_is_completed(self):
+        with SyncScenario(transactions=0, accounts=1, page_size=2) as scenario:
+            iban = scenario.accounts['Account 0']
+            yesterday = self.today - datetime.timedelta(days=1)
+            older = datetime.datetime.combine(self.today - datetime.timedelta(days=5), datetime.time())
+            # The first page ends between the two payments of yesterday.
+            scenario.bank.add_mutations(iban, [*generate_mutations(1, iban, end=datetime.datetime.now(), seed=2),
+                                               *self._same_day_payments(iban, 2, yesterday),
+                                               *generate_mutations(3, iban, end=older, days=3, seed=3)])
+            self._assert_latest_dates_are_complete(scenario, {self.today.isoformat(), yesterday.isoformat()})
+
+    def test_latest_page_of_a_single_date_is_completed(self):
+        with SyncScenario(transactions=0, accounts=1, page_size=2) as scenario:
+            iban = scenario.accounts['Account 0']
+            yesterday = self.today - datetime.timedelta(days=1)
+            older = datetime.datetime.combine(self.today - datetime.timedelta(days=5), datetime.time())
+            # A busy day fills the first page and goes on on the next one.
+            scenario.bank.add_mutations(iban, [*self._same_day_payments(iban, 3, yesterday),
+                                               *generate_mutations(2, iban, end=older, days=3, seed=3)])
+            self._assert_latest_dates_are_complete(scenario, {yesterday.isoformat()})
+
+    def test_card_date_range_only_retrieves_overlapping_periods(self):
+        card = self.service.get_account_by_name('Card 0')
+        date_from, date_to = self._date_range(20)
+        transactions = list(card.get_transactions_for_date_range(date_from, date_to))
+        self.assertTrue(all(date_from <= transaction.date <= date_to for transaction in transactions))
+        periods = {request.params['fromPeriod'] for request in self.scenario.ics.history
+                   if 'fromPeriod' in request.params}
+        self.assertEqual(periods, {date_from[:7], date_to[:7]})
+
+    def test_concurrent_fetching_is_bounded(self):
+        with SyncScenario(transactions=60, accounts=6) as scenario:
+            scenario.bank.latency = 0.02
+            service = scenario.create_service(concurrent_fetching=True, max_workers=2)
+            service.get_all_latest_transactions()
+            self.assertEqual(scenario.bank.peak_concurrency, 2)
+
+    def test_backends_are_served_on_localhost(self):
+        service = self.scenario.create_service(localhost=True)
+        result = service.upload_all_missing_transactions()
+        self.assertTrue(result.success)
+        self.assertEqual(len(self.scenario.ynab.get_transactions(self.scenario.budget_id)), 100)
+
+
+class TestAsyncService(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds two accounts with half of their transactions already in the budget.
+        """
+        self.scenario = SyncScenario(transactions=40, accounts=2, in_budget=0.5)
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the files of the scenario.
+        """
+        self.scenario.close()
+
+    def _budget_size(self):
+        return len(self.scenario.ynab.get_transactions(self.scenario.budget_id))
+
+    def test_latest_transactions_match_the_service(self):
+        expected = self.scenario.create_service().get_all_latest_transactions()
+
+        async def get_latest_transactions():
+            async with AsyncService(self.scenario.create_service()) as service:
+                return await service.get_all_latest_transactions(), await service.get_latest_transactions()
+
+        transactions, latest = asyncio.run(get_latest_transactions())
+        self.assertEqual(len(transactions), 40)
+        self.assertEqual(transactions, expected)
+        # The first run only caches what is already there.
+        self.assertEqual(latest, [])
+
+    def test_latest_transactions_of_some_accounts_are_uploaded(self):
+        async def upload_latest_transactions():
+            async with AsyncService(self.scenario.create_service()) as service:
+                return (await service.upload_latest_transactions(accounts=['Account 0']),
+                        await service.upload_latest_transactions())
+
+        size = self._budget_size()
+        first, second = asyncio.run(upload_latest_transactions())
+        self.assertTrue(first.success)
+        self.assertEqual(first.report.operation, 'upload_latest_transactions')
+        self.assertEqual(set(first.report.accounts), {'Account 0'})
+        self.assertEqual(first.report.account_counts['Account 0']['uploaded'], 10)
+        self.assertEqual(second.report.account_counts['Account 1']['uploaded'], 10)
+        self.assertEqual(second.created, 10)
+        self.assertEqual(self._budget_size(), size + 20)
+
+
+class TestBackfill(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds two accounts with four months of history whose oldest quarter is in the budget.
+        """
+        self.scenario = SyncScenario(transactions=120, accounts=2, in_budget=0.25, days=120)
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint_file = os.path.join(self.directory.name, 'checkpoint.json')
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the checkpoint and the files of the scenario.
+        """
+        self.directory.cleanup()
+        self.scenario.close()
+
+    @staticmethod
+    def _record_ranges(service):
+        ranges = []
+        for account in service.accounts:
+            def get_transactions_for_date_range(date_from, date_to, account=account,
+                                                retrieve=account.get_transactions_for_date_range):
+                ranges.append((account.ynab_account.name, date_from, date_to))
+                return retrieve(date_from, date_to)
+            account.get_transactions_for_date_range = get_transactions_for_date_range
+        return ranges
+
+    def _budget_transactions(self, budget_id=None):
+        return self.scenario.ynab.get_transactions(budget_id or self.scenario.budget_id)
+
+    def _completed(self):
+        with open(self.checkpoint_file, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)['completed']
+
+    def test_interrupted_backfill_resumes_from_the_checkpoint(self):
+        service = self.scenario.create_service(max_workers=1)
+        first_ranges = self._record_ranges(service)
+        self.scenario.ynab.fail(2, method='POST')
+        first = service.backfill(checkpoint_file=self.checkpoint_file, range_days=30)
+        self.assertFalse(first)
+        self.assertEqual(len(first.failed), 2)
+        completed = self._completed()
+        self.assertEqual(sum(len(ranges) for ranges in completed['Synthetic'].values()), len(first_ranges) - 2)
+        # A new service, as after a restart, only retrieves the ranges that failed.
+        service = self.scenario.create_service(max_workers=1)
+        second_ranges = self._record_ranges(service)
+        second = service.backfill(checkpoint_file=self.checkpoint_file, range_days=30)
+        self.assertTrue(second)
+        self.assertEqual(len(second_ranges), 2)
+        self.assertLessEqual(set(second_ranges), set(first_ranges))
+        self.assertEqual(second.duplicates, 0)
+        import_ids = [transaction['import_id'] for transaction in self._budget_transactions()]
+        self.assertEqual(len(import_ids), 120)
+        self.assertEqual(len(set(import_ids)), 120)
+        self.assertEqual(service.backfill(checkpoint_file=self.checkpoint_file, range_days=30).chunks, [])
+
+    def test_checkpoint_is_shared_by_budgets(self):
+        other_budget_id = self.scenario.ynab.add_budget('Other')
+        account_id = self.scenario.ynab.add_account(other_budget_id, 'Other 0')
+        iban = iban_for(9)
+        mutations = generate_mutations(20, iban, days=120, seed=9)
+        self.scenario.bank.add_account(iban, mutations)
+        self.scenario.ynab.add_transactions(other_budget_id, to_ynab_transactions(mutations, account_id)[-5:])
+        service = self.scenario.create_service()
+        self.assertTrue(service.register_account('abnamro', 'Other', 'Other 0', iban))
+        self.assertTrue(service.backfill('Synthetic', checkpoint_file=self.checkpoint_file, range_days=30))
+        self.assertEqual(len(self._budget_transactions()), 120)
+        self.assertEqual(len(self._budget_transactions(other_budget_id)), 5)
+        self.assertEqual(set(self._completed()), {'Synthetic'})
+        self.assertTrue(service.backfill('Other', checkpoint_file=self.checkpoint_file, range_days=30))
+        self.assertEqual(len(self._budget_transactions(other_budget_id)), 20)
+        completed = self._completed()
+        self.assertEqual(set(completed['Synthetic']), {'Account 0', 'Account 1'})
+        self.assertEqual(set(completed['Other']), {'Other 0'})
+
+
+class TestCycleReports(TestCase):
+
+    def setUp(self):
+        """
+        Test set up
+
+        Builds two accounts with half of their transactions already in the budget.
+        """
+        self.scenario = SyncScenario(transactions=40, accounts=2, in_budget=0.5)
+
+    def tearDown(self):
+        """
+        Test tear down
+
+        Removes the files of the scenario.
+        """
+        self.scenario.close()
+
+    def test_upload_result_carries_the_report(self):
+        result = self.scenario.create_service().upload_all_missing_transactions()
+        report = result.report
+        self.assertEqual(report.operation, 'upload_all_missing_transactions')
+        self.assertEqual(report.counts['fetched'], 40)
+        self.assertEqual(report.counts['deduped'] + report.counts['uploaded'], 40)
+        self.assertEqual(set(report.accounts), {'Account 0', 'Account 1'})
+        self.assertTrue({'budget', 'fetch', 'diff', 'upload'} <= set(report.stages))
+
+    def test_hooks_get_every_cycle(self):
+        reports = []
+        service = self.scenario.create_service(concurrent_fetching=True, cycle_hooks=[reports.append])
+        service.telemetry.add_cycle_hook(lambda report: 1 / 0)
+        service.get_latest_transactions()
+        service.upload_latest_transactions()
+        self.assertEqual([report.operation for report in reports],
+                         ['get_latest_transactions', 'upload_latest_transactions'])
+        self.assertEqual(set(reports[0].accounts), {'Account 0', 'Account 1'})
+        self.assertIs(service.telemetry.last_cycle_report, reports[-1])
+
+    def test_failing_accounts_are_reported_the_same_in_both_fetch_modes(self):
+        def fail():
+            raise ConnectionError('The bank is down')
+
+        outcomes = []
+        for concurrent_fetching in (False, True):
+            service = self.scenario.create_service(concurrent_fetching=concurrent_fetching)
+            service.get_account_by_name('Account 0').get_latest_transactions = fail
+            transactions = service.get_all_latest_transactions()
+            report = service.telemetry.last_cycle_report
+            outcomes.append(({transaction.account_name for transaction in transactions}, report.failed_accounts))
+            self.assertFalse(report.success)
+        self.assertEqual(outcomes, [({'Account 1'}, ['Account 0'])] * 2)
+
+
+class TestMetrics(TestCase):
+
+    def test_registry_renders_the_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        registry.counter('requests_total', 'Requests.', ('status',)).inc(2, status=200)
+        registry.gauge('headroom', 'Headroom.').set_function(lambda: 7)
+        registry.histogram('duration_seconds', 'Duration.', buckets=(0.1, 1)).observe(0.5)
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{status="200"} 2', lines)
+        self.assertIn('headroom 7', lines)
+        self.assertIn('duration_seconds_bucket{le="0.1"} 0', lines)
+        self.assertIn('duration_seconds_bucket{le="1.0"} 1', lines)
+        self.assertIn('duration_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('duration_seconds_count 1', lines)
+
+    def test_service_metrics_are_served(self):
+        registry = MetricsRegistry()
+        with SyncScenario(transactions=40, accounts=2) as scenario, FakeServer(scenario.ynab) as server:
+            scenario.ynab.retry_after = 0
+            scenario.ynab.throttle(1)
+            service = scenario.create_service(ynab_url=server.url,
+                                              rate_limiter=RateLimiter(capacity=1000, period=60, reserved=0),
+                                              metrics=registry)
+            service.upload_all_missing_transactions()
+            with registry.serve(port=0) as metrics_server:
+                exposition = urllib.request.urlopen(metrics_server.url).read().decode('utf-8')
+        lines = exposition.splitlines()
+        self.assertIn('ynabintegrationslib_cycles_total{operation="upload_all_missing_transactions",'
+                      'outcome="success"} 1', lines)
+        self.assertIn('ynabintegrationslib_transactions_total{kind="fetched"} 40', lines)
+        self.assertIn('ynabintegrationslib_ynab_requests_total{method="GET",status="429"} 1', lines)
+        self.assertIn('ynabintegrationslib_ynab_requests_total{method="POST",status="201"} 1', lines)
+        fetch_count = 'ynabintegrationslib_account_fetch_duration_seconds_count{account="Account 0"}'
+        self.assertTrue(any(line.startswith(fetch_count) for line in lines))
+
+
+class TestTracing(TestCase):
+
+    def test_cycle_spans_form_a_tree(self):
+        exporter = InMemoryExporter()
+        with SyncScenario(transactions=40, accounts=3) as scenario:
+            service = scenario.create_service(concurrent_fetching=True, tracer=Tracer([exporter]))
+            result = service.upload_latest_transactions()
+        self.assertTrue(result.success)
+        spans = {span.name: span for span in exporter.spans}
+        root = spans['upload_latest_transactions']
+        self.assertIsNone(root.parent_id)
+        self.assertEqual(root.attributes['cycle_id'], result.report.cycle_id)
+        self.assertEqual({span.trace_id for span in exporter.spans}, {root.trace_id})
+        fetches = [span for span in exporter.spans if span.name == 'account.get_latest_transactions']
+        self.assertEqual({span.attributes['account'] for span in fetches}, {'Account 0', 'Account 1', 'Account 2'})
+        self.assertTrue(all(span.parent_id == root.span_id for span in fetches))
+        upload = spans['ynab.upload']
+        self.assertEqual(upload.parent_id, root.span_id)
+        self.assertEqual(upload.attributes['status_code'], 201)
+        self.assertGreater(upload.attributes['payload_bytes'], 0)
+
+    def test_spans_are_exported_as_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'spans.jsonl')
+            tracer = Tracer([JsonLinesExporter(path)])
+            with self.assertRaises(ValueError), tracer.span('outer'), tracer.span('inner', account='Account 0'):
+                raise ValueError('failed')
+            with open(path, encoding='utf-8') as spans_file:
+                inner, outer = [json.loads(line) for line in spans_file]
+            tracer.exporters[0].clear()
+            self.assertEqual(os.path.getsize(path), 0)
+        self.assertEqual(inner['parent_id'], outer['span_id'])
+        self.assertEqual(inner['attributes']['account'], 'Account 0')
+        self.assertEqual((inner['status'], outer['status']), ('error', 'error'))
+
+    def test_tracers_report_the_running_span(self):
+        tracer = Tracer()
+        self.assertIsNone(tracer.current_span)
+        with tracer.span('outer') as span:
+            self.assertIs(tracer.current_span, span)
+        noop_tracer = NoopTracer()
+        with noop_tracer.span('outer'):
+            self.assertIsNone(noop_tracer.current_span)
+
+    def test_opentelemetry_is_optional(self):
+        if opentelemetry_trace is not None:
+            self.skipTest('opentelemetry is installed')
+        with self.assertRaises(MissingDependency):
+            OpenTelemetryTracer()
+
+
+class TestProfiling(TestCase):
+
+    def test_armed_cycles_are_profiled(self):
+        with tempfile.TemporaryDirectory() as directory, SyncScenario(transactions=40, accounts=2) as scenario:
+            profiler = CycleProfiler(cycles=1, directory=directory, interval=0.001)
+            service = scenario.create_service(profiler=profiler)
+            service.get_latest_transactions()
+            service.get_latest_transactions()
+            self.assertEqual(profiler.remaining, 0)
+            names = sorted(os.path.basename(path) for path in profiler.files)
+            self.assertEqual(names, [f'get_latest_transactions-{os.getpid()}-1.collapsed',
+                                     f'get_latest_transactions-{os.getpid()}-1.pstats'])
+            stats = pstats.Stats(os.path.join(directory, names[1]))
+            self.assertTrue(any(function == '_get_latest_transactions' for _, _, function in stats.stats))
+            with open(os.path.join(directory, names[0]), encoding='utf-8') as collapsed_file:
+                lines = collapsed_file.read().splitlines()
+            self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+    def test_profiler_is_configured_by_the_environment(self):
+        profiler = CycleProfiler.from_environment({'YNAB_INTEGRATIONS_PROFILE_CYCLES': '3',
+                                                   'YNAB_INTEGRATIONS_PROFILE_MODE': 'sampling'})
+        self.assertEqual((profiler.remaining, profiler.mode, profiler.directory), (3, 'sampling', '.'))
+        self.assertEqual(CycleProfiler.from_environment({}).remaining, 0)
+
+
+class TestSyncDaemon(TestCase):
+
+    def test_accounts_are_synced_on_their_own_schedules_without_overlap(self):
+        reports = []
+        with SyncScenario(transactions=60, accounts=3) as scenario:
+            service = scenario.create_service(cycle_hooks=[reports.append])
+            daemon = SyncDaemon(service, interval=0.05, jitter=0.2, seed=0)
+            daemon.schedule_all()
+            daemon.schedule('Account 2', interval=60, jitter=0)
+            with daemon:
+                time.sleep(0.5)
+            self.assertFalse(daemon.running)
+        runs = {schedule.account_name: schedule.runs for schedule in daemon.schedules}
+        self.assertEqual(runs['Account 2'], 1)
+        self.assertGreater(runs['Account 0'], 2)
+        self.assertTrue(all(report.success for report in reports))
+        for previous, report in zip(reports, reports[1:]):
+            self.assertGreaterEqual(report.started_at + 0.001, previous.started_at + previous.wall)
+
+    def test_stopping_drains_the_running_cycle(self):
+        with SyncScenario(transactions=40, accounts=2) as scenario:
+            service = scenario.create_service()
+            scenario.ynab.latency = 0.1
+            daemon = SyncDaemon(service, interval=60, jitter=0).start()
+            while not scenario.ynab.in_flight:
+                time.sleep(0.01)
+            self.assertTrue(daemon.stop())
+            self.assertEqual(scenario.ynab.in_flight, 0)
+            self.assertEqual(scenario.ynab.status_codes[201], 1)
+        self.assertEqual(daemon.cycles, 1)
+        self.assertTrue(all(schedule.last_result for schedule in daemon.schedules))
+
+    def test_daemon_is_created_from_a_configuration(self):
+        with SyncScenario(transactions=20, accounts=2) as scenario:
+            config = {'ynab_token': scenario.token,
+                      'interval': 300,
+                      'contracts': [{'name': 'abn',
+                                     'bank': 'AbnAmro',
+                                     'type': 'Account',
+                                     'credentials': {'cookie_file': scenario.cookie_file}}],
+                      'accounts': [{'contract': 'abn',
+                                    'budget': 'Synthetic',
+                                    'ynab_account': name,
+                                    'account_id': iban,
+                                    'interval': 60 * (index + 1)}
+                                   for index, (name, iban) in enumerate(scenario.accounts.items())]}
+            daemon = create_daemon(config, session_manager=scenario.create_session_manager())
+            self.assertEqual([schedule.interval for schedule in daemon.schedules], [60, 120])
+            results = daemon.run_once()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].uploaded, 10)
+        with self.assertRaises(InvalidConfiguration):
+            create_daemon({'contracts': []})
+        self.assertEqual(main(['/nonexistent/config.json']), 2)
+
+
+class TestAdaptivePolling(TestCase):
+
+    @staticmethod
+    def _local(day, hour, minute=0):
+        # 19-10-2026 is a Monday
+        return time.mktime((2026, 10, 19 + day, hour, minute, 0, 0, 0, -1))
+
+    def test_interval_follows_the_arrival_pattern(self):
+        policy = AdaptiveInterval(min_interval=300, max_interval=4 * 3600)
+        for week in range(4):
+            policy.observe(self._local(7 * week, 2, 15), 5)
+        self.assertEqual(policy.next_delay(self._local(28, 2, 5)), 300)
+        policy.observe(self._local(28, 2, 30), 0)
+        self.assertEqual(policy.next_delay(self._local(28, 12)), 4 * 3600)
+        self.assertEqual(policy.next_delay(self._local(35, 1, 30)), 1800)
+        self.assertGreater(policy.arrivals.activity(self._local(35, 2)), 100)
+
+    def test_interval_backs_off_exponentially_when_idle(self):
+        policy = AdaptiveInterval(min_interval=60, max_interval=600)
+        delays = []
+        for _ in range(5):
+            policy.observe(self._local(0, 9), 0)
+            delays.append(policy.next_delay(self._local(0, 9)))
+        self.assertEqual(delays, [120, 240, 480, 600, 600])
+        policy.observe(self._local(0, 10), 3)
+        self.assertEqual(policy.next_delay(self._local(0, 10)), 60)
+
+    def test_arrivals_decay(self):
+        histogram = ArrivalHistogram(half_life=7 * 24 * 3600)
+        start = self._local(0, 8)
+        histogram.observe(start, 8)
+        histogram.observe(start + 14 * 24 * 3600, 1)
+        self.assertAlmostEqual(histogram.total, 3.0)
+
+    def test_daemon_learns_the_new_transactions_of_every_account(self):
+        with SyncScenario(transactions=40, accounts=2) as scenario:
+            service = scenario.create_service()
+            daemon = SyncDaemon(service, jitter=0, min_interval=0.02, max_interval=0.1, seed=0)
+            daemon.schedule_all()
+            result = daemon.run_once()[0]
+            self.assertEqual(result.report.account_counts['Account 0']['uploaded'], 10)
+            self.assertEqual(result.report.account_counts['Account 1']['uploaded'], 10)
+            for _ in range(3):
+                daemon.run_once()
+        for schedule in daemon.schedules:
+            self.assertEqual(schedule.policy.base, 0.1)
+            self.assertEqual(schedule.policy.arrivals.total, 0)
+            self.assertAlmostEqual(schedule.next_run - schedule.last_run, 0.1)
@@ -32,8 +32,13 @@ Import all parts from ynabintegrationslib here
    http://google.github.io/styleguide/pyguide.html
 """
 from ._version import __version__
-from .ynabintegrationslib import Service
-from .ynabintegrationslibexceptions import InvalidAccount, InvalidBudget, MultipleBudgets
+from .ynabintegrationslib import Service, AsyncService
+from .lib import ServiceOptions, SqliteTransactionStore, DbmTransactionStore, MetricsRegistry, Tracer, SyncDaemon
+from .ynabintegrationslibexceptions import (InvalidAccount,
+                                            InvalidBudget,
+                                            MultipleBudgets,
+                                            MissingDependency,
+                                            InvalidConfiguration)
 
 __author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
 __docformat__ = '''google'''
@@ -48,6 +53,15 @@ __status__ = '''Development'''  # "Prototype", "Development", "Production".
 assert __version__
 
 assert Service
+assert AsyncService
+assert ServiceOptions
+assert SqliteTransactionStore
+assert DbmTransactionStore
+assert MetricsRegistry
+assert Tracer
+assert SyncDaemon
 assert InvalidBudget
 assert InvalidAccount
 assert MultipleBudgets
+assert MissingDependency
+assert InvalidConfiguration
@@ -31,9 +31,11 @@ Main code for abnamro.
 
 """
 
+import datetime
 import logging
 
 from abnamrolib import AccountContract as AbnAmroAccountContract
+from abnamrolib import AccountTransaction
 from abnamrolib import CreditCardContract as AbnAmroCreditCardContract
 
 from ynabintegrationslib.lib.core import YnabAccount, YnabTransaction
@@ -57,10 +59,16 @@ LOGGER_BASENAME = '''abnamro'''
 LOGGER = logging.getLogger(LOGGER_BASENAME)
 LOGGER.addHandler(logging.NullHandler())
 
+MUTATIONS_HEADERS = {'x-aab-serviceversion': 'v3'}
+
 
 class AbnAmroAccount(YnabAccount):
     """Models an Abn Amro account."""
 
+    @property
+    def _transaction_class(self):
+        return AbnAmroAccountTransaction
+
     @property
     def _comparable_attributes(self):
         return ['ynab_account_name',
@@ -79,33 +87,72 @@ class AbnAmroAccount(YnabAccount):
     @property
     def transactions(self):
         """Transactions."""
-        for transaction in self.bank_account.transactions:
-            yield AbnAmroAccountTransaction(transaction, self._ynab_account)
+        yield from self._to_records(self.bank_account.transactions)
+
+    def _get_mutations(self, last_mutation_key=None):
+        # abnamrolib only pages the mutations internally, so the pages are requested on the session of the contract.
+        contract = self.bank_account.contract
+        response = contract.session.get(f'{contract.base_url}/mutations/{self.bank_account.iban}',
+                                        headers=MUTATIONS_HEADERS,
+                                        params={'lastMutationKey': last_mutation_key} if last_mutation_key else None)
+        if not response.ok:
+            self._logger.warning('Error retrieving transactions for account "%s", response was %s with status code %s',
+                                 self.ynab_account.name,
+                                 response.text,
+                                 response.status_code)
+            return [], None
+        mutations_list = response.json().get('mutationsList', {})
+        return ([AccountTransaction(data.get('mutation')) for data in mutations_list.get('mutations', [])],
+                mutations_list.get('lastMutationKey'))
+
+    def _get_transactions_from(self, last_mutation_key, first_day, next_day=None):
+        # The pages follow the booking order, which can differ from the order of the transaction dates, so every
+        # transaction is checked against the dates and the paging only stops on a page that is wholly before them.
+        while last_mutation_key:
+            mutations, last_mutation_key = self._get_mutations(last_mutation_key)
+            yield from self._to_records(mutation for mutation in mutations
+                                        if first_day <= mutation.transaction_date
+                                        and (next_day is None or mutation.transaction_date < next_day))
+            if all(mutation.transaction_date < first_day for mutation in mutations):
+                return
 
     def get_latest_transactions(self):
-        """Retrieves latest transactions."""
-        for transaction in self.bank_account.get_latest_transactions():
-            yield AbnAmroAccountTransaction(transaction, self._ynab_account)
+        """Retrieves latest transactions.
+
+        The latest page of the history can end partway through its oldest date, so the retrieval goes on past it
+        for the transactions on or after that date. Every date returned is complete and its transactions are
+        numbered the same as on the full history.
+        """
+        mutations, last_mutation_key = self._get_mutations()
+        yield from self._to_records(mutations)
+        if mutations and last_mutation_key:
+            yield from self._get_transactions_from(last_mutation_key,
+                                                   min(mutation.transaction_date for mutation in mutations))
 
     def get_transactions_for_date(self, date):
         """Retrieves transactions for date."""
-        for transaction in self.bank_account.get_transactions_for_date(date):
-            yield AbnAmroAccountTransaction(transaction, self._ynab_account)
+        yield from self._to_records(self.bank_account.get_transactions_for_date(date))
 
     def get_transactions_for_date_range(self, date_from, date_to):
-        """Retrieves transactions for date."""
-        for transaction in self.bank_account.get_transactions_for_date_range(date_from, date_to):
-            yield AbnAmroAccountTransaction(transaction, self._ynab_account)
+        """Retrieves the transactions between two ISO formatted dates, both inclusive, most recent first."""
+        # The library builds the mutation key of the day after date_to by incrementing the day of the month, which
+        # overflows on month ends, and refuses single day ranges, so the pagination is driven from here.
+        first_day = datetime.date.fromisoformat(date_from)
+        next_day = datetime.date.fromisoformat(date_to) + datetime.timedelta(days=1)
+        yield from self._get_transactions_from(f'{next_day.isoformat()}-00.00.00.000000', first_day, next_day)
 
     def get_transactions_since_date(self, date):
         """Retrieves transactions for date."""
-        for transaction in self.bank_account.transactions_since_date(date):
-            yield AbnAmroAccountTransaction(transaction, self._ynab_account)
+        yield from self._to_records(self.bank_account.transactions_since_date(date))
 
 
 class AbnAmroCreditCard(YnabAccount):
     """Models an Abn Amro credit card account."""
 
+    @property
+    def _transaction_class(self):
+        return AbnAmroCreditCardTransaction
+
     @property
     def _comparable_attributes(self):
         return ['ynab_account_name',
@@ -124,13 +171,23 @@ class AbnAmroCreditCard(YnabAccount):
     @property
     def transactions(self):
         """Transactions."""
-        for transaction in self.bank_account.transactions:
-            yield AbnAmroCreditCardTransaction(transaction, self._ynab_account)
+        yield from self._to_records(self.bank_account.transactions)
 
     def get_latest_transactions(self):
         """Retrieves latest transactions."""
-        for transaction in self.bank_account.get_current_period_transactions():
-            yield AbnAmroCreditCardTransaction(transaction, self._ynab_account)
+        yield from self._to_records(self.bank_account.get_current_period_transactions())
+
+    def get_transactions_for_date_range(self, date_from, date_to):
+        """Retrieves the transactions between two ISO formatted dates, both inclusive.
+
+        Only the payment periods overlapping the range are retrieved.
+        """
+        for period in self.bank_account.periods:
+            if (period.end_date and period.end_date < date_from) or (period.start_date and period.start_date > date_to):
+                continue
+            yield from self._to_records(transaction for transaction in period.transactions
+                                        if transaction.transaction_date
+                                        and date_from <= transaction.transaction_date <= date_to)
 
 
 class AbnAmroAccountTransaction(YnabTransaction):
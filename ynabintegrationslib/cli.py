@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: cli.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for cli.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+from ynabintegrationslib.lib.options import ServiceOptions
+from ynabintegrationslib.lib.scheduler import DEFAULT_INTERVAL, DEFAULT_JITTER, SyncDaemon
+from ynabintegrationslib.ynabintegrationslib import Service
+from ynabintegrationslib.ynabintegrationslibexceptions import InvalidConfiguration
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''26-06-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''cli'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+TOKEN_VARIABLE = 'YNAB_TOKEN'
+
+
+def load_config(path):
+    """Loads the configuration of a daemon from a json file.
+
+    The file has the YNAB token (or it is provided by the YNAB_TOKEN environment variable), the default interval,
+    jitter and bounds of adaptive intervals, any keyword arguments of the service, the contracts and the accounts
+    with optional schedules like::
+
+        {"ynab_token": "...",
+         "interval": 900,
+         "jitter": 0.1,
+         "min_interval": 300,
+         "max_interval": 14400,
+         "service": {"concurrent_fetching": true},
+         "contracts": [{"name": "abn", "bank": "AbnAmro", "type": "Account",
+                        "credentials": {"cookie_file": "cookies.txt"}}],
+         "accounts": [{"contract": "abn", "budget": "Home", "ynab_account": "Checking",
+                       "account_id": "NL00ABNA0123456789", "interval": 300}]}
+
+    Args:
+        path (str): The path of the file
+
+    Returns:
+        config (dict): The configuration
+
+    Raises:
+        InvalidConfiguration: If the file cannot be read or is not valid json
+
+    """
+    try:
+        with open(path, encoding='utf-8') as config_file:
+            return json.load(config_file)
+    except (OSError, ValueError) as error:
+        raise InvalidConfiguration(f'Could not load configuration "{path}": {error}') from None
+
+
+def create_daemon(config, **service_kwargs):
+    """Creates a daemon with a service set up as configured.
+
+    Args:
+        config (dict): The configuration as described in load_config
+        **service_kwargs: Any options of the ServiceOptions of the service, overriding the configured ones
+
+    Returns:
+        daemon (SyncDaemon): The daemon with all the configured accounts scheduled
+
+    Raises:
+        InvalidConfiguration: If the token is missing, an option is unknown or a contract or account can not be
+            registered
+
+    """
+    token = config.get('ynab_token') or os.environ.get(TOKEN_VARIABLE)
+    if not token:
+        raise InvalidConfiguration(f'No "ynab_token" configured and no {TOKEN_VARIABLE} environment variable set')
+    try:
+        options = ServiceOptions(**{**config.get('service', {}), **service_kwargs})
+    except TypeError as error:
+        raise InvalidConfiguration(f'Invalid "service" options: {error}') from None
+    service = Service(token, options)
+    for contract in config.get('contracts', []):
+        if not service.register_contract(contract.get('name'),
+                                         contract.get('bank'),
+                                         contract.get('type'),
+                                         contract.get('credentials', {})):
+            raise InvalidConfiguration(f'Could not register contract "{contract.get("name")}"')
+    daemon = SyncDaemon(service,
+                        interval=config.get('interval', DEFAULT_INTERVAL),
+                        jitter=config.get('jitter', DEFAULT_JITTER),
+                        min_interval=config.get('min_interval'),
+                        max_interval=config.get('max_interval'))
+    for account in config.get('accounts', []):
+        if not service.register_account(account.get('contract'),
+                                        account.get('budget'),
+                                        account.get('ynab_account'),
+                                        account.get('account_id')):
+            raise InvalidConfiguration(f'Could not register account "{account.get("ynab_account")}"')
+        daemon.schedule(account.get('ynab_account'),
+                        account.get('interval'),
+                        account.get('jitter'),
+                        account.get('min_interval'),
+                        account.get('max_interval'))
+    return daemon
+
+
+def get_arguments(arguments=None):
+    """Parses the arguments of the command line.
+
+    Args:
+        arguments (list): The arguments, by default the ones of the process
+
+    Returns:
+        args (argparse.Namespace): The parsed arguments
+
+    """
+    parser = argparse.ArgumentParser(prog='ynab-integrations-sync',
+                                     description='Uploads the latest transactions of bank accounts to YNAB on '
+                                                 'schedules until it is stopped with SIGINT or SIGTERM.')
+    parser.add_argument('config', help='The path of the json configuration file')
+    parser.add_argument('--once', action='store_true', help='Sync all the accounts once and exit')
+    parser.add_argument('--log-level', default='INFO', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'),
+                        help='The level of the logs, by default INFO')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    """Runs the daemon configured on the command line.
+
+    Args:
+        arguments (list): The arguments, by default the ones of the process
+
+    Returns:
+        exit_code (int): 0 on success, 1 if a sync of --once failed, 2 on an invalid configuration
+
+    """
+    args = get_arguments(arguments)
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    try:
+        daemon = create_daemon(load_config(args.config))
+    except InvalidConfiguration as error:
+        LOGGER.error('%s', error)
+        return 2
+    if args.once:
+        return 0 if all(daemon.run_once()) else 1
+    daemon.run(install_signal_handlers=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -32,10 +32,45 @@ Import all parts from adapters here
    http://google.github.io/styleguide/pyguide.html
 """
 
-from ynabintegrationslib.lib.core import (YnabContract,
+from ynabintegrationslib.lib.core import (YNAB_URL,
+                                          assign_occurrences,
+                                          iter_with_occurrences,
+                                          YnabClient,
+                                          YnabContract,
                                           YnabAccount,
                                           YnabTransaction,
-                                          YnabServerTransaction)
+                                          YnabServerTransaction,
+                                          TransactionRecord)
+from ynabintegrationslib.lib.options import ServiceOptions
+from ynabintegrationslib.lib.cache import CacheStats, TransactionCache, BudgetTransactions, MetadataCache
+from ynabintegrationslib.lib.upload import ChunkResult, UploadResult, UploadBuffer, Uploader, chunk
+from ynabintegrationslib.lib.sessions import PooledAdapter, SessionManager
+from ynabintegrationslib.lib.ratelimit import RateLimiter, RateLimitedAdapter
+from ynabintegrationslib.lib.store import TransactionStore, SqliteTransactionStore, DbmTransactionStore
+from ynabintegrationslib.lib.backfill import BackfillCheckpoint, BackfillEngine, split_date_range
+from ynabintegrationslib.lib.instrumentation import (CycleReport,
+                                                     StageTiming,
+                                                     Instrumentation,
+                                                     submit_in_context,
+                                                     bind_to_context)
+from ynabintegrationslib.lib.metrics import (Counter,
+                                             Gauge,
+                                             Histogram,
+                                             MetricsRegistry,
+                                             MetricsServer,
+                                             CycleMetrics,
+                                             ResourceMetrics,
+                                             ServiceMetrics)
+from ynabintegrationslib.lib.tracing import (Span,
+                                             Tracer,
+                                             NoopTracer,
+                                             OpenTelemetryTracer,
+                                             JsonLinesExporter,
+                                             InMemoryExporter)
+from ynabintegrationslib.lib.profiling import CycleProfiler, ProfileWriter, SamplingProfiler
+from ynabintegrationslib.lib.telemetry import Telemetry
+from ynabintegrationslib.lib.polling import ArrivalHistogram, AdaptiveInterval
+from ynabintegrationslib.lib.scheduler import AccountSchedule, SyncDaemon
 
 __author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
 __docformat__ = '''google'''
@@ -47,7 +82,59 @@ __email__ = '''<costas.tyf@gmail.com>'''
 __status__ = '''Development'''  # "Prototype", "Development", "Production".
 
 # This is to 'use' the module(s), so lint doesn't complain
+assert YNAB_URL
+assert ServiceOptions
+assert assign_occurrences
+assert iter_with_occurrences
+assert YnabClient
 assert YnabContract
 assert YnabAccount
 assert YnabTransaction
 assert YnabServerTransaction
+assert TransactionRecord
+assert CacheStats
+assert TransactionCache
+assert BudgetTransactions
+assert MetadataCache
+assert TransactionStore
+assert PooledAdapter
+assert SessionManager
+assert RateLimiter
+assert RateLimitedAdapter
+assert ChunkResult
+assert UploadResult
+assert UploadBuffer
+assert Uploader
+assert chunk
+assert SqliteTransactionStore
+assert DbmTransactionStore
+assert BackfillCheckpoint
+assert BackfillEngine
+assert split_date_range
+assert CycleReport
+assert StageTiming
+assert Instrumentation
+assert submit_in_context
+assert bind_to_context
+assert Counter
+assert Gauge
+assert Histogram
+assert MetricsRegistry
+assert MetricsServer
+assert CycleMetrics
+assert ResourceMetrics
+assert ServiceMetrics
+assert Span
+assert Tracer
+assert NoopTracer
+assert OpenTelemetryTracer
+assert JsonLinesExporter
+assert InMemoryExporter
+assert CycleProfiler
+assert ProfileWriter
+assert SamplingProfiler
+assert Telemetry
+assert ArrivalHistogram
+assert AdaptiveInterval
+assert AccountSchedule
+assert SyncDaemon
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: backfill.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for backfill.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ynabintegrationslib.lib.core import assign_occurrences
+from ynabintegrationslib.lib.instrumentation import submit_in_context
+from ynabintegrationslib.lib.upload import ChunkResult, UploadResult
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''backfill'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+BACKFILL_RANGE_DAYS = 31
+
+
+def split_date_range(date_from, date_to, days):
+    """Splits a range of dates in consecutive ranges aligned on its start.
+
+    The ranges only depend on the start date, so the completed ones of a backfill that is resumed on a later day
+    are the same, only the last one grows.
+
+    Args:
+        date_from (str): The ISO formatted first date of the range
+        date_to (str): The ISO formatted last date of the range
+        days (int): The number of days of every range
+
+    Returns:
+        ranges (list): A list of (date_from, date_to) tuples of ISO formatted dates, most recent first
+
+    """
+    start = datetime.date.fromisoformat(date_from)
+    end = datetime.date.fromisoformat(date_to)
+    ranges = []
+    while start <= end:
+        last = min(start + datetime.timedelta(days=days - 1), end)
+        ranges.append((start.isoformat(), last.isoformat()))
+        start = last + datetime.timedelta(days=1)
+    return list(reversed(ranges))
+
+
+class BackfillCheckpoint:
+    """Models the completed ranges of the accounts of every budget backfilled, saved on a json file after every one.
+
+    Saving goes through a temporary file that replaces the checkpoint, so an interruption never leaves a partially
+    written checkpoint behind.
+
+    Args:
+        path (str): The path of the checkpoint file, None to keep the checkpoint in memory only
+
+    """
+
+    def __init__(self, path=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._lock = threading.Lock()
+        self.path = path
+        self._completed = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as checkpoint:
+                data = json.load(checkpoint)
+        except (OSError, ValueError):
+            self._logger.exception('Could not read checkpoint "%s", starting from scratch', self.path)
+            return {}
+        return {(budget, account): set(ranges)
+                for budget, accounts in data.get('completed', {}).items()
+                for account, ranges in accounts.items()}
+
+    def _save(self):
+        if not self.path:
+            return
+        completed = {}
+        for (budget, account), ranges in sorted(self._completed.items()):
+            completed.setdefault(budget, {})[account] = sorted(ranges)
+        data = {'completed': completed}
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump(data, checkpoint, indent=2)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temporary, self.path)
+
+    @staticmethod
+    def _key(date_range):
+        date_from, date_to = date_range
+        return f'{date_from}:{date_to}'
+
+    def is_completed(self, budget_name, account_name, date_range):
+        """Checks whether a range of an account is completed.
+
+        Args:
+            budget_name (str): The name of the budget the account is backfilled to
+            account_name (str): The name of the account
+            date_range (tuple): The (date_from, date_to) of the range
+
+        Returns:
+            bool (bool): True if the range is completed, False otherwise
+
+        """
+        with self._lock:
+            return self._key(date_range) in self._completed.get((budget_name, account_name), set())
+
+    def complete(self, budget_name, account_name, date_range):
+        """Marks a range of an account as completed and saves the checkpoint.
+
+        Args:
+            budget_name (str): The name of the budget the account is backfilled to
+            account_name (str): The name of the account
+            date_range (tuple): The (date_from, date_to) of the range
+
+        """
+        with self._lock:
+            self._completed.setdefault((budget_name, account_name), set()).add(self._key(date_range))
+            self._save()
+
+    def clear(self):
+        """Forgets all completed ranges and removes the checkpoint file."""
+        with self._lock:
+            self._completed = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class BackfillEngine:  # pylint: disable=too-few-public-methods
+    """Models the upload of all the bank transactions missing from a budget, split in ranges of dates.
+
+    The ranges of all the accounts of the budget are retrieved, compared with the budget and uploaded concurrently.
+    Every range that is uploaded is saved on the checkpoint under the budget, so an interrupted backfill resumes
+    with the ranges left and a checkpoint can be shared by the backfills of several budgets.
+
+    Args:
+        service (Service): The service with the accounts to backfill
+        checkpoint (BackfillCheckpoint): The checkpoint of the completed ranges, by default one in memory
+        range_days (int): The number of days of every range
+        max_workers (int): The maximum number of ranges to process in parallel
+
+    """
+
+    def __init__(self, service, checkpoint=None, range_days=BACKFILL_RANGE_DAYS, max_workers=4):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._service = service
+        self.checkpoint = checkpoint or BackfillCheckpoint()
+        self.range_days = range_days
+        self.max_workers = max_workers
+
+    def _get_range_transactions(self, account, date_range):
+        name = account.ynab_account.name
+        telemetry = self._service.telemetry
+        date_from, date_to = date_range
+        with telemetry.stage('fetch', name), \
+                telemetry.span('account.get_transactions_for_date_range',
+                               account=name,
+                               date_from=date_from,
+                               date_to=date_to) as span:
+            fetched = list(account.get_transactions_for_date_range(date_from, date_to))
+            span.set_attribute('transactions', len(fetched))
+        with telemetry.stage('filter', name):
+            # A range always holds whole dates so the occurrences are the same as over the whole history.
+            transactions = assign_occurrences(fetched)
+        telemetry.count('fetched', len(fetched), name)
+        telemetry.count('filtered', len(fetched) - len(transactions), name)
+        return transactions
+
+    def _backfill_range(self, budget_name, account, date_range, server_keys):
+        name = account.ynab_account.name
+        range_transactions = self._get_range_transactions(account, date_range)
+        with self._service.telemetry.stage('diff'):
+            transactions = [transaction for transaction in range_transactions
+                            if transaction.comparison_key not in server_keys]
+        self._service.telemetry.count('deduped', len(range_transactions) - len(transactions))
+        self._logger.debug('Uploading %s missing transactions of account "%s" from "%s" to "%s"',
+                           len(transactions),
+                           name,
+                           *date_range)
+        result = self._service.upload_transactions(transactions)
+        if result:
+            self.checkpoint.complete(budget_name, name, date_range)
+        else:
+            self._logger.error('Failed to upload range "%s" to "%s" of account "%s", it will be retried on resume',
+                               *date_range,
+                               name)
+        return result
+
+    def _backfill_ranges(self, budget, tasks, server_keys):
+        result = UploadResult()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(account,
+                        date_range,
+                        submit_in_context(executor, self._backfill_range, budget.name, account, date_range, server_keys))
+                       for account, date_range in tasks]
+            for account, date_range, future in futures:
+                try:
+                    result.chunks.extend(future.result().chunks)
+                except Exception:  # pylint: disable=broad-except
+                    self._logger.exception('Problem backfilling range "%s" to "%s" of account "%s"',
+                                           *date_range,
+                                           account.ynab_account.name)
+                    result.chunks.append(ChunkResult(budget.id, 0, False, 0.0))
+        return result
+
+    def run(self, budget_name=None, date_to=None):
+        """Uploads the transactions missing from the budget since its first transaction.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+            date_to (str): The ISO formatted last date to backfill, by default today
+
+        Returns:
+            result (UploadResult): The result of the upload of all the ranges
+
+        """
+        budget = self._service._get_budget(budget_name)  # pylint: disable=protected-access
+        if not budget:
+            self._logger.error('Could not get budget by name "%s"', budget_name)
+            return UploadResult()
+        server_transactions = self._service.get_transactions_for_budget(budget.name)
+        if not server_transactions:
+            self._logger.info('No transactions in the budget to get the first date from, nothing to backfill')
+            return UploadResult()
+        first_date = min(transaction.date for transaction in server_transactions)
+        server_keys = {transaction.comparison_key for transaction in server_transactions}
+        ranges = split_date_range(first_date, date_to or datetime.date.today().isoformat(), self.range_days)
+        accounts = [account for account in self._service.accounts if account.budget.id == budget.id]
+        tasks = [(account, date_range) for date_range in ranges for account in accounts
+                 if not self.checkpoint.is_completed(budget.name, account.ynab_account.name, date_range)]
+        self._logger.info('Backfilling %s ranges of %s days of budget "%s" since "%s", %s are already completed',
+                          len(tasks),
+                          self.range_days,
+                          budget.name,
+                          first_date,
+                          len(ranges) * len(accounts) - len(tasks))
+        return self._backfill_ranges(budget, tasks, server_keys)
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: cache.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for cache.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from ynabintegrationslib.lib.core import TransactionRecord
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''cache'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+
+class CacheStats:
+    """Models the counters of the lookups and additions of a cache."""
+
+    def __init__(self):
+        self.added = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self):
+        """The ratio of the lookups that were served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def record_lookup(self, hit):
+        """Counts a lookup.
+
+        Args:
+            hit (bool): True if the lookup was served from the cache
+
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+
+class TransactionCache:
+    """Models an insertion ordered set of seen transactions with constant time lookups.
+
+    Transactions are stored under their fingerprint which is a digest of the same attributes Comparable equality
+    is based on, so membership has the same semantics as a scan with "==" without keeping the transaction objects
+    alive. Being stable across processes the fingerprints can also be persisted and loaded back.
+
+    Args:
+        max_size (int): The maximum number of transactions to remember, the oldest are evicted first
+        max_age (int): The number of seconds to remember a transaction for, None to never expire them
+
+    """
+
+    def __init__(self, max_size, max_age=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.max_age = max_age
+        self.stats = CacheStats()
+
+    @property
+    def added(self):
+        """The number of transactions marked as seen."""
+        return self.stats.added
+
+    @property
+    def hits(self):
+        """The number of lookups of transactions that were already seen."""
+        return self.stats.hits
+
+    @property
+    def misses(self):
+        """The number of lookups of transactions that were not seen."""
+        return self.stats.misses
+
+    @property
+    def hit_ratio(self):
+        """The ratio of the lookups of transactions that were already seen."""
+        return self.stats.hit_ratio
+
+    @staticmethod
+    def _key(transaction):
+        return transaction.fingerprint
+
+    def _expire(self):
+        if self.max_age is None:
+            return
+        threshold = time.monotonic() - self.max_age
+        while self._entries and next(iter(self._entries.values())) < threshold:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, transaction):
+        key = self._key(transaction)
+        with self._lock:
+            self._expire()
+            seen = key in self._entries
+            self.stats.record_lookup(seen)
+            return seen
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    def add(self, transaction):
+        """Marks a transaction as seen.
+
+        Args:
+            transaction (Transaction): The transaction to remember
+
+        """
+        self.extend([transaction])
+
+    def extend(self, transactions):
+        """Marks transactions as seen.
+
+        Args:
+            transactions (list): The transactions to remember
+
+        """
+        self.load([self._key(transaction) for transaction in transactions])
+
+    def load(self, keys):
+        """Marks transactions as seen by their fingerprints.
+
+        Args:
+            keys (list): The fingerprints of the transactions to remember, oldest first
+
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._entries[key] = now
+            self.stats.added += len(keys)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._expire()
+
+    def clear(self):
+        """Forgets all seen transactions."""
+        with self._lock:
+            self._entries.clear()
+
+
+class BudgetTransactions:
+    """Models a local copy of the transactions of a YNAB budget that is kept up to date with delta requests.
+
+    The first refresh retrieves the budget, every following one only asks YNAB for what changed since the last
+    server knowledge it reported and applies the additions, updates and deletions in place.
+
+    The copy can be limited to a window of dates. Asking for a later start date than the current window drops the
+    transactions that fall out of it, asking for an earlier one retrieves the wider window from scratch.
+
+    Args:
+        ynab (Ynab): The authenticated YNAB service
+        budget (Budget): The budget to keep the transactions of
+
+    """
+
+    def __init__(self, ynab, budget):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._ynab = ynab
+        self._transactions = {}
+        self._lock = threading.Lock()
+        self.budget = budget
+        self.server_knowledge = None
+        self.since_date = None
+
+    @property
+    def transactions(self):
+        """The locally cached transactions of the budget."""
+        return self.get_transactions()
+
+    def get_transactions(self, since_date=None):
+        """Retrieves the locally cached transactions of the budget.
+
+        Args:
+            since_date (str): An ISO formatted date to limit the transactions to the ones on or after it
+
+        Returns:
+            transactions (list): A list of TransactionRecord objects
+
+        """
+        with self._lock:
+            if since_date is None:
+                return list(self._transactions.values())
+            return [transaction for transaction in self._transactions.values() if transaction.date >= since_date]
+
+    def _covers(self, since_date):
+        if self.server_knowledge is None:
+            return False
+        return self.since_date is None or (since_date is not None and since_date >= self.since_date)
+
+    def _shrink(self, since_date):
+        self._transactions = {id_: transaction for id_, transaction in self._transactions.items()
+                              if transaction.date >= since_date}
+        self.since_date = since_date
+
+    def refresh(self, since_date=None, shrink=True):
+        """Applies the changes on the server since the last refresh to the local transactions.
+
+        Args:
+            since_date (str): An ISO formatted date to limit the local copy to, None for the whole budget
+            shrink (bool): If False a wider local copy is kept as is instead of dropping what falls out of the window
+
+        Returns:
+            bool (bool): True on success, False otherwise
+
+        """
+        url = f'{self._ynab.api_url}/budgets/{self.budget.id}/transactions'
+        with self._lock:
+            if not self._covers(since_date):
+                self._logger.debug('Local copy does not cover "%s", retrieving the window from scratch', since_date)
+                self._transactions = {}
+                self.server_knowledge = None
+                self.since_date = since_date
+            elif shrink and since_date is not None and (self.since_date is None or since_date > self.since_date):
+                self._shrink(since_date)
+            params = {}
+            if self.since_date is not None:
+                params['since_date'] = self.since_date
+            if self.server_knowledge is not None:
+                params['last_knowledge_of_server'] = self.server_knowledge
+            response = self._ynab.session.get(url, params=params)
+            if not response.ok:
+                self._logger.error('Error retrieving transactions, response was : %s with status code : %s',
+                                   response.text,
+                                   response.status_code)
+                return False
+            data = response.json().get('data', {})
+            self._apply(data.get('transactions', []))
+            self.server_knowledge = data.get('server_knowledge')
+        return True
+
+    def _apply(self, changes):
+        deleted = 0
+        for change in changes:
+            if change.get('deleted'):
+                deleted += 1 if self._transactions.pop(change.get('id'), None) else 0
+                continue
+            self._transactions[change.get('id')] = TransactionRecord.from_data(change, self.budget.id)
+        self._logger.debug('Applied %s changes with %s deletions to budget "%s" from server knowledge %s',
+                           len(changes),
+                           deleted,
+                           self.budget.name,
+                           self.server_knowledge)
+
+    def clear(self):
+        """Drops the local transactions so the next refresh retrieves them from scratch."""
+        with self._lock:
+            self._transactions = {}
+            self.server_knowledge = None
+            self.since_date = None
+
+
+class MetadataCache:  # pylint: disable=too-many-instance-attributes
+    """Models a time bound cache of the budgets and accounts of YNAB with name indexes.
+
+    Args:
+        ynab (Ynab): The authenticated YNAB service
+        ttl (int): The number of seconds the metadata is considered fresh for
+
+    """
+
+    def __init__(self, ynab, ttl):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._ynab = ynab
+        self._lock = threading.RLock()
+        self._budgets = None
+        self._budgets_by_name = {}
+        self._accounts_by_name = {}
+        self._expires_at = 0
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self):
+        """The ratio of the lookups that were served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def invalidate(self):
+        """Marks the cached metadata as stale so the next lookup retrieves it again."""
+        with self._lock:
+            self._expires_at = 0
+
+    def _is_fresh(self):
+        return self._budgets is not None and time.monotonic() < self._expires_at
+
+    @property
+    def budgets(self):
+        """Budgets."""
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._budgets
+            self.misses += 1
+            if self._budgets is not None:
+                # The YNAB service keeps its own unbounded caches which need to be dropped to get fresh data.
+                self._ynab.refresh()
+            budgets = self._ynab.budgets
+            self._budgets_by_name = {budget.name.lower(): budget for budget in budgets}
+            self._accounts_by_name = {}
+            self._budgets = budgets
+            self._expires_at = time.monotonic() + self.ttl if budgets else 0
+            self._logger.debug('Retrieved %s budgets, caching them for %s seconds', len(budgets), self.ttl)
+            return self._budgets
+
+    def get_budget_by_name(self, name):
+        """Retrieves a budget by name.
+
+        Args:
+            name (str): The name of the budget to retrieve
+
+        Returns:
+            budget (Budget): A budget object on success, None otherwise
+
+        """
+        with self._lock:
+            _ = self.budgets
+            return self._budgets_by_name.get(name.lower())
+
+    def get_account_by_name(self, budget, name):
+        """Retrieves an account of a budget by name.
+
+        Args:
+            budget (Budget): The budget the account belongs to
+            name (str): The name of the account to retrieve
+
+        Returns:
+            account (Account): An account object on success, None otherwise
+
+        """
+        with self._lock:
+            _ = self.budgets
+            accounts = self._accounts_by_name.get(budget.id)
+            if accounts is None:
+                self.misses += 1
+                accounts = {account.name.lower(): account for account in budget.accounts}
+                if accounts:
+                    self._accounts_by_name[budget.id] = accounts
+            else:
+                self.hits += 1
+            return accounts.get(name.lower())
@@ -32,10 +32,16 @@ Main code for core.
 """
 
 import abc
+import hashlib
+import json
 import logging
 import importlib
+from collections import Counter
+from typing import NamedTuple
 
 from ynabinterfaceslib import Comparable
+from ynablib import Ynab
+from ynablib.ynablibexceptions import AuthenticationFailed
 
 from ynabintegrationslib.ynabintegrationslibexceptions import InvalidAccount, InvalidBudget
 
@@ -54,15 +60,106 @@ LOGGER_BASENAME = '''core'''
 LOGGER = logging.getLogger(LOGGER_BASENAME)
 LOGGER.addHandler(logging.NullHandler())
 
+YNAB_URL = 'https://api.youneedabudget.com'
+
+
+def _import_id(amount, date, occurrence):
+    return f'YNAB:{amount}:{date}:{occurrence}'
+
+
+def _fingerprint(comparison_key):
+    values = json.dumps(list(comparison_key), default=str)
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()
+
+
+def assign_occurrences(transactions, newest_first=True):
+    """Numbers the transactions of an account that share amount and date, oldest first, for their import ids.
+
+    The numbering only matches the one over the full history for the dates whose transactions are all provided,
+    which the adapters make sure of for the latest transactions.
+
+    Args:
+        transactions (list): The TransactionRecord objects of a single account in the order the bank returned them
+        newest_first (bool): True if the bank returned the most recent transactions first
+
+    Returns:
+        transactions (list): The records with the import ids of their occurrences, in the order provided
+
+    """
+    counters = Counter()
+    occurrences = []
+    for transaction in (reversed(transactions) if newest_first else transactions):
+        key = (transaction.account_id, transaction.amount, transaction.date)
+        counters[key] += 1
+        occurrences.append(counters[key])
+    if newest_first:
+        occurrences.reverse()
+    return [transaction.with_occurrence(occurrence) for transaction, occurrence in zip(transactions, occurrences)]
+
+
+def iter_with_occurrences(transactions):
+    """Numbers the transactions of an account like assign_occurrences for a streaming pipeline.
+
+    The bank returns the transactions in booking order, where a date can come back after older ones, and the
+    oldest transaction of an amount and date is the first occurrence, so the numbering is only known once the
+    whole stream of the account is read. The records of the account are held until then, which are compact
+    next to the bank transactions, and are yielded one by one for the rest of the pipeline.
+
+    Args:
+        transactions (iterable): The TransactionRecord objects of a single account in the order the bank returned them
+
+    Returns:
+        transactions (generator): The records with the import ids of their occurrences, in the order provided
+
+    """
+    yield from assign_occurrences(list(transactions))
+
+
+class YnabClient(Ynab):
+    """Models the ynab service on a session provided by a session factory.
+
+    ynablib has no way to pass a session in, so the client overrides its private _get_authenticated_session. This
+    depends on the internals of ynablib 0.2.2, which the requirements pin, and has to be checked on an upgrade.
+
+    Args:
+        token (str): The token to authenticate with YNAB
+        url (str): The url of the YNAB api
+        session_factory (callable): A callable returning the requests session to use, by default a plain one
+
+    """
+
+    def __init__(self, token, url=YNAB_URL, session_factory=None):
+        self._session_factory = session_factory
+        super().__init__(token, url)
+
+    def _get_authenticated_session(self, token):
+        if self._session_factory is None:
+            return super()._get_authenticated_session(token)
+        self._logger.debug('Trying to authenticate with provided token.')
+        session = self._session_factory()
+        session.headers.update({'Authorization': f'Bearer {token}'})
+        response = session.get(f'{self.api_url}/budgets')
+        if not response.ok:
+            raise AuthenticationFailed(response.text)
+        self._logger.debug('Successfully authenticated to YNAB.')
+        return session
+
 
 class YnabContract:  # pylint: disable=too-few-public-methods
     """Models a ynab contract."""
 
-    def __init__(self, name, bank, contract_type, credentials):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 name,
+                 bank,
+                 contract_type,
+                 credentials,
+                 session_manager=None):
         self.name = name
         self.bank = bank
         self.type = contract_type
         self.contract = self._get_contract(bank, contract_type, credentials)
+        if session_manager:
+            session_manager.mount(self.contract.session)
 
     @staticmethod
     def _get_contract(bank, type_, credentials):
@@ -74,11 +171,17 @@ class YnabContract:  # pylint: disable=too-few-public-methods
 class YnabAccount(Comparable):
     """Models a YNAB account."""
 
-    def __init__(self, bank_account, ynab_service, budget_name, ynab_account_name):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 bank_account,
+                 ynab_service,
+                 budget_name,
+                 ynab_account_name,
+                 metadata_cache=None):
         super().__init__(bank_account._data)
         self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
         self.bank_account = bank_account
         self.ynab = ynab_service
+        self._metadata_cache = metadata_cache
         self._budget, self._ynab_account = self._get_budget_and_account(budget_name, ynab_account_name)
 
     @property
@@ -87,10 +190,16 @@ class YnabAccount(Comparable):
                 'ynab_account']
 
     def _get_budget_and_account(self, budget_name, account_name):
-        budget = self.ynab.get_budget_by_name(budget_name)
+        if self._metadata_cache:
+            budget = self._metadata_cache.get_budget_by_name(budget_name)
+        else:
+            budget = self.ynab.get_budget_by_name(budget_name)
         if not budget:
             raise InvalidBudget(budget_name)
-        account = budget.get_account_by_name(account_name)
+        if self._metadata_cache:
+            account = self._metadata_cache.get_account_by_name(budget, account_name)
+        else:
+            account = budget.get_account_by_name(account_name)
         if not account:
             raise InvalidAccount(account_name)
         return budget, account
@@ -105,6 +214,20 @@ class YnabAccount(Comparable):
         """Ynab account."""
         return self._ynab_account
 
+    @property
+    @abc.abstractmethod
+    def _transaction_class(self):
+        """The YnabTransaction class that reads the transactions of the bank."""
+
+    def _to_records(self, bank_transactions):
+        for bank_transaction in bank_transactions:
+            transaction = self._transaction_class(bank_transaction, self._ynab_account)
+            # ICS Credit card creates an unusable transaction with no date like
+            # "Incasso okt 2019 betreffende uw creditcard ICS-klantnummer XXXXXXX"
+            if transaction.is_reserved or transaction.date is None:
+                continue
+            yield transaction.to_record()
+
     @abc.abstractmethod
     def transactions(self):
         """Transactions."""
@@ -113,15 +236,142 @@ class YnabAccount(Comparable):
     def get_latest_transactions(self):
         """Retrieves latest transactions from account."""
 
+    @abc.abstractmethod
+    def get_transactions_for_date_range(self, date_from, date_to):
+        """Retrieves the transactions between two ISO formatted dates, both inclusive."""
+
+
+class TransactionRecord(NamedTuple):
+    """Models an immutable, compact copy of a transaction with all its attributes computed once.
+
+    The adapters read the transactions of the banks into records and the transactions of a budget are kept as
+    records too. Records compare equal to any YnabTransaction or record with the same comparison key, so the bank
+    and the budget sides can be diffed against each other.
+
+    Args:
+        account_id (str): The ID of the YNAB account of the transaction
+        budget_id (str): The ID of the YNAB budget of the transaction
+        amount (int): The amount in milliunits
+        date (str): The ISO formatted date
+        payee_name (str): The name of the payee
+        memo (str): The memo
+        import_id (str): The import ID if any
+        id (str): The ID of the transaction on YNAB if it is uploaded
+        account_name (str): The name of the YNAB account of the transaction
+
+    """
+
+    account_id: str
+    budget_id: str
+    amount: int
+    date: str
+    payee_name: str
+    memo: str
+    import_id: str = None
+    id: str = None
+    account_name: str = None
+
+    @classmethod
+    def from_data(cls, data, budget_id):
+        """Creates a record from a transaction as returned by the YNAB api.
+
+        Args:
+            data (dict): The transaction data
+            budget_id (str): The ID of the budget the transaction belongs to
+
+        Returns:
+            record (TransactionRecord): The record of the transaction
+
+        """
+        return cls(data.get('account_id'),
+                   budget_id,
+                   data.get('amount'),
+                   data.get('date'),
+                   data.get('payee_name'),
+                   data.get('memo'),
+                   data.get('import_id'),
+                   data.get('id'),
+                   data.get('account_name'))
+
+    @property
+    def comparison_key(self):
+        """The values of the comparable attributes the record is hashed and compared on."""
+        return self.account_id, self.amount, self.memo, self.date
+
+    @property
+    def fingerprint(self):
+        """A digest of the comparable attributes that is stable across processes, unlike the hash."""
+        return _fingerprint(self.comparison_key)
+
+    def with_occurrence(self, occurrence):
+        """Creates a copy of the record with the import id of an occurrence of its amount and date.
+
+        Args:
+            occurrence (int): The number of the transaction among the ones of its account with its amount and date
+
+        Returns:
+            record (TransactionRecord): The record with the import id
+
+        """
+        return TransactionRecord(self.account_id,
+                                 self.budget_id,
+                                 self.amount,
+                                 self.date,
+                                 self.payee_name,
+                                 self.memo,
+                                 _import_id(self.amount, self.date, occurrence),
+                                 self.id,
+                                 self.account_name)
+
+    def __hash__(self):
+        return hash(self.comparison_key)
+
+    def __eq__(self, other):
+        key = getattr(other, 'comparison_key', None)
+        if key is None:
+            return NotImplemented
+        return self.comparison_key == key
+
+    def __ne__(self, other):
+        key = getattr(other, 'comparison_key', None)
+        if key is None:
+            return NotImplemented
+        return self.comparison_key != key
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(account_id={self.account_id!r}, amount={self.amount!r}, '
+                f'date={self.date!r}, payee_name={self.payee_name!r}, import_id={self.import_id!r})')
+
+    @property
+    def payload(self):
+        """Payload."""
+        return {'account_id': self.account_id,
+                'amount': self.amount,
+                'payee_name': self.payee_name,
+                'memo': self.memo,
+                'date': self.date,
+                'import_id': self.import_id}
+
 
 class YnabTransaction(Comparable):
-    """Models the interface for ynab transaction."""
+    """Models the interface for ynab transaction.
 
-    def __init__(self, transaction, account):
-        super().__init__(transaction._data)
-        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+    Transactions share a logger per class instead of creating one per instance. Hashing and equality use a key of
+    the comparable attributes that is computed once, as the attributes are derived from immutable bank data.
+    """
+
+    _logger = logging.getLogger(f'{LOGGER_BASENAME}.YnabTransaction')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._logger = logging.getLogger(f'{LOGGER_BASENAME}.{cls.__name__}')
+
+    def __init__(self, transaction, account):  # pylint: disable=super-init-not-called
+        self._data = transaction._data
         self._transaction = transaction
         self.account = account
+        self.occurrence = 1
+        self._comparison_key = None
 
     @property
     def _comparable_attributes(self):
@@ -130,11 +380,65 @@ class YnabTransaction(Comparable):
                 'memo',
                 'date']
 
+    @property
+    def comparison_key(self):
+        """The values of the comparable attributes the transaction is hashed and compared on."""
+        if self._comparison_key is None:
+            self._comparison_key = tuple(getattr(self, key) for key in self._comparable_attributes)
+        return self._comparison_key
+
+    def __hash__(self):
+        return hash(self.comparison_key)
+
+    def __eq__(self, other):
+        key = getattr(other, 'comparison_key', None)
+        if key is None:
+            return super().__eq__(other)
+        return self.comparison_key == key
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def budget_id(self):
+        """Budget ID."""
+        return self.account.budget.id
+
+    def to_record(self):
+        """Creates an immutable record of the transaction with all its attributes computed once.
+
+        Returns:
+            record (TransactionRecord): The record of the transaction
+
+        """
+        return TransactionRecord(self.account_id,
+                                 self.budget_id,
+                                 self.amount,
+                                 self.date,
+                                 self.payee_name,
+                                 self.memo,
+                                 self.import_id,
+                                 account_name=self.account.name)
+
+    @property
+    def import_id(self):
+        """Import ID in the format YNAB uses for its own imports, "YNAB:[milliunit amount]:[date]:[occurrence]".
+
+        YNAB rejects a transaction with an import id that already exists on the account and reports it back as a
+        duplicate, which makes uploads idempotent.
+        """
+        return _import_id(self.amount, self.date, self.occurrence)
+
     @property
     def account_id(self):
         """Account ID."""
         return self.account.id
 
+    @property
+    def fingerprint(self):
+        """A digest of the comparable attributes that is stable across processes, unlike the hash."""
+        return _fingerprint(self.comparison_key)
+
     @abc.abstractmethod
     def amount(self):
         """Amount."""
@@ -151,6 +455,11 @@ class YnabTransaction(Comparable):
     def date(self):
         """Date."""
 
+    @property
+    def is_reserved(self):
+        """True if the transaction is only reserved on the account and not booked yet."""
+        return False
+
     @staticmethod
     def _clean_up(string):
         return " ".join(string.split()) if string else ''
@@ -162,12 +471,23 @@ class YnabTransaction(Comparable):
                 'amount': self.amount,
                 'payee_name': self.payee_name,
                 'memo': self.memo,
-                'date': self.date}
+                'date': self.date,
+                'import_id': self.import_id}
 
 
 class YnabServerTransaction(YnabTransaction):
     """Models an ynab uploaded transaction."""
 
+    @property
+    def account_id(self):
+        """Account ID."""
+        return self._data.get('account_id')
+
+    @property
+    def import_id(self):
+        """Import ID."""
+        return self._data.get('import_id')
+
     @property
     def amount(self):
         """Amount."""
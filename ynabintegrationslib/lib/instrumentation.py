@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: instrumentation.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for instrumentation.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import contextvars
+import functools
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''instrumentation'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+_CURRENT_CYCLE = contextvars.ContextVar('current_cycle', default=None)
+
+
+def submit_in_context(executor, function, *args, **kwargs):
+    """Submits a call to an executor in a copy of the current context, so it is accounted to the running cycle.
+
+    Args:
+        executor (Executor): The executor to submit the call to
+        function (callable): The function to call
+        *args: The arguments of the function
+        **kwargs: The keyword arguments of the function
+
+    Returns:
+        future (Future): The future of the call
+
+    """
+    return executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+
+def bind_to_context(function, *args, **kwargs):
+    """Binds a call to a copy of the current context, for executors that take a callable like run_in_executor.
+
+    Args:
+        function (callable): The function to call
+        *args: The arguments of the function
+        **kwargs: The keyword arguments of the function
+
+    Returns:
+        call (callable): A callable without arguments that makes the call in the copied context
+
+    """
+    return functools.partial(contextvars.copy_context().run, function, *args, **kwargs)
+
+
+@dataclass
+class StageTiming:
+    """Models the time spent in a stage of a cycle, over all the times the stage ran."""
+
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+
+    def add(self, wall, cpu):
+        """Adds a run of the stage.
+
+        Args:
+            wall (float): The wall clock seconds of the run
+            cpu (float): The CPU seconds of the thread during the run
+
+        """
+        self.wall += wall
+        self.cpu += cpu
+        self.calls += 1
+
+
+@dataclass
+class CycleReport:  # pylint: disable=too-many-instance-attributes
+    """Models the timings and counts of a cycle of the service, per stage and per account.
+
+    Stages are timed on the thread they run on, so the stages of accounts fetched in parallel add up to more than
+    the wall clock time of the cycle. The CPU time of the cycle is the one of the whole process.
+    """
+
+    cycle_id: int
+    operation: str
+    started_at: float
+    wall: float = 0.0
+    cpu: float = 0.0
+    stages: dict = field(default_factory=dict)
+    accounts: dict = field(default_factory=dict)
+    counts: Counter = field(default_factory=Counter)
+    account_counts: dict = field(default_factory=dict)
+    failed_accounts: list = field(default_factory=list)
+    error: str = None
+    result: object = field(default=None, repr=False)
+    _lock: object = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def success(self):
+        """True if the cycle did not raise, all its accounts were retrieved and its upload, if any, succeeded."""
+        return (self.error is None
+                and not self.failed_accounts
+                and (self.result is None or not hasattr(self.result, 'chunks') or bool(self.result)))
+
+    def add_timing(self, stage, wall, cpu, account=None):
+        """Adds a run of a stage.
+
+        Args:
+            stage (str): The name of the stage
+            wall (float): The wall clock seconds of the run
+            cpu (float): The CPU seconds of the thread during the run
+            account (str): The name of the account the run was for, None if it was not for a single account
+
+        """
+        with self._lock:
+            self.stages.setdefault(stage, StageTiming()).add(wall, cpu)
+            if account is not None:
+                self.accounts.setdefault(account, {}).setdefault(stage, StageTiming()).add(wall, cpu)
+
+    def add_count(self, name, value, account=None):
+        """Adds to a count.
+
+        Args:
+            name (str): The name of the count
+            value (int): The number to add
+            account (str): The name of the account the count is for, None if it is not for a single account
+
+        """
+        with self._lock:
+            self.counts[name] += value
+            if account is not None:
+                self.account_counts.setdefault(account, Counter())[name] += value
+
+    def add_failed_account(self, account):
+        """Adds an account whose transactions could not be retrieved.
+
+        Args:
+            account (str): The name of the account
+
+        """
+        with self._lock:
+            if account not in self.failed_accounts:
+                self.failed_accounts.append(account)
+
+    def to_dict(self):
+        """Converts the report to json serializable primitives.
+
+        Returns:
+            report (dict): The report
+
+        """
+        with self._lock:
+            return {'cycle_id': self.cycle_id,
+                    'operation': self.operation,
+                    'started_at': self.started_at,
+                    'wall': self.wall,
+                    'cpu': self.cpu,
+                    'success': self.success,
+                    'error': self.error,
+                    'stages': {stage: asdict(timing) for stage, timing in self.stages.items()},
+                    'accounts': {account: {'stages': {stage: asdict(timing) for stage, timing in stages.items()},
+                                           'counts': dict(self.account_counts.get(account, {}))}
+                                 for account, stages in self.accounts.items()},
+                    'counts': dict(self.counts),
+                    'failed_accounts': list(self.failed_accounts)}
+
+
+class Instrumentation:
+    """Models the recording of the timings and counts of the cycles of a service.
+
+    A cycle is a call to one of the public operations of the service. The report of the running cycle is kept in a
+    context variable, so stages and counts recorded by the internals of the service, on any thread the call was
+    submitted to with submit_in_context, are accounted to it. Outside of a cycle recording does nothing.
+
+    Every finished report is passed to the registered hooks, whose failures are logged and otherwise ignored.
+
+    Args:
+        hooks (list): Callables that are called with every finished CycleReport
+
+    """
+
+    def __init__(self, hooks=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._hooks = list(hooks or [])
+        self._cycle_ids = itertools.count(1)
+        self.last_report = None
+
+    @property
+    def current(self):
+        """The report of the running cycle, None outside of a cycle."""
+        return _CURRENT_CYCLE.get()
+
+    def add_hook(self, hook):
+        """Registers a hook that is called with every finished CycleReport.
+
+        Args:
+            hook (callable): The hook
+
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Unregisters a hook.
+
+        Args:
+            hook (callable): The hook
+
+        """
+        self._hooks.remove(hook)
+
+    def _notify(self, report):
+        for hook in list(self._hooks):
+            try:
+                hook(report)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception('Cycle hook %r failed on cycle %s', hook, report.cycle_id)
+
+    @contextmanager
+    def cycle(self, operation):
+        """Records a cycle, a call within a running cycle is accounted to it instead.
+
+        Args:
+            operation (str): The name of the operation of the cycle
+
+        Yields:
+            report (CycleReport): The report of the cycle
+
+        """
+        report = _CURRENT_CYCLE.get()
+        if report is not None:
+            yield report
+            return
+        report = CycleReport(next(self._cycle_ids), operation, time.time())
+        token = _CURRENT_CYCLE.set(report)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield report
+        except BaseException as error:
+            report.error = repr(error)
+            raise
+        finally:
+            _CURRENT_CYCLE.reset(token)
+            report.wall = time.perf_counter() - wall
+            report.cpu = time.process_time() - cpu
+            self.last_report = report
+            self._logger.debug('Cycle %s of "%s" took %.3fs wall and %.3fs CPU',
+                               report.cycle_id,
+                               operation,
+                               report.wall,
+                               report.cpu)
+            self._notify(report)
+
+    @contextmanager
+    def stage(self, name, account=None):
+        """Times a stage of the running cycle.
+
+        Args:
+            name (str): The name of the stage
+            account (str): The name of the account the stage is for, None if it is not for a single account
+
+        """
+        report = _CURRENT_CYCLE.get()
+        if report is None:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            report.add_timing(name, time.perf_counter() - wall, time.thread_time() - cpu, account)
+
+    def count(self, name, value, account=None):
+        """Adds to a count of the running cycle.
+
+        Args:
+            name (str): The name of the count
+            value (int): The number to add
+            account (str): The name of the account the count is for, None if it is not for a single account
+
+        """
+        report = _CURRENT_CYCLE.get()
+        if report is not None:
+            report.add_count(name, value, account)
+
+    def fail_account(self, account):
+        """Records an account whose transactions could not be retrieved in the running cycle.
+
+        Args:
+            account (str): The name of the account
+
+        """
+        report = _CURRENT_CYCLE.get()
+        if report is not None:
+            report.add_failed_account(account)
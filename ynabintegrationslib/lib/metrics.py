@@ -0,0 +1,563 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: metrics.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for metrics.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''metrics'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+METRICS_PREFIX = 'ynabintegrationslib'
+METRICS_PORT = 9464
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Models a family of samples of a metric, one per combination of label values.
+
+    Args:
+        name (str): The name of the metric
+        documentation (str): The help text of the metric
+        labels (tuple): The names of the labels of the metric
+
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self._lock = threading.Lock()
+        self._values = {}
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'Metric "{self.name}" takes the labels {self.labels}, got {tuple(labels)}')
+        return tuple((name, str(labels[name])) for name in self.labels)
+
+    def samples(self):
+        """Retrieves the samples of the metric.
+
+        Returns:
+            samples (list): Tuples of the name, the labels and the value of every sample
+
+        """
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self):
+        """Renders the metric in the Prometheus text format.
+
+        Returns:
+            text (str): The lines of the metric
+
+        """
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}' for name, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Models a metric that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, value=1, **labels):
+        """Increments the counter.
+
+        Args:
+            value (float): The amount to increment by, can not be negative
+            **labels: The values of the labels of the sample
+
+        """
+        if value < 0:
+            raise ValueError('Counters can only be incremented by non negative amounts')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    """Models a metric that is set to its current value, or computed by a function when it is collected."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        """Sets the value of the gauge.
+
+        Args:
+            value (float): The value
+            **labels: The values of the labels of the sample
+
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+        """Computes the value of the gauge with a function every time it is collected.
+
+        Args:
+            function (callable): A function without arguments returning the value
+            **labels: The values of the labels of the sample
+
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def samples(self):
+        """Retrieves the samples of the gauge, computing the ones that are set to a function."""
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception('Could not compute gauge "%s"', self.name)
+        return [(self.name, key, value) for key, value in values.items()]
+
+
+class Histogram(Metric):
+    """Models a metric that counts observations in cumulative buckets.
+
+    Args:
+        name (str): The name of the metric
+        documentation (str): The help text of the metric
+        labels (tuple): The names of the labels of the metric
+        buckets (tuple): The upper bounds of the buckets, sorted
+
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Records an observation.
+
+        Args:
+            value (float): The observed value
+            **labels: The values of the labels of the sample
+
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        """Retrieves the bucket, sum and count samples of the histogram."""
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        samples = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', (*key, ('le', _format_value(float(bound)))), cumulative))
+            samples.append((f'{self.name}_sum', key, total))
+            samples.append((f'{self.name}_count', key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Models a collection of metrics that is rendered in the Prometheus text format.
+
+    Metrics are created on first use and the same metric is returned for the same name afterwards, so several
+    components can feed a metric without coordinating its creation.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, metric_class, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labels, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f'Metric "{name}" is already registered as a {metric.kind}')
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        """Retrieves a counter, creating it if needed.
+
+        Args:
+            name (str): The name of the metric
+            documentation (str): The help text of the metric
+            labels (tuple): The names of the labels of the metric
+
+        Returns:
+            counter (Counter): The counter
+
+        """
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        """Retrieves a gauge, creating it if needed.
+
+        Args:
+            name (str): The name of the metric
+            documentation (str): The help text of the metric
+            labels (tuple): The names of the labels of the metric
+
+        Returns:
+            gauge (Gauge): The gauge
+
+        """
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Retrieves a histogram, creating it if needed.
+
+        Args:
+            name (str): The name of the metric
+            documentation (str): The help text of the metric
+            labels (tuple): The names of the labels of the metric
+            buckets (tuple): The upper bounds of the buckets
+
+        Returns:
+            histogram (Histogram): The histogram
+
+        """
+        return self._get_or_create(Histogram, name, documentation, labels, buckets=buckets)
+
+    def get(self, name):
+        """Retrieves a metric by name.
+
+        Args:
+            name (str): The name of the metric
+
+        Returns:
+            metric (Metric): The metric if registered, None otherwise
+
+        """
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self):
+        """Renders all metrics in the Prometheus text format.
+
+        Returns:
+            text (str): The exposition of the metrics
+
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(f'{metric.render()}\n' for metric in metrics)
+
+    def serve(self, host='127.0.0.1', port=METRICS_PORT):
+        """Serves the metrics on a background thread.
+
+        Args:
+            host (str): The address to listen on
+            port (int): The port to listen on, 0 for any free port
+
+        Returns:
+            server (MetricsServer): The started server
+
+        """
+        return MetricsServer(self, host, port).start()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa: N802 pylint: disable=invalid-name
+        """Serves the exposition of the registry on /metrics."""
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug(format, *args)
+
+
+class MetricsServer:
+    """Models an HTTP endpoint serving the metrics of a registry on /metrics for Prometheus to scrape.
+
+    Args:
+        registry (MetricsRegistry): The registry to serve
+        host (str): The address to listen on
+        port (int): The port to listen on, 0 for any free port
+
+    """
+
+    def __init__(self, registry, host='127.0.0.1', port=METRICS_PORT):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.registry = registry
+        self._thread = None
+
+    @property
+    def url(self):
+        """The url of the metrics endpoint."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def start(self):
+        """Starts serving on a background thread.
+
+        Returns:
+            server (MetricsServer): The server
+
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+            self._logger.info('Serving metrics on %s', self.url)
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class CycleMetrics:
+    """Models the metrics of the cycles of a service, fed by their reports.
+
+    Args:
+        registry (MetricsRegistry): The registry to create the metrics on
+        prefix (str): The prefix of the names of the metrics
+
+    """
+
+    def __init__(self, registry, prefix=METRICS_PREFIX):
+        self.cycles = registry.counter(f'{prefix}_cycles_total', 'Cycles of the service.', ('operation', 'outcome'))
+        self.cycle_duration = registry.histogram(f'{prefix}_cycle_duration_seconds',
+                                                 'Wall clock duration of the cycles.',
+                                                 ('operation',))
+        self.cycle_cpu = registry.counter(f'{prefix}_cycle_cpu_seconds_total',
+                                          'CPU time of the process during the cycles.',
+                                          ('operation',))
+        self.stage_duration = registry.counter(f'{prefix}_stage_duration_seconds_total',
+                                               'Wall clock time spent in every stage of the cycles.',
+                                               ('stage',))
+        self.fetch_duration = registry.histogram(f'{prefix}_account_fetch_duration_seconds',
+                                                 'Duration of the retrieval of the transactions of an account.',
+                                                 ('account',))
+        self.transactions = registry.counter(f'{prefix}_transactions_total',
+                                             'Transactions fetched, filtered, deduped, uploaded and rejected as '
+                                             'duplicates.',
+                                             ('kind',))
+        self.account_transactions = registry.counter(f'{prefix}_account_transactions_total',
+                                                     'Transactions fetched and filtered per account.',
+                                                     ('account', 'kind'))
+
+    def on_cycle(self, report):
+        """Records a finished cycle, to be registered as a cycle hook.
+
+        Args:
+            report (CycleReport): The report of the cycle
+
+        """
+        self.cycles.inc(operation=report.operation, outcome='success' if report.success else 'failure')
+        self.cycle_duration.observe(report.wall, operation=report.operation)
+        self.cycle_cpu.inc(max(report.cpu, 0.0), operation=report.operation)
+        for stage, timing in report.stages.items():
+            self.stage_duration.inc(timing.wall, stage=stage)
+        for kind, value in report.counts.items():
+            self.transactions.inc(value, kind=kind)
+        for account in report.accounts.keys() | report.account_counts.keys():
+            self.on_account(account, report.accounts.get(account, {}), report.account_counts.get(account, {}))
+
+    def on_account(self, account, stages, counts):
+        """Records the part of a cycle of an account.
+
+        Args:
+            account (str): The name of the account
+            stages (dict): The StageTiming objects of the account by stage
+            counts (dict): The transaction counts of the account by kind
+
+        """
+        if 'fetch' in stages:
+            self.fetch_duration.observe(stages['fetch'].wall, account=account)
+        for kind, value in counts.items():
+            self.account_transactions.inc(value, account=account, kind=kind)
+
+
+class ResourceMetrics:
+    """Models the metrics of the YNAB requests and the components of a service.
+
+    Rate limit headroom, cache hit ratios and connection reuse are computed when they are collected.
+
+    Args:
+        registry (MetricsRegistry): The registry to create the metrics on
+        prefix (str): The prefix of the names of the metrics
+
+    """
+
+    def __init__(self, registry, prefix=METRICS_PREFIX):
+        self.ynab_requests = registry.counter(f'{prefix}_ynab_requests_total',
+                                              'Requests to YNAB by method and status code, throttled ones included.',
+                                              ('method', 'status'))
+        self.rate_limit_remaining = registry.gauge(f'{prefix}_rate_limit_remaining',
+                                                   'Requests that can be made to YNAB before being rate limited.')
+        self.cache_hit_ratio = registry.gauge(f'{prefix}_cache_hit_ratio',
+                                              'Ratio of the lookups served from a cache.',
+                                              ('cache',))
+        self.connection_reuse_ratio = registry.gauge(f'{prefix}_connection_reuse_ratio',
+                                                     'Ratio of the requests sent on a reused connection.')
+
+    def bind(self, rate_limiter, session_manager, metadata_cache, transactions_cache):
+        """Collects the gauges of the components of a service.
+
+        Args:
+            rate_limiter (RateLimiter): The rate limiter of the YNAB requests
+            session_manager (SessionManager): The pooled HTTP layer
+            metadata_cache (MetadataCache): The cache of the budgets and accounts
+            transactions_cache (TransactionCache): The cache of the transactions already seen
+
+        """
+        self.rate_limit_remaining.set_function(lambda: rate_limiter.remaining)
+        self.cache_hit_ratio.set_function(lambda: metadata_cache.hit_ratio, cache='metadata')
+        self.cache_hit_ratio.set_function(lambda: transactions_cache.hit_ratio, cache='transactions')
+        self.connection_reuse_ratio.set_function(lambda: session_manager.reuse_rate)
+
+    def on_ynab_response(self, response):
+        """Records a response of YNAB.
+
+        Args:
+            response (Response): The response
+
+        """
+        self.ynab_requests.inc(method=response.request.method if response.request else '',
+                               status=response.status_code)
+
+
+class ServiceMetrics:
+    """Models the metrics of a service, fed by its cycle reports and its YNAB responses.
+
+    The metrics are only created and fed when a registry is given to the service, so a service without one does not
+    pay for them.
+
+    Args:
+        registry (MetricsRegistry): The registry to create the metrics on
+        prefix (str): The prefix of the names of the metrics
+
+    """
+
+    def __init__(self, registry, prefix=METRICS_PREFIX):
+        self.registry = registry
+        self.cycle = CycleMetrics(registry, prefix)
+        self.resources = ResourceMetrics(registry, prefix)
+
+    def bind(self, rate_limiter, session_manager, metadata_cache, transactions_cache):
+        """Collects the gauges of the components of a service.
+
+        Args:
+            rate_limiter (RateLimiter): The rate limiter of the YNAB requests
+            session_manager (SessionManager): The pooled HTTP layer
+            metadata_cache (MetadataCache): The cache of the budgets and accounts
+            transactions_cache (TransactionCache): The cache of the transactions already seen
+
+        """
+        self.resources.bind(rate_limiter, session_manager, metadata_cache, transactions_cache)
+
+    def on_cycle(self, report):
+        """Records a finished cycle, to be registered as a cycle hook.
+
+        Args:
+            report (CycleReport): The report of the cycle
+
+        """
+        self.cycle.on_cycle(report)
+
+    def on_ynab_response(self, response):
+        """Records a response of YNAB.
+
+        Args:
+            response (Response): The response
+
+        """
+        self.resources.on_ynab_response(response)
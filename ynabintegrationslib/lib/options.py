@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: options.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for options.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from ynabintegrationslib.lib.core import YNAB_URL
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''options'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+TRANSACTIONS_CACHE_SIZE = 10000
+METADATA_TTL = 3600
+UPLOAD_CHUNK_SIZE = 200
+DEFAULT_MAX_WORKERS = 4
+
+
+@dataclass
+class ServiceOptions:  # pylint: disable=too-many-instance-attributes
+    """Models the tuning options and collaborators of a service, all optional.
+
+    The options that only affect how a cycle runs, like the concurrency, the chunk size, streaming and the
+    deduplication, can be changed on a running service and apply from its next cycle.
+
+    Args:
+        concurrent_fetching (bool): If True the accounts are queried in parallel on a bounded thread pool
+        max_workers (int): The maximum number of accounts, chunks or backfill ranges processed in parallel
+        transactions_cache_size (int): The maximum number of seen transactions to remember for deduplication
+        transactions_cache_age (int): The number of seconds to remember a seen transaction, None for no expiry
+        transactions_store (TransactionStore): A persistent store of handled transactions that survives restarts
+        metadata_ttl (int): The number of seconds budgets and accounts are cached for
+        upload_chunk_size (int): The maximum number of transactions sent to YNAB in a single request
+        concurrent_uploads (bool): If True the chunks of all budgets are uploaded in parallel on max_workers threads
+        rate_limiter (RateLimiter): The rate limiter for the YNAB requests, by default the one shared by all
+            services using the same token
+        session_manager (SessionManager): The pooled HTTP layer used for YNAB and the bank contracts
+        server_side_dedup (bool): If True the latest transactions are uploaded without downloading the budget to
+            compare with, relying on YNAB rejecting already imported ids. Only safe for budgets where all bank
+            transactions were uploaded with import ids
+        streaming (bool): If True the uploads stream the bank transactions through the filtering and the comparison
+            with the budget into a bounded buffer per budget that is uploaded every upload_chunk_size transactions.
+            Only the compact records of the account being read are held, to number their import ids
+        ynab_url (str): The base url of the YNAB api, to point the service to a proxy or a local fake of it
+        metrics (MetricsRegistry): A registry to record the metrics of the service on, None to not record any
+        tracer (Tracer): A tracer to record every cycle as a tree of spans of the bank fetches, the budget retrievals
+            and the uploads, a Tracer, an OpenTelemetryTracer or None to not record any
+        profiler (CycleProfiler): A profiler to run the next cycles under, by default one configured by the
+            YNAB_INTEGRATIONS_PROFILE_* environment variables which is disarmed if they are not set
+        cycle_hooks (list): Callables that are called with the CycleReport of every call to get_latest_transactions,
+            the upload methods and backfill, with the wall clock and CPU time spent fetching, filtering, retrieving
+            the budget, comparing and uploading, per account where it applies, and the counts of transactions
+
+    """
+
+    concurrent_fetching: bool = False
+    max_workers: int = DEFAULT_MAX_WORKERS
+    transactions_cache_size: int = TRANSACTIONS_CACHE_SIZE
+    transactions_cache_age: int = None
+    transactions_store: object = None
+    metadata_ttl: int = METADATA_TTL
+    upload_chunk_size: int = UPLOAD_CHUNK_SIZE
+    concurrent_uploads: bool = False
+    rate_limiter: object = None
+    session_manager: object = None
+    server_side_dedup: bool = False
+    streaming: bool = False
+    ynab_url: str = YNAB_URL
+    metrics: object = None
+    tracer: object = None
+    profiler: object = None
+    cycle_hooks: list = field(default_factory=list)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: polling.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for polling.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import threading
+import time
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''polling'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+HOUR = 3600
+HOURS_PER_WEEK = 7 * 24
+ARRIVALS_HALF_LIFE = 4 * 7 * 24 * HOUR
+BACKOFF_FACTOR = 2.0
+
+
+def hour_of_week(timestamp):
+    """Calculates the local hour of the week of a moment, 0 being Monday from midnight to one.
+
+    Args:
+        timestamp (float): The seconds since the epoch
+
+    Returns:
+        hour (int): The hour of the week
+
+    """
+    moment = time.localtime(timestamp)
+    return moment.tm_wday * 24 + moment.tm_hour
+
+
+class ArrivalHistogram:
+    """Models how many transactions show up per local hour of the week, with older arrivals weighing less.
+
+    Every weight halves every half life, so a changed pattern, like a card that moved to booking at night, takes
+    over gradually. The decay is applied lazily to all hours at once, on the next observation.
+
+    Args:
+        half_life (float): The number of seconds after which an arrival weighs half
+
+    """
+
+    def __init__(self, half_life=ARRIVALS_HALF_LIFE):
+        self._lock = threading.Lock()
+        self._updated_at = None
+        self.half_life = half_life
+        self.weights = [0.0] * HOURS_PER_WEEK
+
+    @property
+    def total(self):
+        """The sum of the weights of all the hours."""
+        return sum(self.weights)
+
+    def _decay(self, timestamp):
+        if self._updated_at is not None and timestamp > self._updated_at:
+            factor = 0.5 ** ((timestamp - self._updated_at) / self.half_life)
+            self.weights = [weight * factor for weight in self.weights]
+        self._updated_at = max(timestamp, self._updated_at or timestamp)
+
+    def observe(self, timestamp, count=1):
+        """Records arrivals of transactions.
+
+        Args:
+            timestamp (float): The seconds since the epoch the transactions arrived at
+            count (int): The number of transactions
+
+        """
+        with self._lock:
+            self._decay(timestamp)
+            self.weights[hour_of_week(timestamp)] += count
+
+    def activity(self, timestamp):
+        """Calculates how busy the hour of a moment is compared to the average hour of the week.
+
+        Args:
+            timestamp (float): The seconds since the epoch
+
+        Returns:
+            activity (float): 1.0 for an average hour or when nothing was observed yet, 0.0 for an hour nothing
+                ever arrived at, and proportionally more for busier hours
+
+        """
+        with self._lock:
+            total = sum(self.weights)
+            if not total:
+                return 1.0
+            return self.weights[hour_of_week(timestamp)] * HOURS_PER_WEEK / total
+
+
+class AdaptiveInterval:
+    """Models the polling interval of an account that adapts to when its transactions arrive.
+
+    Every poll without new transactions multiplies the base interval by the backoff factor and a poll with new
+    ones resets it to the minimum. The base is then divided by the activity of the current hour of the week, so
+    busy hours are polled more often and hours nothing arrives at are polled at the maximum. A delay never skips
+    past the start of an hour that is busier than average. All delays are kept within the minimum and maximum.
+
+    Args:
+        min_interval (float): The minimum number of seconds between polls
+        max_interval (float): The maximum number of seconds between polls
+        backoff (float): The factor the base interval grows by on every poll without new transactions
+        half_life (float): The number of seconds after which an arrival weighs half in the learned pattern
+
+    """
+
+    def __init__(self, min_interval, max_interval, backoff=BACKOFF_FACTOR, half_life=ARRIVALS_HALF_LIFE):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(f'Invalid interval bounds {min_interval} and {max_interval}')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.arrivals = ArrivalHistogram(half_life)
+        self.base = min_interval
+
+    def _clamp(self, delay):
+        return min(max(delay, self.min_interval), self.max_interval)
+
+    def observe(self, timestamp, new_transactions):
+        """Records the outcome of a poll.
+
+        Args:
+            timestamp (float): The seconds since the epoch the poll finished at
+            new_transactions (int): The number of new transactions the poll found
+
+        """
+        if new_transactions:
+            self.arrivals.observe(timestamp, new_transactions)
+            self.base = self.min_interval
+        else:
+            self.base = self._clamp(self.base * self.backoff)
+
+    def next_delay(self, timestamp):
+        """Calculates the number of seconds until the next poll.
+
+        Args:
+            timestamp (float): The seconds since the epoch to calculate the delay from
+
+        Returns:
+            delay (float): The number of seconds
+
+        """
+        activity = self.arrivals.activity(timestamp)
+        delay = self._clamp(self.base / activity if activity else self.max_interval)
+        if activity < 1:
+            next_hour = timestamp - timestamp % HOUR + HOUR
+            while next_hour < timestamp + delay:
+                if self.arrivals.activity(next_hour) >= 1:
+                    return self._clamp(next_hour - timestamp)
+                next_hour += HOUR
+        return delay
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: profiling.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for profiling.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''profiling'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+PROFILE_CYCLES_VARIABLE = 'YNAB_INTEGRATIONS_PROFILE_CYCLES'
+PROFILE_DIRECTORY_VARIABLE = 'YNAB_INTEGRATIONS_PROFILE_DIRECTORY'
+PROFILE_MODE_VARIABLE = 'YNAB_INTEGRATIONS_PROFILE_MODE'
+
+MODE_CPROFILE = 'cprofile'
+MODE_SAMPLING = 'sampling'
+MODE_ALL = 'all'
+MODES = (MODE_CPROFILE, MODE_SAMPLING, MODE_ALL)
+
+SAMPLING_INTERVAL = 0.005
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f'{module}.{getattr(code, "co_qualname", code.co_name)}'
+
+
+class SamplingProfiler:
+    """Models a profiler that samples the stacks of all the threads of the process at an interval.
+
+    Unlike cProfile it also sees the work of the thread pools the cycles fan out to, at a fixed cost per sample
+    instead of per call. The samples are kept as collapsed stacks, the input format of flamegraph tools.
+
+    Args:
+        interval (float): The number of seconds between samples
+
+    """
+
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._stopped = threading.Event()
+        self._thread = None
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """Starts sampling in a background thread."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling and waits for the background thread to finish."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def dump_collapsed(self, path):
+        """Writes the samples as collapsed stacks, one "frame;frame;frame count" line per distinct stack.
+
+        Args:
+            path (str): The path of the file
+
+        """
+        with open(path, 'w', encoding='utf-8') as collapsed_file:
+            for stack, count in self.stacks.most_common():
+                collapsed_file.write(f'{stack} {count}\n')
+
+
+class ProfileWriter:
+    """Models the output directory of the profiles, which keeps the paths of the files written in it.
+
+    Args:
+        directory (str): The directory to write the profiles in
+
+    """
+
+    def __init__(self, directory='.'):
+        self.directory = directory
+        self.files = []
+
+    def _path(self, name, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f'{name}.{extension}')
+
+    def write_pstats(self, name, profiler):
+        """Writes the statistics of a cProfile profiler as a pstats file.
+
+        Args:
+            name (str): The name of the file without its extension
+            profiler (cProfile.Profile): The stopped profiler
+
+        """
+        path = self._path(name, 'pstats')
+        profiler.dump_stats(path)
+        self.files.append(path)
+
+    def write_collapsed(self, name, sampler):
+        """Writes the stacks of a sampling profiler as a collapsed stacks file.
+
+        Args:
+            name (str): The name of the file without its extension
+            sampler (SamplingProfiler): The stopped sampling profiler
+
+        """
+        path = self._path(name, 'collapsed')
+        sampler.dump_collapsed(path)
+        self.files.append(path)
+
+
+class CycleProfiler:
+    """Models an on demand profiler of the next cycles of a service.
+
+    The profiler is armed with a number of cycles and every following cycle runs under it until they are used up,
+    one at a time. The cprofile mode writes a pstats file of the thread that runs the cycle, the sampling mode a
+    collapsed stacks file of all the threads, named after the operation, the process id and the cycle id in the
+    output directory.
+
+    Args:
+        cycles (int): The number of the next cycles to profile
+        directory (str): The directory to write the profiles in
+        mode (str): One of "cprofile", "sampling" or "all"
+        interval (float): The number of seconds between the samples of the sampling mode
+
+    """
+
+    def __init__(self, cycles=0, directory='.', mode=MODE_ALL, interval=SAMPLING_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode "{mode}", supported modes are {MODES}')
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._lock = threading.Lock()
+        self._active = False
+        self.remaining = cycles
+        self.mode = mode
+        self.interval = interval
+        self.writer = ProfileWriter(directory)
+
+    @property
+    def directory(self):
+        """The directory the profiles are written in."""
+        return self.writer.directory
+
+    @property
+    def files(self):
+        """The paths of the profiles written."""
+        return self.writer.files
+
+    @classmethod
+    def from_environment(cls, environment=None):
+        """Creates a profiler configured by environment variables.
+
+        YNAB_INTEGRATIONS_PROFILE_CYCLES sets the number of cycles to profile, YNAB_INTEGRATIONS_PROFILE_DIRECTORY
+        the output directory and YNAB_INTEGRATIONS_PROFILE_MODE the mode.
+
+        Args:
+            environment (dict): The environment variables, by default the ones of the process
+
+        Returns:
+            profiler (CycleProfiler): The profiler, disarmed if the variables are not set
+
+        """
+        environment = os.environ if environment is None else environment
+        return cls(cycles=int(environment.get(PROFILE_CYCLES_VARIABLE) or 0),
+                   directory=environment.get(PROFILE_DIRECTORY_VARIABLE) or '.',
+                   mode=environment.get(PROFILE_MODE_VARIABLE) or MODE_ALL)
+
+    def arm(self, cycles=1):
+        """Profiles the next cycles.
+
+        Args:
+            cycles (int): The number of the next cycles to profile
+
+        """
+        with self._lock:
+            self.remaining = cycles
+
+    def _acquire(self):
+        with self._lock:
+            if self._active or self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            self._active = True
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._active = False
+
+    @contextmanager
+    def profile(self, cycle_id, operation='cycle'):
+        """Runs the body under the profiler if it is armed, otherwise as is.
+
+        Args:
+            cycle_id (int): The id of the cycle, used in the names of the files
+            operation (str): The operation of the cycle, used in the names of the files
+
+        Yields:
+            None
+
+        """
+        if not self._acquire():
+            yield
+            return
+        profiler = cProfile.Profile() if self.mode in (MODE_CPROFILE, MODE_ALL) else None
+        sampler = SamplingProfiler(self.interval) if self.mode in (MODE_SAMPLING, MODE_ALL) else None
+        if sampler:
+            sampler.start()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            if sampler:
+                sampler.stop()
+            try:
+                self._write(f'{operation}-{os.getpid()}-{cycle_id}', profiler, sampler)
+            finally:
+                self._release()
+
+    def _write(self, name, profiler, sampler):
+        try:
+            if profiler:
+                self.writer.write_pstats(name, profiler)
+            if sampler:
+                self.writer.write_collapsed(name, sampler)
+        except OSError:
+            self._logger.exception('Could not write the profile "%s"', name)
+            return
+        self._logger.info('Wrote the profile "%s" to %s', name, self.directory)
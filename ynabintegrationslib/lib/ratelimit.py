@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: ratelimit.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for ratelimit.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from .sessions import PooledAdapter
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''ratelimit'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+YNAB_REQUESTS_PER_PERIOD = 200
+YNAB_PERIOD = 3600
+RESERVED_FOR_UPLOADS = 20
+RETRIES_ON_THROTTLE = 2
+
+LOW_PRIORITY = 0
+HIGH_PRIORITY = 1
+
+
+class RateLimiter:  # pylint: disable=too-many-instance-attributes
+    """Models a token bucket limiting the requests made with a YNAB token.
+
+    Requests with high priority, like uploads, can use the whole bucket while low priority ones, like reads, leave a
+    reserve untouched and yield to any waiting high priority request, so uploads always find quota.
+
+    Args:
+        capacity (int): The number of requests allowed per period
+        period (int): The period in seconds the capacity refers to
+        reserved (int): The number of requests kept for high priority requests
+
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, capacity=YNAB_REQUESTS_PER_PERIOD, period=YNAB_PERIOD, reserved=RESERVED_FOR_UPLOADS):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._condition = threading.Condition()
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0
+        self._high_priority_waiting = 0
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.reserved = min(reserved, capacity - 1)
+
+    @classmethod
+    def for_token(cls, token, **kwargs):
+        """Retrieves the rate limiter shared by everything using the same token, creating it if needed.
+
+        Args:
+            token (str): The YNAB token
+            **kwargs: Arguments for the creation of the rate limiter if it does not exist yet
+
+        Returns:
+            rate_limiter (RateLimiter): The shared rate limiter
+
+        """
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(**kwargs)
+            return cls._registry[key]
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    @property
+    def remaining(self):
+        """The number of requests that can currently be made."""
+        with self._condition:
+            self._refill()
+            return int(self._tokens)
+
+    def _get_wait_time(self, priority):
+        now = self._refill()
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        if priority == LOW_PRIORITY and self._high_priority_waiting:
+            return 1 / self.rate
+        floor = 0 if priority == HIGH_PRIORITY else self.reserved
+        return max(0, (floor + 1 - self._tokens) / self.rate)
+
+    def acquire(self, priority=LOW_PRIORITY, timeout=None):
+        """Blocks until a request can be made.
+
+        Args:
+            priority (int): LOW_PRIORITY or HIGH_PRIORITY
+            timeout (float): The maximum number of seconds to wait, None to wait as long as needed
+
+        Returns:
+            bool (bool): True if the request can be made, False if the timeout expired
+
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if priority == HIGH_PRIORITY:
+                self._high_priority_waiting += 1
+            try:
+                while True:
+                    wait = self._get_wait_time(priority)
+                    if not wait:
+                        self._tokens -= 1
+                        return True
+                    if deadline is not None:
+                        if time.monotonic() >= deadline:
+                            return False
+                        wait = min(wait, deadline - time.monotonic())
+                    self._logger.debug('Rate limit reached, waiting %.2f seconds', wait)
+                    self._condition.wait(wait)
+            finally:
+                if priority == HIGH_PRIORITY:
+                    self._high_priority_waiting -= 1
+                    self._condition.notify_all()
+
+    def update(self, headers):
+        """Aligns the bucket with the usage reported by YNAB in the "X-Rate-Limit" header, formatted "used/limit".
+
+        Args:
+            headers (dict): The headers of a YNAB response
+
+        """
+        value = headers.get('X-Rate-Limit')
+        if not value:
+            return
+        try:
+            used, limit = (int(part) for part in value.split('/'))
+        except ValueError:
+            self._logger.warning('Could not parse rate limit header "%s"', value)
+            return
+        with self._condition:
+            self._refill()
+            self._tokens = min(self._tokens, float(limit - used))
+
+    def penalize(self, retry_after=None):
+        """Holds all requests after YNAB throttled one.
+
+        Args:
+            retry_after (float): The seconds YNAB asked to wait, if not provided the bucket is emptied instead
+
+        """
+        with self._condition:
+            self._refill()
+            if retry_after is None:
+                self._tokens = 0
+                wait = 1 / self.rate
+            else:
+                wait = retry_after
+            self._blocked_until = max(self._blocked_until, time.monotonic() + wait)
+        self._logger.warning('Throttled by YNAB, holding all requests for %.2f seconds', wait)
+
+
+class RateLimitedAdapter(PooledAdapter):
+    """Models a transport adapter that passes every request through a rate limiter and retries throttled ones.
+
+    Args:
+        rate_limiter (RateLimiter): The rate limiter to use
+        retries_on_throttle (int): The number of times a request that got a 429 response is retried
+        on_response (callable): Called with every response, the throttled ones that are retried included
+        **kwargs: Any arguments of the PooledAdapter
+
+    """
+
+    def __init__(self, rate_limiter, retries_on_throttle=RETRIES_ON_THROTTLE, on_response=None, **kwargs):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self.rate_limiter = rate_limiter
+        self.retries_on_throttle = retries_on_throttle
+        self.on_response = on_response
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _get_retry_after(response):
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        """Sends a request once the rate limiter allows it, uploads take precedence over reads."""
+        priority = LOW_PRIORITY if request.method in ('GET', 'HEAD', 'OPTIONS') else HIGH_PRIORITY
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(priority)
+            response = super().send(request, **kwargs)
+            self.rate_limiter.update(response.headers)
+            if self.on_response:
+                self.on_response(response)
+            if response.status_code != 429 or attempt >= self.retries_on_throttle:
+                return response
+            attempt += 1
+            response.close()
+            self.rate_limiter.penalize(self._get_retry_after(response))
+            self._logger.warning('Request to "%s" was throttled, retry %s of %s',
+                                 request.url,
+                                 attempt,
+                                 self.retries_on_throttle)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: scheduler.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for scheduler.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import random
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+
+from ynabintegrationslib.lib.polling import AdaptiveInterval
+from ynabintegrationslib.ynabintegrationslibexceptions import InvalidAccount
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''scheduler'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+DEFAULT_INTERVAL = 900
+DEFAULT_JITTER = 0.1
+SHUTDOWN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+@dataclass
+class AccountSchedule:  # pylint: disable=too-many-instance-attributes
+    """Models when the latest transactions of an account are synced next.
+
+    Args:
+        account_name (str): The name of the account in YNAB
+        interval (float): The number of seconds between the syncs of the account
+        jitter (float): The fraction of the interval every delay is randomly stretched or shrunk by, so accounts of
+            the same bank do not hit it in lockstep
+        policy (AdaptiveInterval): The policy that adapts the interval to when transactions arrive, None to sync on
+            the fixed interval
+
+    """
+
+    account_name: str
+    interval: float
+    jitter: float = 0.0
+    policy: AdaptiveInterval = field(default=None, repr=False)
+    next_run: float = 0.0
+    last_run: float = None
+    last_result: object = field(default=None, repr=False)
+    runs: int = 0
+    failures: int = 0
+
+    def observe(self, new_transactions):
+        """Records the number of new transactions a sync found, for the policy to learn from.
+
+        Args:
+            new_transactions (int): The number of new transactions
+
+        """
+        if self.policy is not None:
+            self.policy.observe(time.time(), new_transactions)
+
+    def next_delay(self, random_=random):
+        """Calculates the number of seconds until the next sync of the account.
+
+        Args:
+            random_ (random.Random): The source of the jitter
+
+        Returns:
+            delay (float): The number of seconds
+
+        """
+        if self.policy is None:
+            return self.interval * (1 + random_.uniform(-self.jitter, self.jitter))
+        delay = self.policy.next_delay(time.time()) * (1 + random_.uniform(-self.jitter, self.jitter))
+        return min(max(delay, self.policy.min_interval), self.policy.max_interval)
+
+    def is_due(self, now):
+        """Whether the account should be synced.
+
+        Args:
+            now (float): The time on the clock of the scheduler
+
+        Returns:
+            bool (bool): True if the next sync is due, False otherwise
+
+        """
+        return self.next_run <= now
+
+
+class SyncDaemon:  # pylint: disable=too-many-instance-attributes
+    """Models a long running scheduler that uploads the latest transactions of the accounts of a service.
+
+    Every account is synced on its own schedule, either on a fixed interval or on one that adapts between a minimum
+    and a maximum to when the transactions of the account arrive. The accounts that are due together are synced in
+    a single cycle per budget so they share the retrieval of the budget, and cycles never overlap. Stopping the
+    daemon lets the running cycle finish with all its uploads and starts no new ones.
+
+    Args:
+        service (Service): The service with the contracts and accounts registered
+        interval (float): The default number of seconds between the syncs of an account
+        jitter (float): The default fraction of the interval the delays are randomly stretched or shrunk by
+        min_interval (float): The default minimum number of seconds between the adaptive syncs of an account
+        max_interval (float): The default maximum number of seconds between the adaptive syncs of an account, the
+            syncs adapt only if both bounds are set
+        seed (int): The seed of the jitter, None for a random one
+
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 service,
+                 interval=DEFAULT_INTERVAL,
+                 jitter=DEFAULT_JITTER,
+                 min_interval=None,
+                 max_interval=None,
+                 seed=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._service = service
+        self._random = random.Random(seed)
+        self._schedules = {}
+        self._lock = threading.Lock()
+        self._cycle_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.interval = interval
+        self.jitter = jitter
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cycles = 0
+
+    @property
+    def service(self):
+        """The service the daemon drives."""
+        return self._service
+
+    @property
+    def schedules(self):
+        """The schedules of the accounts."""
+        with self._lock:
+            return list(self._schedules.values())
+
+    @property
+    def running(self):
+        """Whether the daemon is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def schedule(self,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 account_name,
+                 interval=None,
+                 jitter=None,
+                 min_interval=None,
+                 max_interval=None):
+        """Syncs an account on a schedule, replacing any previous schedule of it.
+
+        The first sync is at a random point of the first jitter window, so accounts scheduled together spread out.
+        With both bounds set the interval adapts to the arrivals of the transactions of the account, starting from
+        the minimum.
+
+        Args:
+            account_name (str): The name of a registered account in YNAB
+            interval (float): The number of seconds between the syncs, by default the one of the daemon
+            jitter (float): The fraction of the interval to jitter the delays by, by default the one of the daemon
+            min_interval (float): The minimum number of seconds between adaptive syncs, by default the one of the
+                daemon
+            max_interval (float): The maximum number of seconds between adaptive syncs, by default the one of the
+                daemon
+
+        Returns:
+            schedule (AccountSchedule): The schedule of the account
+
+        Raises:
+            InvalidAccount: If the account is not registered in the service
+
+        """
+        account = self._service.get_account_by_name(account_name)
+        if not account:
+            raise InvalidAccount(account_name)
+        min_interval = self.min_interval if min_interval is None else min_interval
+        max_interval = self.max_interval if max_interval is None else max_interval
+        policy = None
+        if min_interval is not None and max_interval is not None:
+            policy = AdaptiveInterval(min_interval, max_interval)
+            interval = min_interval if interval is None else interval
+        schedule = AccountSchedule(account.ynab_account.name,
+                                   self.interval if interval is None else interval,
+                                   self.jitter if jitter is None else jitter,
+                                   policy)
+        schedule.next_run = time.monotonic() + self._random.uniform(0, schedule.interval * schedule.jitter)
+        with self._lock:
+            self._schedules[account_name.casefold()] = schedule
+        self._wakeup.set()
+        return schedule
+
+    def schedule_all(self):
+        """Syncs all the registered accounts that have no schedule on the default one.
+
+        Returns:
+            schedules (list): The new schedules
+
+        """
+        with self._lock:
+            names = [account.ynab_account.name for account in self._service.accounts
+                     if account.ynab_account.name.casefold() not in self._schedules]
+        return [self.schedule(name) for name in names]
+
+    def unschedule(self, account_name):
+        """Stops syncing an account.
+
+        Args:
+            account_name (str): The name of the account in YNAB
+
+        Returns:
+            bool (bool): True if the account had a schedule, False otherwise
+
+        """
+        with self._lock:
+            return self._schedules.pop(account_name.casefold(), None) is not None
+
+    def _group_per_budget(self, schedules):
+        groups = {}
+        for schedule in schedules:
+            account = self._service.get_account_by_name(schedule.account_name)
+            if not account:
+                self._logger.error('Account "%s" is not registered anymore, skipping it', schedule.account_name)
+                continue
+            groups.setdefault(account.budget.name, []).append(schedule)
+        return groups
+
+    def _sync(self, budget_name, schedules):
+        names = [schedule.account_name for schedule in schedules]
+        self._logger.info('Syncing accounts %s of budget "%s"', names, budget_name)
+        try:
+            result = self._service.upload_latest_transactions(budget_name, accounts=names)
+        except Exception:  # pylint: disable=broad-except
+            self._logger.exception('Problem syncing accounts %s', names)
+            result = None
+        finished = time.monotonic()
+        report = getattr(result, 'report', None)
+        account_counts = getattr(report, 'account_counts', {})
+        failed_accounts = set(getattr(report, 'failed_accounts', []))
+        with self._lock:
+            for schedule in schedules:
+                succeeded = bool(result) and schedule.account_name not in failed_accounts
+                # The first sync of an account catches up with what arrived before the daemon started, so it says
+                # nothing about when transactions arrive.
+                if succeeded and schedule.runs:
+                    schedule.observe(account_counts.get(schedule.account_name, {}).get('uploaded', 0))
+                schedule.runs += 1
+                schedule.failures = 0 if succeeded else schedule.failures + 1
+                schedule.last_run = finished
+                schedule.last_result = result
+                schedule.next_run = finished + schedule.next_delay(self._random)
+        return result
+
+    def run_pending(self, force=False):
+        """Syncs the accounts that are due, in one cycle per budget.
+
+        Args:
+            force (bool): If True all the scheduled accounts are synced whether they are due or not
+
+        Returns:
+            results (list): The UploadResult of every cycle, None for the ones that failed with an exception
+
+        """
+        with self._cycle_lock:
+            now = time.monotonic()
+            due = [schedule for schedule in self.schedules if force or schedule.is_due(now)]
+            results = []
+            for budget_name, schedules in self._group_per_budget(due).items():
+                if self._stopped.is_set() and not force:
+                    self._logger.info('Shutting down, leaving the rest of the due accounts for the next run')
+                    break
+                results.append(self._sync(budget_name, schedules))
+                self.cycles += 1
+            return results
+
+    def run_once(self):
+        """Syncs all the scheduled accounts once, scheduling all the registered ones if none is.
+
+        Returns:
+            results (list): The UploadResult of every cycle, None for the ones that failed with an exception
+
+        """
+        if not self.schedules:
+            self.schedule_all()
+        return self.run_pending(force=True)
+
+    def _seconds_until_next_run(self):
+        schedules = self.schedules
+        if not schedules:
+            return None
+        return max(0.0, min(schedule.next_run for schedule in schedules) - time.monotonic())
+
+    def _on_signal(self, signum, frame):  # pylint: disable=unused-argument
+        self._logger.info('Received signal %s, finishing the running cycle', signal.Signals(signum).name)
+        self.stop(wait=False)
+
+    def run(self, install_signal_handlers=False):
+        """Syncs the accounts on their schedules until the daemon is stopped.
+
+        If no account is scheduled all the registered ones are, on the default schedule.
+
+        Args:
+            install_signal_handlers (bool): If True SIGINT and SIGTERM stop the daemon gracefully while it runs,
+                which is only possible from the main thread
+
+        """
+        if not self.schedules:
+            self.schedule_all()
+        previous_handlers = {}
+        if install_signal_handlers:
+            previous_handlers = {signum: signal.signal(signum, self._on_signal) for signum in SHUTDOWN_SIGNALS}
+        self._logger.info('Starting with %s scheduled accounts', len(self.schedules))
+        try:
+            while not self._stopped.is_set():
+                self.run_pending()
+                self._wakeup.clear()
+                if self._stopped.is_set():
+                    break
+                self._wakeup.wait(self._seconds_until_next_run())
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            self._logger.info('Stopped after %s cycles', self.cycles)
+
+    def start(self):
+        """Runs the daemon on a background thread.
+
+        Returns:
+            daemon (SyncDaemon): The daemon
+
+        """
+        if self.running:
+            return self
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name='SyncDaemon', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True, timeout=None):
+        """Stops the daemon after the running cycle has uploaded its transactions.
+
+        Args:
+            wait (bool): If True blocks until the daemon has stopped
+            timeout (float): The maximum number of seconds to wait for, None to wait as long as it takes
+
+        Returns:
+            bool (bool): True if the daemon is not running anymore, False if it is still finishing its cycle
+
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        return not self.running
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: sessions.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for sessions.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import socket
+import threading
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.poolmanager import pool_classes_by_scheme
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''sessions'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+
+
+def _get_counting_pool_class(pool_class, adapter):
+    class CountingPool(pool_class):  # pylint: disable=too-few-public-methods
+        """A connection pool reporting every new connection it opens to its adapter."""
+
+        def _new_conn(self):
+            adapter.count_connection()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class PooledAdapter(HTTPAdapter):
+    """Models a transport adapter with configurable pools and TCP keep alive that counts connection reuse.
+
+    Args:
+        pool_connections (int): The number of hosts to keep connection pools for
+        pool_maxsize (int): The number of connections to keep open per host
+        keep_alive (bool): If True TCP keep alive probes are enabled on the connections
+        **kwargs: Any other arguments of the requests HTTPAdapter
+
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, keep_alive=True, **kwargs):
+        self._counter_lock = threading.Lock()
+        self.keep_alive = keep_alive
+        self.connections = 0
+        self.requests = 0
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        """Initializes the pool manager with keep alive sockets and connection counting pools."""
+        if self.keep_alive:
+            pool_kwargs['socket_options'] = (HTTPConnection.default_socket_options +
+                                             [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)])
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {scheme: _get_counting_pool_class(pool_class, self)
+                                                   for scheme, pool_class in pool_classes_by_scheme.items()}
+
+    def count_connection(self):
+        """Registers a newly opened connection."""
+        with self._counter_lock:
+            self.connections += 1
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        """Sends a request counting it."""
+        with self._counter_lock:
+            self.requests += 1
+        return super().send(request, **kwargs)
+
+
+class SessionManager:
+    """Models the pooled HTTP layer shared by the YNAB client and the bank contracts of a service.
+
+    All bank sessions mounted on the manager share a single pooled adapter so connections to the same host are
+    reused across contracts, accounts and cycles. Cookies and headers stay with each session.
+
+    Args:
+        pool_connections (int): The number of hosts to keep connection pools for
+        pool_maxsize (int): The number of connections to keep open per host
+        keep_alive (bool): If True TCP keep alive probes are enabled on the connections
+
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, keep_alive=True):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self._adapters = []
+        self.adapter = self.create_adapter()
+
+    def create_adapter(self, adapter_class=PooledAdapter, **kwargs):
+        """Creates an adapter with the pool settings of the manager that is accounted for in its metrics.
+
+        Args:
+            adapter_class (type): A PooledAdapter class
+            **kwargs: Any extra arguments of the adapter class
+
+        Returns:
+            adapter (PooledAdapter): The adapter
+
+        """
+        adapter = adapter_class(pool_connections=self.pool_connections,
+                                pool_maxsize=self.pool_maxsize,
+                                keep_alive=self.keep_alive,
+                                **kwargs)
+        self._adapters.append(adapter)
+        return adapter
+
+    def mount(self, session, prefix='https://', adapter=None):
+        """Mounts the shared adapter, or the one provided, on a session.
+
+        Args:
+            session (Session): The session to mount the adapter on
+            prefix (str): The url prefix to mount the adapter for
+            adapter (PooledAdapter): The adapter to mount, by default the shared one
+
+        Returns:
+            session (Session): The session
+
+        """
+        session.mount(prefix, adapter or self.adapter)
+        return session
+
+    def create_session(self):
+        """Creates a session with the shared adapter mounted.
+
+        Returns:
+            session (Session): The session
+
+        """
+        session = Session()
+        self.mount(session, 'https://')
+        self.mount(session, 'http://')
+        return session
+
+    @property
+    def connections(self):
+        """The number of connections opened, each one of which meant a TCP and for https a TLS handshake."""
+        return sum(adapter.connections for adapter in self._adapters)
+
+    @property
+    def requests(self):
+        """The number of requests made."""
+        return sum(adapter.requests for adapter in self._adapters)
+
+    @property
+    def reuse_rate(self):
+        """The ratio of requests that were served over an already open connection."""
+        requests = self.requests
+        return max(0.0, 1 - self.connections / requests) if requests else 0.0
+
+    def close(self):
+        """Closes all pooled connections."""
+        for adapter in self._adapters:
+            adapter.close()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: store.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for store.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import abc
+import dbm
+import heapq
+import logging
+import sqlite3
+import threading
+import time
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''store'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+PRUNE_MARGIN = 0.1
+
+
+class TransactionStore(abc.ABC):
+    """Interface for a persistent store of the fingerprints of handled transactions.
+
+    Pruning a store has to look at all of its fingerprints, so a bounded store is pruned when it is opened and then
+    only once the fingerprints added since the last pruning reach a margin of its maximum size.
+
+    Args:
+        max_size (int): The maximum number of fingerprints to keep, the oldest are pruned first, None for no limit
+
+    """
+
+    def __init__(self, max_size=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self._unpruned = 0
+
+    @abc.abstractmethod
+    def load(self, limit=None):
+        """Retrieves the stored fingerprints.
+
+        Args:
+            limit (int): The maximum number of the most recent fingerprints to retrieve, None for all
+
+        Returns:
+            fingerprints (list): The fingerprints, oldest first
+
+        """
+
+    @abc.abstractmethod
+    def add(self, fingerprints):
+        """Stores fingerprints.
+
+        Args:
+            fingerprints (list): The fingerprints to store
+
+        """
+
+    @abc.abstractmethod
+    def _prune(self):
+        """Drops the oldest fingerprints over the maximum size, called holding the lock."""
+
+    def _track(self, count):
+        if self.max_size is None:
+            return
+        self._unpruned += count
+        if self._unpruned >= max(1, int(self.max_size * PRUNE_MARGIN)):
+            self._prune()
+            self._unpruned = 0
+
+    def close(self):
+        """Releases any resources held by the store."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SqliteTransactionStore(TransactionStore):
+    """Models a transaction store backed by a local SQLite database.
+
+    Args:
+        path (str): The path of the database file
+        max_size (int): The maximum number of fingerprints to keep, the oldest are pruned first, None for no limit
+
+    """
+
+    def __init__(self, path, max_size=None):
+        super().__init__(max_size)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS transactions '
+                                     '(fingerprint TEXT PRIMARY KEY, stored_at REAL NOT NULL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS transactions_stored_at '
+                                     'ON transactions (stored_at)')
+            if self.max_size is not None:
+                self._prune()
+
+    def load(self, limit=None):
+        """Retrieves the stored fingerprints.
+
+        Args:
+            limit (int): The maximum number of the most recent fingerprints to retrieve, None for all
+
+        Returns:
+            fingerprints (list): The fingerprints, oldest first
+
+        """
+        with self._lock:
+            rows = self._connection.execute('SELECT fingerprint FROM transactions '
+                                            'ORDER BY stored_at DESC, rowid DESC LIMIT ?',
+                                            (-1 if limit is None else limit,)).fetchall()
+        return [fingerprint for fingerprint, in reversed(rows)]
+
+    def add(self, fingerprints):
+        """Stores fingerprints.
+
+        Args:
+            fingerprints (list): The fingerprints to store
+
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO transactions (fingerprint, stored_at) VALUES (?, ?)',
+                                         [(fingerprint, now) for fingerprint in fingerprints])
+            self._track(len(fingerprints))
+        self._logger.debug('Stored %s transaction fingerprints', len(fingerprints))
+
+    def _prune(self):
+        cursor = self._connection.execute('DELETE FROM transactions WHERE fingerprint NOT IN '
+                                          '(SELECT fingerprint FROM transactions '
+                                          'ORDER BY stored_at DESC, rowid DESC LIMIT ?)',
+                                          (self.max_size,))
+        self._logger.debug('Pruned %s transaction fingerprints', cursor.rowcount)
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class DbmTransactionStore(TransactionStore):
+    """Models a transaction store backed by a local dbm file.
+
+    Every fingerprint is stored with the time it was stored and its position in the batch it was stored with, so
+    the fingerprints order the same as on the SQLite store.
+
+    Args:
+        path (str): The path of the dbm file
+        max_size (int): The maximum number of fingerprints to keep, the oldest are pruned first, None for no limit
+
+    """
+
+    def __init__(self, path, max_size=None):
+        super().__init__(max_size)
+        self.path = path
+        self._database = dbm.open(path, 'c')
+        if self.max_size is not None:
+            self._prune()
+
+    @staticmethod
+    def _order(value):
+        stored_at, _, position = value.decode('utf-8').partition(' ')
+        return float(stored_at), int(position or 0)
+
+    def _entries(self):
+        return ((self._order(self._database[key]), key) for key in self._database.keys())
+
+    def load(self, limit=None):
+        """Retrieves the stored fingerprints.
+
+        Args:
+            limit (int): The maximum number of the most recent fingerprints to retrieve, None for all
+
+        Returns:
+            fingerprints (list): The fingerprints, oldest first
+
+        """
+        with self._lock:
+            if limit is None:
+                entries = sorted(self._entries())
+            else:
+                entries = sorted(heapq.nlargest(limit, self._entries()))
+        return [key.decode('utf-8') for _, key in entries]
+
+    def _prune(self):
+        excess = len(self._database) - self.max_size
+        if excess <= 0:
+            return
+        for _, key in heapq.nsmallest(excess, self._entries()):
+            del self._database[key]
+        self._logger.debug('Pruned %s transaction fingerprints', excess)
+
+    def add(self, fingerprints):
+        """Stores fingerprints.
+
+        Args:
+            fingerprints (list): The fingerprints to store
+
+        """
+        now = repr(time.time())
+        with self._lock:
+            for position, fingerprint in enumerate(fingerprints):
+                self._database[fingerprint] = f'{now} {position}'
+            self._track(len(fingerprints))
+        self._logger.debug('Stored %s transaction fingerprints', len(fingerprints))
+
+    def close(self):
+        """Closes the dbm file."""
+        with self._lock:
+            self._database.close()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: telemetry.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for telemetry.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+from contextlib import contextmanager
+
+from ynabintegrationslib.lib.instrumentation import Instrumentation
+from ynabintegrationslib.lib.metrics import ServiceMetrics
+from ynabintegrationslib.lib.profiling import CycleProfiler
+from ynabintegrationslib.lib.tracing import NoopTracer
+from ynabintegrationslib.lib.upload import UploadResult
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''telemetry'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+
+class Telemetry:
+    """Models everything that is recorded about the cycles of a service, their reports, spans, profiles and metrics.
+
+    Args:
+        cycle_hooks (list): Callables that are called with every finished CycleReport
+        tracer (Tracer): The tracer of the cycles, None to not record any spans
+        profiler (CycleProfiler): The profiler of the cycles, by default one configured by the environment
+        metrics (MetricsRegistry): The registry to record the metrics on, None to not record any
+
+    """
+
+    def __init__(self, cycle_hooks=None, tracer=None, profiler=None, metrics=None):
+        self.instrumentation = Instrumentation(cycle_hooks)
+        self.tracer = tracer or NoopTracer()
+        self.profiler = profiler or CycleProfiler.from_environment()
+        self.metrics = ServiceMetrics(metrics) if metrics is not None else None
+        if self.metrics is not None:
+            self.instrumentation.add_hook(self.metrics.on_cycle)
+
+    @classmethod
+    def from_options(cls, options):
+        """Creates the telemetry configured by the options of a service.
+
+        Args:
+            options (ServiceOptions): The options
+
+        Returns:
+            telemetry (Telemetry): The telemetry
+
+        """
+        return cls(options.cycle_hooks, options.tracer, options.profiler, options.metrics)
+
+    @property
+    def last_cycle_report(self):
+        """The CycleReport of the last finished cycle, None before the first one."""
+        return self.instrumentation.last_report
+
+    @property
+    def in_cycle(self):
+        """Whether a cycle is running in the current context."""
+        return self.instrumentation.current is not None
+
+    @property
+    def on_ynab_response(self):
+        """The callable that records the responses of YNAB, None if no metrics are recorded."""
+        return self.metrics.on_ynab_response if self.metrics is not None else None
+
+    def add_cycle_hook(self, hook):
+        """Registers a hook that is called with the CycleReport of every finished cycle.
+
+        Args:
+            hook (callable): The hook
+
+        """
+        self.instrumentation.add_hook(hook)
+
+    def stage(self, name, account=None):
+        """Times a stage of the running cycle.
+
+        Args:
+            name (str): The name of the stage
+            account (str): The name of the account the stage is for, None if it is not for a single account
+
+        Returns:
+            context (contextmanager): The context to run the stage in
+
+        """
+        return self.instrumentation.stage(name, account)
+
+    def count(self, name, value, account=None):
+        """Adds to a count of the running cycle.
+
+        Args:
+            name (str): The name of the count
+            value (int): The number to add
+            account (str): The name of the account the count is for, None if it is not for a single account
+
+        """
+        self.instrumentation.count(name, value, account)
+
+    def fail_account(self, account):
+        """Records an account whose transactions could not be retrieved in the running cycle.
+
+        Args:
+            account (str): The name of the account
+
+        """
+        self.instrumentation.fail_account(account)
+
+    def span(self, name, **attributes):
+        """Records a span as a child of the running one.
+
+        Args:
+            name (str): The name of the operation
+            **attributes: The attributes of the operation
+
+        Returns:
+            context (contextmanager): The context yielding the span
+
+        """
+        return self.tracer.span(name, **attributes)
+
+    @contextmanager
+    def _cycle(self, operation):
+        with self.instrumentation.cycle(operation) as report, \
+                self.tracer.span(operation, cycle_id=report.cycle_id) as span, \
+                self.profiler.profile(report.cycle_id, operation):
+            yield report, span
+
+    @staticmethod
+    def _finish(report, span, result):
+        report.result = result
+        if isinstance(result, UploadResult):
+            result.report = report
+        span.set_attributes({f'transactions.{name}': value for name, value in report.counts.items()})
+        return result
+
+    def run_cycle(self, operation, function, *args):
+        """Runs a function as a cycle, or as part of the running one if it is called within a cycle.
+
+        Args:
+            operation (str): The name of the operation of the cycle
+            function (callable): The function
+            *args: The arguments of the function
+
+        Returns:
+            result (object): The result of the function
+
+        """
+        if self.in_cycle:
+            return function(*args)
+        with self._cycle(operation) as (report, span):
+            return self._finish(report, span, function(*args))
+
+    async def run_cycle_async(self, operation, function, *args):
+        """Awaits a coroutine function as a cycle, or as part of the running one if it is called within a cycle.
+
+        Args:
+            operation (str): The name of the operation of the cycle
+            function (callable): The coroutine function
+            *args: The arguments of the function
+
+        Returns:
+            result (object): The result of the function
+
+        """
+        if self.in_cycle:
+            return await function(*args)
+        with self._cycle(operation) as (report, span):
+            return self._finish(report, span, await function(*args))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: tracing.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for tracing.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from ynabintegrationslib.ynabintegrationslibexceptions import MissingDependency
+
+try:
+    from opentelemetry import trace as opentelemetry_trace
+except ImportError:
+    opentelemetry_trace = None
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''tracing'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+INSTRUMENTATION_NAME = 'ynabintegrationslib'
+
+_CURRENT_SPAN = contextvars.ContextVar('current_span', default=None)
+_RANDOM = random.SystemRandom()
+
+
+class Span:  # pylint: disable=too-many-instance-attributes
+    """Models a timed operation of a trace, with the ids and the time format of OpenTelemetry.
+
+    Args:
+        name (str): The name of the operation
+        parent (Span): The span the operation is part of, None for the root of a trace
+        attributes (dict): The attributes of the operation
+
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f'{_RANDOM.getrandbits(128):032x}'
+        self.span_id = f'{_RANDOM.getrandbits(64):016x}'
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def duration(self):
+        """The duration of the span in seconds, None while it runs."""
+        return None if self.end_time is None else (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key, value):
+        """Sets an attribute of the span.
+
+        Args:
+            key (str): The name of the attribute
+            value (str|int|float|bool): The value of the attribute
+
+        """
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        """Sets attributes of the span.
+
+        Args:
+            attributes (dict): The attributes
+
+        """
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception):
+        """Marks the span as failed by an exception.
+
+        Args:
+            exception (Exception): The exception
+
+        """
+        self.status = 'error'
+        self.attributes['exception.type'] = type(exception).__name__
+        self.attributes['exception.message'] = str(exception)
+
+    def to_dict(self):
+        """Converts the span to json serializable primitives.
+
+        Returns:
+            span (dict): The span
+
+        """
+        return {'name': self.name,
+                'trace_id': self.trace_id,
+                'span_id': self.span_id,
+                'parent_id': self.parent_id,
+                'start_time_unix_nano': self.start_time,
+                'end_time_unix_nano': self.end_time,
+                'duration': self.duration,
+                'status': self.status,
+                'thread': self.thread,
+                'attributes': self.attributes}
+
+
+class _NoopSpan:
+    """Models a span that records nothing."""
+
+    def set_attribute(self, key, value):
+        """Does nothing."""
+
+    def set_attributes(self, attributes):
+        """Does nothing."""
+
+    def record_exception(self, exception):
+        """Does nothing."""
+
+
+class NoopTracer:
+    """Models a tracer that records nothing, used when tracing is not enabled."""
+
+    _span = _NoopSpan()
+
+    @property
+    def current_span(self):
+        """No span is ever running, so always None."""
+        return None
+
+    @contextmanager
+    def span(self, name, **attributes):  # pylint: disable=unused-argument
+        """Yields a span that records nothing."""
+        yield self._span
+
+
+class Tracer:
+    """Models a tracer that records the calls of the service as trees of spans and passes them to exporters.
+
+    The running span is kept in a context variable, so spans opened in calls submitted to thread pools with
+    submit_in_context or bind_to_context become children of the span that submitted them.
+
+    Args:
+        exporters (list): Objects with an export method that is called with every finished Span
+
+    """
+
+    def __init__(self, exporters=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self.exporters = list(exporters or [])
+
+    @property
+    def current_span(self):
+        """The running span, None outside of a span."""
+        return _CURRENT_SPAN.get()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Records a span as a child of the running one.
+
+        Args:
+            name (str): The name of the operation
+            **attributes: The attributes of the operation
+
+        Yields:
+            span (Span): The span
+
+        """
+        span = Span(name, _CURRENT_SPAN.get(), attributes)
+        token = _CURRENT_SPAN.set(span)
+        try:
+            yield span
+        except BaseException as exception:
+            span.record_exception(exception)
+            raise
+        finally:
+            _CURRENT_SPAN.reset(token)
+            span.end_time = time.time_ns()
+            self._export(span)
+
+    def _export(self, span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception('Exporter %r failed on span "%s"', exporter, span.name)
+
+
+class OpenTelemetryTracer:
+    """Models a tracer that records the spans with OpenTelemetry, for the exporters configured on its SDK.
+
+    Requires the opentelemetry-api package, which is not a dependency of the library.
+
+    Args:
+        tracer (opentelemetry.trace.Tracer): The tracer to use, by default the one of the global tracer provider
+
+    """
+
+    def __init__(self, tracer=None):
+        if opentelemetry_trace is None:
+            raise MissingDependency('OpenTelemetry tracing requires the "opentelemetry-api" package')
+        self._tracer = tracer or opentelemetry_trace.get_tracer(INSTRUMENTATION_NAME)
+
+    @property
+    def current_span(self):
+        """The running OpenTelemetry span, None outside of a span."""
+        span = opentelemetry_trace.get_current_span()
+        return span if span.get_span_context().is_valid else None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Records a span as a child of the running OpenTelemetry span.
+
+        Args:
+            name (str): The name of the operation
+            **attributes: The attributes of the operation
+
+        Yields:
+            span (opentelemetry.trace.Span): The span
+
+        """
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+
+class JsonLinesExporter:
+    """Models an exporter that appends every finished span to a file as a line of json.
+
+    Args:
+        path (str): The path of the file
+
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.path = path
+
+    def export(self, span):
+        """Appends a span to the file.
+
+        Args:
+            span (Span): The finished span
+
+        """
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as spans_file:
+            spans_file.write(f'{line}\n')
+
+    def clear(self):
+        """Drops the exported spans by emptying the file."""
+        with self._lock, open(self.path, 'w', encoding='utf-8'):
+            pass
+
+
+class InMemoryExporter:
+    """Models an exporter that keeps the finished spans in a list, for tests and interactive use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def export(self, span):
+        """Keeps a span.
+
+        Args:
+            span (Span): The finished span
+
+        """
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        """Drops the kept spans."""
+        with self._lock:
+            self.spans = []
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: upload.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for upload.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from ynabintegrationslib.lib.instrumentation import submit_in_context
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''upload'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+
+def chunk(items, size):
+    """Splits a list in consecutive chunks.
+
+    Args:
+        items (list): The items to split
+        size (int): The maximum size of a chunk, None or 0 for a single chunk
+
+    Returns:
+        chunks (list): A list of lists of at most size items
+
+    """
+    if not size:
+        return [items]
+    return [items[index:index + size] for index in range(0, len(items), size)]
+
+
+@dataclass
+class ChunkResult:  # pylint: disable=too-many-instance-attributes
+    """Models the outcome of uploading one chunk of transactions to a budget."""
+
+    budget_id: str
+    size: int
+    success: bool
+    latency: float
+    created: int = 0
+    duplicates: int = 0
+    status_code: int = None
+    duplicate_import_ids: list = field(default_factory=list, repr=False)
+
+
+@dataclass
+class UploadResult:
+    """Models the outcome of uploading transactions, evaluates to True only if every chunk succeeded.
+
+    The report holds the timings and counts of the cycle of the service that produced the result, if any.
+    """
+
+    chunks: list = field(default_factory=list)
+    report: object = field(default=None, repr=False, compare=False)
+
+    def __bool__(self):
+        return all(chunk_.success for chunk_ in self.chunks)
+
+    @property
+    def success(self):
+        """True if all chunks were uploaded successfully."""
+        return bool(self)
+
+    @property
+    def failed(self):
+        """The chunks that failed to upload."""
+        return [chunk_ for chunk_ in self.chunks if not chunk_.success]
+
+    @property
+    def uploaded(self):
+        """The number of transactions in successfully uploaded chunks."""
+        return sum(chunk_.size for chunk_ in self.chunks if chunk_.success)
+
+    @property
+    def created(self):
+        """The number of transactions created on YNAB."""
+        return sum(chunk_.created for chunk_ in self.chunks)
+
+    @property
+    def duplicates(self):
+        """The number of transactions YNAB rejected as duplicates of already imported ones."""
+        return sum(chunk_.duplicates for chunk_ in self.chunks)
+
+    @property
+    def latency(self):
+        """The summed latency of all chunk requests in seconds."""
+        return sum(chunk_.latency for chunk_ in self.chunks)
+
+
+class UploadBuffer:
+    """Models a bounded buffer of transactions per budget that is uploaded a chunk at a time as it fills up.
+
+    Args:
+        upload (callable): Uploads a list of transactions to a budget id, returning a ChunkResult
+        size (int): The number of transactions of a budget to buffer before uploading them
+
+    """
+
+    def __init__(self, upload, size):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._upload = upload
+        self._buffers = {}
+        self.size = size
+        self.result = UploadResult()
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def _flush(self, budget_id):
+        transactions = self._buffers.pop(budget_id, [])
+        if transactions:
+            self._logger.debug('Flushing %s transactions of budget "%s"', len(transactions), budget_id)
+            self.result.chunks.append(self._upload(budget_id, transactions))
+
+    def add(self, transaction):
+        """Buffers a transaction, uploading the buffer of its budget if it is full.
+
+        Args:
+            transaction (YnabTransaction): The transaction to upload
+
+        """
+        buffer = self._buffers.setdefault(transaction.budget_id, [])
+        buffer.append(transaction)
+        if self.size and len(buffer) >= self.size:
+            self._flush(transaction.budget_id)
+
+    def extend(self, transactions):
+        """Buffers transactions, uploading every buffer that fills up on the way.
+
+        Args:
+            transactions (iterable): The transactions to upload, consumed lazily
+
+        """
+        for transaction in transactions:
+            self.add(transaction)
+
+    def flush(self):
+        """Uploads everything buffered.
+
+        Returns:
+            result (UploadResult): The result of all the chunks uploaded by the buffer
+
+        """
+        for budget_id in list(self._buffers):
+            self._flush(budget_id)
+        return self.result
+
+
+class Uploader:
+    """Models the upload of transactions to YNAB, split per budget in chunks.
+
+    Args:
+        ynab (YnabClient): The client of YNAB to upload the transactions with
+        telemetry (Telemetry): The telemetry to record the stages and counts of the uploads on
+        options (ServiceOptions): The options with the size of the chunks and whether to upload them in parallel
+        on_uploaded (callable): Called with the transactions of every chunk that is uploaded successfully
+
+    """
+
+    def __init__(self, ynab, telemetry, options, on_uploaded=None):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._ynab = ynab
+        self._telemetry = telemetry
+        self._options = options
+        self._on_uploaded = on_uploaded
+
+    def batch_chunks(self, transactions):
+        """Splits transactions per budget in chunks of at most upload_chunk_size.
+
+        Args:
+            transactions (iterable): The transactions to split
+
+        Returns:
+            chunks (list): A list of (budget_id, transactions) tuples
+
+        """
+        budgets = {}
+        self._logger.debug('Batching transactions per budget id.')
+        for transaction in transactions:
+            budgets.setdefault(transaction.budget_id, []).append(transaction)
+        return [(budget_id, chunk_)
+                for budget_id, batch in budgets.items()
+                for chunk_ in chunk(batch, self._options.upload_chunk_size)]
+
+    def upload_chunk(self, budget_id, transactions):
+        """Uploads a chunk of transactions to a budget.
+
+        Args:
+            budget_id (str): The id of the budget to upload to
+            transactions (list): The transactions of the chunk
+
+        Returns:
+            result (ChunkResult): The result of the upload of the chunk
+
+        """
+        url = f'{self._ynab.api_url}/budgets/{budget_id}/transactions'
+        payloads = [transaction.payload for transaction in transactions]
+        start = time.perf_counter()
+        try:
+            with self._telemetry.stage('upload'), \
+                    self._telemetry.span('ynab.upload', budget_id=budget_id, transactions=len(payloads)) as span:
+                response = self._ynab.session.post(url, json={'transactions': payloads})
+                span.set_attributes({'payload_bytes': len(response.request.body or b''),
+                                     'status_code': response.status_code})
+        except Exception:  # pylint: disable=broad-except
+            self._logger.exception('Problem uploading %s transactions to budget "%s"', len(payloads), budget_id)
+            return ChunkResult(budget_id, len(payloads), False, time.perf_counter() - start)
+        latency = time.perf_counter() - start
+        if not response.ok:
+            self._logger.error('Unsuccessful attempt to upload to budget "%s", response was %s with status code %s',
+                               budget_id,
+                               response.text,
+                               response.status_code)
+            return ChunkResult(budget_id, len(payloads), False, latency, status_code=response.status_code)
+        data = response.json().get('data', {})
+        duplicate_import_ids = data.get('duplicate_import_ids', [])
+        result = ChunkResult(budget_id,
+                             len(payloads),
+                             True,
+                             latency,
+                             created=len(data.get('transaction_ids', [])),
+                             duplicates=len(duplicate_import_ids),
+                             status_code=response.status_code,
+                             duplicate_import_ids=duplicate_import_ids)
+        self._logger.info('Successfully uploaded %s transactions to budget "%s", %s created and %s duplicates',
+                          result.size,
+                          budget_id,
+                          result.created,
+                          result.duplicates)
+        self._count_uploaded(transactions, result)
+        self._telemetry.count('duplicates', result.duplicates)
+        if self._on_uploaded:
+            self._on_uploaded(transactions)
+        return result
+
+    def _count_uploaded(self, transactions, result):
+        if not self._telemetry.in_cycle:
+            return
+        # Created transactions are attributed to their accounts, which the scheduler learns arrival patterns from.
+        duplicates = set(result.duplicate_import_ids)
+        per_account = Counter(transaction.account_name for transaction in transactions
+                              if getattr(transaction, 'account_name', None) is not None
+                              and transaction.import_id not in duplicates)
+        for name, count in per_account.items():
+            self._telemetry.count('uploaded', count, name)
+        self._telemetry.count('uploaded', result.created - sum(per_account.values()))
+
+    def upload(self, transactions):
+        """Uploads transactions in chunks, in parallel if concurrent_uploads is set.
+
+        Args:
+            transactions (iterable): The transactions to upload
+
+        Returns:
+            result (UploadResult): The result per chunk
+
+        """
+        chunks = self.batch_chunks(transactions)
+        self._logger.debug('Uploading all transactions in %s chunks', len(chunks))
+        if not self._options.concurrent_uploads or len(chunks) == 1:
+            return UploadResult([self.upload_chunk(budget_id, chunk_) for budget_id, chunk_ in chunks])
+        with ThreadPoolExecutor(max_workers=self._options.max_workers) as executor:
+            futures = [submit_in_context(executor, self.upload_chunk, budget_id, chunk_)
+                       for budget_id, chunk_ in chunks]
+        return UploadResult([future.result() for future in futures])
+
+    def create_buffer(self):
+        """Creates a buffer that uploads a chunk at a time as it fills up.
+
+        Returns:
+            buffer (UploadBuffer): The buffer
+
+        """
+        return UploadBuffer(self.upload_chunk, self._options.upload_chunk_size)
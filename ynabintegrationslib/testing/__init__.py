@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: __init__.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+testing package.
+
+Fake backends of the YNAB and bank apis and synthetic data to test and benchmark the service without network.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+"""
+
+from ynabintegrationslib.lib import YNAB_URL
+
+from .transport import FakeRequest, FakeBackend, InProcessAdapter, ForwardingAdapter, FakeSessionManager, FakeServer
+from .ynab import FakeYnabBackend
+from .abnamro import ABN_AMRO_URL, FakeAbnAmroBackend
+from .ics import ICS_URL, FakeIcsBackend
+from .synthetic import (generate_mutations,
+                        generate_card_transactions,
+                        iban_for,
+                        card_number_for,
+                        to_ynab_transactions,
+                        card_to_ynab_transactions,
+                        write_cookie_file)
+from .scenario import SyncScenario
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is to 'use' the module(s), so lint doesn't complain
+assert FakeRequest
+assert FakeBackend
+assert InProcessAdapter
+assert ForwardingAdapter
+assert FakeSessionManager
+assert FakeServer
+assert YNAB_URL
+assert FakeYnabBackend
+assert ABN_AMRO_URL
+assert FakeAbnAmroBackend
+assert ICS_URL
+assert FakeIcsBackend
+assert generate_mutations
+assert generate_card_transactions
+assert iban_for
+assert card_number_for
+assert to_ynab_transactions
+assert card_to_ynab_transactions
+assert write_cookie_file
+assert SyncScenario
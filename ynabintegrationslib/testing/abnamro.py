@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: abnamro.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for the fake abn amro api.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import bisect
+import logging
+
+from .transport import FakeBackend
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''abnamro'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+ABN_AMRO_URL = 'https://www.abnamro.nl'
+MUTATIONS_PAGE_SIZE = 50
+
+
+class FakeAbnAmroBackend(FakeBackend):
+    """Models an in memory stand in of the ABN AMRO api with the endpoints abnamrolib uses for accounts.
+
+    Mutations are served most recent first, a page at a time, and paged with the lastMutationKey which is a
+    timestamp like "2020-01-31-12.00.00.000000". A key built from a date returns the mutations before that date.
+
+    Args:
+        page_size (int): The number of mutations in a page
+        **kwargs: Any arguments of the FakeBackend for latency and error injection
+
+    """
+
+    def __init__(self, page_size=MUTATIONS_PAGE_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.page_size = page_size
+        self._accounts = {}
+        self.route('GET', r'/contracts', self._get_contracts)
+        self.route('GET', r'/mul/accounts/v1', self._get_foreign_accounts)
+        self.route('GET', r'/mutations/(?P<iban>[^/]+)', self._get_mutations)
+
+    def add_account(self, iban, mutations=()):
+        """Adds an account.
+
+        Args:
+            iban (str): The iban of the account
+            mutations (list): The mutation dictionaries of the account, each with a mutationKey, most recent first
+
+        """
+        with self._lock:
+            contract = {'contract': {'accountNumber': iban,
+                                     'id': f'{len(self._accounts) + 1:010d}',
+                                     'contractNumber': iban[-10:],
+                                     'resourceType': 'PAYMENT',
+                                     'status': 'ACTIVE',
+                                     'balance': {'amount': 0.0, 'currencyCode': 'EUR'}}}
+            self._accounts[iban] = {'contract': contract, 'mutations': [], 'keys': []}
+            self.add_mutations(iban, mutations)
+
+    def add_mutations(self, iban, mutations):
+        """Adds mutations to an account, as new transactions do.
+
+        Args:
+            iban (str): The iban of the account
+            mutations (list): The mutation dictionaries, each with a mutationKey, most recent first
+
+        """
+        with self._lock:
+            account = self._accounts[iban]
+            merged = sorted([*account['mutations'], *mutations], key=lambda mutation: mutation['mutationKey'])
+            account['mutations'] = merged
+            account['keys'] = [mutation['mutationKey'] for mutation in merged]
+
+    def _get_contracts(self, request):  # pylint: disable=unused-argument
+        return 200, {'contractList': [account['contract'] for account in self._accounts.values()]}
+
+    def _get_foreign_accounts(self, request):  # pylint: disable=unused-argument
+        return 403, {'messages': [{'messageKey': 'NOT_AUTHORIZED'}]}
+
+    def _get_mutations(self, request, iban):
+        account = self._accounts.get(iban)
+        if account is None:
+            return 404, {'messages': [{'messageKey': 'ACCOUNT_NOT_FOUND'}]}
+        # The mutations are kept oldest first so the ones before a key are a slice ending at its position.
+        last_mutation_key = request.params.get('lastMutationKey')
+        end = bisect.bisect_left(account['keys'], last_mutation_key) if last_mutation_key else len(account['keys'])
+        start = max(0, end - self.page_size)
+        page = account['mutations'][start:end][::-1]
+        next_key = page[-1]['mutationKey'] if page and start else None
+        return 200, {'mutationsList': {'mutations': [{'mutation': mutation} for mutation in page],
+                                       'lastMutationKey': next_key}}
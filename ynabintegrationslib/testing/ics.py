@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: ics.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for the fake ics api.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import calendar
+import datetime
+import logging
+from collections import defaultdict
+
+from .transport import FakeBackend
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''ics'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+ICS_URL = 'https://www.icscards.nl'
+
+
+def _period_of(date_):
+    return date_[:7]
+
+
+def _period_dates(period):
+    year, month = (int(part) for part in period.split('-'))
+    return (datetime.date(year, month, 1).isoformat(),
+            datetime.date(year, month, calendar.monthrange(year, month)[1]).isoformat())
+
+
+class FakeIcsBackend(FakeBackend):
+    """Models an in memory stand in of the ICS api with the endpoints abnamrolib uses for credit cards.
+
+    ICS does not page its transactions by size but by payment period. Periods here are calendar months named like
+    "2020-01", served most recent first from the month of the oldest transaction up to the current month, and the
+    transactions of a range of periods are served at once. Requests without the XSRF token header are rejected.
+
+    Args:
+        today (date): The date that falls in the current period, by default today
+        **kwargs: Any arguments of the FakeBackend for latency and error injection
+
+    """
+
+    def __init__(self, today=None, **kwargs):
+        super().__init__(**kwargs)
+        self.today = today or datetime.date.today()
+        self._accounts = {}
+        self.route('GET', r'/sec/nl/sec/allaccountsv2', self._get_accounts)
+        self.route('GET', r'/sec/nl/sec/accountv5', self._get_account)
+        self.route('GET', r'/sec/nl/sec/periods', self._get_periods)
+        self.route('GET', r'/sec/nl/sec/transactions', self._get_transactions)
+
+    def add_account(self, account_number, transactions=()):
+        """Adds a credit card account.
+
+        Args:
+            account_number (str): The account number of the card
+            transactions (list): The transaction dictionaries of the card, each with a transactionDate
+
+        """
+        with self._lock:
+            data = {'accountNumber': account_number,
+                    'productId': {'issuerId': 'ICS', 'productCode': 'ABNAMRO'},
+                    'creditLimit': 2500,
+                    'currentBalance': 0.0,
+                    'creditLeftToUse': 2500,
+                    'valid': True,
+                    'iban': None}
+            self._accounts[account_number] = {'data': data, 'periods': defaultdict(list)}
+            self.add_transactions(account_number, transactions)
+
+    def add_transactions(self, account_number, transactions):
+        """Adds transactions to a credit card account, as new purchases do.
+
+        Args:
+            account_number (str): The account number of the card
+            transactions (list): The transaction dictionaries, each with a transactionDate
+
+        """
+        with self._lock:
+            periods = self._accounts[account_number]['periods']
+            for transaction in transactions:
+                periods[_period_of(transaction['transactionDate'])].append(transaction)
+            for period in periods.values():
+                period.sort(key=lambda transaction: transaction['transactionDate'], reverse=True)
+
+    def _is_authorized(self, request):
+        return bool(request.headers.get('X-XSRF-TOKEN'))
+
+    def _respond(self, request):
+        if not self._is_authorized(request):
+            return 401, {'message': 'Unauthorized'}, {}
+        return super()._respond(request)
+
+    def _get_accounts(self, request):  # pylint: disable=unused-argument
+        return 200, [{'accountNumber': account_number} for account_number in self._accounts]
+
+    def _get_account(self, request):
+        account = self._accounts.get(request.params.get('accountNumber'))
+        if account is None:
+            return 404, {'message': 'Account not found'}
+        return 200, account['data']
+
+    def _get_period_names(self, account):
+        current = _period_of(self.today.isoformat())
+        first = min(account['periods'], default=current)
+        year, month = (int(part) for part in first.split('-'))
+        names = []
+        while f'{year:04d}-{month:02d}' <= current:
+            names.append(f'{year:04d}-{month:02d}')
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return names[::-1]
+
+    def _get_periods(self, request):
+        account = self._accounts.get(request.params.get('accountNumber'))
+        if account is None:
+            return 404, {'message': 'Account not found'}
+        names = self._get_period_names(account)
+        periods = []
+        for name in names:
+            start_date, end_date = _period_dates(name)
+            periods.append({'period': name,
+                            'startDatePeriod': start_date,
+                            'endDatePeriod': end_date,
+                            'currentPeriod': name == names[0],
+                            'showStatement': name != names[0]})
+        return 200, periods
+
+    def _get_transactions(self, request):
+        account = self._accounts.get(request.params.get('accountNumber'))
+        if account is None:
+            return 404, {'message': 'Account not found'}
+        current = _period_of(self.today.isoformat())
+        from_period = request.params.get('fromPeriod', current)
+        until_period = request.params.get('untilPeriod', current)
+        transactions = [transaction
+                        for name in sorted(account['periods'], reverse=True)
+                        if from_period <= name <= until_period
+                        for transaction in account['periods'][name]]
+        return 200, transactions
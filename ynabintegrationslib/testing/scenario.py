@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: scenario.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for scenario.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+from ynabintegrationslib.lib import YNAB_URL, ServiceOptions
+from ynabintegrationslib.ynabintegrationslib import Service
+
+from .abnamro import ABN_AMRO_URL, MUTATIONS_PAGE_SIZE, FakeAbnAmroBackend
+from .ics import ICS_URL, FakeIcsBackend
+from .synthetic import (HISTORY_DAYS,
+                        card_number_for,
+                        card_to_ynab_transactions,
+                        generate_card_transactions,
+                        generate_mutations,
+                        iban_for,
+                        to_ynab_transactions,
+                        write_cookie_file)
+from .transport import FakeServer, FakeSessionManager
+from .ynab import FakeYnabBackend
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''scenario'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+BUDGET_NAME = 'Synthetic'
+CONTRACT_NAME = 'abnamro'
+CARD_CONTRACT_NAME = 'ics'
+
+
+class SyncScenario:  # pylint: disable=too-many-instance-attributes
+    """Models bank accounts and a YNAB budget filled with synthetic transactions, served by fake backends.
+
+    The transactions are split evenly over the bank accounts and the credit cards. The oldest share of every
+    account is already in the budget, as if uploaded on earlier cycles, so the service has both transactions to
+    skip and to upload.
+
+    Args:
+        transactions (int): The total number of bank transactions
+        accounts (int): The number of bank accounts
+        cards (int): The number of credit cards
+        in_budget (float): The share of the transactions of every account that is already in the budget
+        page_size (int): The number of mutations in a page of the bank
+        days (int): The number of days the transactions are spread over
+        seed (int): The seed of the synthetic data
+        token (str): The YNAB token
+
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 transactions=10,
+                 accounts=1,
+                 cards=0,
+                 in_budget=0.5,
+                 page_size=MUTATIONS_PAGE_SIZE,
+                 days=HISTORY_DAYS,
+                 seed=0,
+                 token='synthetic'):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._directory = tempfile.mkdtemp(prefix='ynabintegrationslib-')
+        self.token = token
+        self.ynab = FakeYnabBackend(token)
+        self.bank = FakeAbnAmroBackend(page_size)
+        self.ics = FakeIcsBackend()
+        self.budget_id = self.ynab.add_budget(BUDGET_NAME)
+        self.cookie_file = write_cookie_file(os.path.join(self._directory, 'cookies.txt'), '.abnamro.nl')
+        self.card_cookie_file = write_cookie_file(os.path.join(self._directory, 'ics.txt'), '.icscards.nl')
+        self.accounts = {}
+        self.cards = {}
+        self._servers = []
+        per_account, remainder = divmod(transactions, max(accounts + cards, 1))
+        self._add_accounts(accounts, per_account, remainder, in_budget, days, seed)
+        self._add_cards(cards, per_account, remainder - accounts, in_budget, days, seed + accounts)
+        self._logger.debug('Created %s accounts and %s cards with %s transactions', accounts, cards, transactions)
+
+    def _add_accounts(self,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                      count, per_account, remainder, in_budget, days, seed):
+        for index in range(count):
+            iban = iban_for(index)
+            name = f'Account {index}'
+            mutations = generate_mutations(per_account + (index < remainder), iban, days=days, seed=seed + index)
+            self.bank.add_account(iban, mutations)
+            self._add_to_budget(name, mutations, to_ynab_transactions, in_budget)
+            self.accounts[name] = iban
+
+    def _add_cards(self,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                   count, per_account, remainder, in_budget, days, seed):
+        for index in range(count):
+            number = card_number_for(index)
+            name = f'Card {index}'
+            size = per_account + (index < remainder)
+            card_transactions = generate_card_transactions(size, days=days, seed=seed + index)
+            self.ics.add_account(number, card_transactions)
+            self._add_to_budget(name, card_transactions, card_to_ynab_transactions, in_budget)
+            self.cards[name] = number
+
+    def _add_to_budget(self, name, bank_transactions, converter, in_budget):
+        account_id = self.ynab.add_account(self.budget_id, name)
+        uploaded = int(len(bank_transactions) * in_budget)
+        if uploaded:
+            self.ynab.add_transactions(self.budget_id, converter(bank_transactions, account_id)[-uploaded:])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Stops the servers and removes the files of the scenario."""
+        while self._servers:
+            self._servers.pop().stop()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def create_session_manager(self, localhost=False, **kwargs):
+        """Creates a session manager that serves the YNAB and bank urls from the fake backends.
+
+        Args:
+            localhost (bool): If True the backends are served on localhost servers instead of in process, so the
+                requests go through real sockets
+            **kwargs: Any arguments of the SessionManager
+
+        Returns:
+            session_manager (FakeSessionManager): The session manager
+
+        """
+        backends = {YNAB_URL: self.ynab, ABN_AMRO_URL: self.bank, ICS_URL: self.ics}
+        if localhost:
+            servers = {base_url: FakeServer(backend).start() for base_url, backend in backends.items()}
+            self._servers.extend(servers.values())
+            backends = servers
+        return FakeSessionManager(backends, **kwargs)
+
+    def create_service(self, localhost=False, **kwargs):
+        """Creates a service with the contracts and all the accounts of the scenario registered.
+
+        Args:
+            localhost (bool): If True the backends are served on localhost servers instead of in process
+            **kwargs: Any options of the ServiceOptions of the service
+
+        Returns:
+            service (Service): The service
+
+        """
+        kwargs.setdefault('session_manager', self.create_session_manager(localhost))
+        service = Service(self.token, ServiceOptions(**kwargs))
+        service.register_contract(CONTRACT_NAME, 'AbnAmro', 'Account', {'cookie_file': self.cookie_file})
+        for name, iban in self.accounts.items():
+            service.register_account(CONTRACT_NAME, BUDGET_NAME, name, iban)
+        if self.cards:
+            service.register_contract(CARD_CONTRACT_NAME,
+                                      'AbnAmro',
+                                      'CreditCard',
+                                      {'cookie_file': self.card_cookie_file})
+            for name, number in self.cards.items():
+                service.register_account(CARD_CONTRACT_NAME, BUDGET_NAME, name, number)
+        return service
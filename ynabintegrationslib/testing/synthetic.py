@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: synthetic.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for synthetic data.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import datetime
+import logging
+import random
+from types import SimpleNamespace
+
+from abnamrolib import AccountTransaction, CreditCardTransaction
+
+from ynabintegrationslib.adapters import AbnAmroAccountTransaction, AbnAmroCreditCardTransaction
+from ynabintegrationslib.lib import assign_occurrences
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''synthetic'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+MUTATION_KEY_FORMAT = '%Y-%m-%d-%H.%M.%S.%f'
+HISTORY_DAYS = 730
+PAYEES = ('Albert Heijn', 'Jumbo', 'NS Reizigers', 'Bol.com', 'Eneco', 'Ziggo', 'Shell', 'Gemeente Amsterdam',
+          'HEMA', 'Coolblue', 'Thuisbezorgd', 'Kruidvat', 'IKEA', 'Action', 'Werkgever B.V.')
+
+
+def iban_for(index):
+    """Creates a synthetic iban.
+
+    Args:
+        index (int): The number of the account
+
+    Returns:
+        iban (str): The iban
+
+    """
+    return f'NL00ABNA{index:010d}'
+
+
+def generate_mutations(count, account_number, end=None, days=HISTORY_DAYS, seed=0):  # pylint: disable=too-many-arguments
+    """Generates mutations like the ABN AMRO api returns them, spread evenly over a period.
+
+    Args:
+        count (int): The number of mutations
+        account_number (str): The iban of the account
+        end (datetime): The time of the most recent mutation, by default the start of today
+        days (int): The number of days the mutations are spread over
+        seed (int): The seed of the random amounts and payees so the data is the same on every run
+
+    Returns:
+        mutations (list): The mutation dictionaries, most recent first
+
+    """
+    randomizer = random.Random(seed)
+    end = end or datetime.datetime.combine(datetime.date.today(), datetime.time())
+    step = datetime.timedelta(days=days) / max(count, 1)
+    mutations = []
+    for index in range(count):
+        timestamp = end - step * index - datetime.timedelta(microseconds=index % 1000)
+        payee = randomizer.choice(PAYEES)
+        amount = round(randomizer.uniform(-250, 50), 2) or -0.01
+        mutations.append({'mutationKey': timestamp.strftime(MUTATION_KEY_FORMAT),
+                          'accountNumber': account_number,
+                          'amount': amount,
+                          'counterAccountName': payee,
+                          'counterAccountNumber': f'NL00BANK{randomizer.randrange(10 ** 10):010d}',
+                          'currencyIsoCode': 'EUR',
+                          'debitCredit': 'DEBIT' if amount < 0 else 'CREDIT',
+                          'descriptionLines': [f'{payee} {index}', f'Transaction {account_number} {index}'],
+                          'mutationCode': 'BEA',
+                          'transactionDate': int(timestamp.timestamp() * 1000),
+                          'valueDate': int(timestamp.timestamp() * 1000),
+                          'bookDate': int(timestamp.timestamp() * 1000),
+                          'transactionTimestamp': timestamp.strftime(MUTATION_KEY_FORMAT)})
+    return mutations
+
+
+def card_number_for(index):
+    """Creates a synthetic credit card account number.
+
+    Args:
+        index (int): The number of the card
+
+    Returns:
+        account_number (str): The account number
+
+    """
+    return f'{index + 1:011d}'
+
+
+def generate_card_transactions(count, end=None, days=HISTORY_DAYS, seed=0):
+    """Generates credit card transactions like the ICS api returns them, spread evenly over a period.
+
+    Args:
+        count (int): The number of transactions
+        end (date): The date of the most recent transaction, by default today
+        days (int): The number of days the transactions are spread over
+        seed (int): The seed of the random amounts and merchants so the data is the same on every run
+
+    Returns:
+        transactions (list): The transaction dictionaries, most recent first
+
+    """
+    randomizer = random.Random(seed)
+    end = end or datetime.date.today()
+    step = days / max(count, 1)
+    transactions = []
+    for index in range(count):
+        merchant = randomizer.choice(PAYEES)
+        amount = round(randomizer.uniform(1, 250), 2)
+        transactions.append({'transactionDate': (end - datetime.timedelta(days=int(step * index))).isoformat(),
+                             'description': merchant,
+                             'billingAmount': amount,
+                             'billingCurrency': 'EUR',
+                             'sourceAmount': amount,
+                             'sourceCurrency': 'EUR',
+                             'countryCode': 'NLD',
+                             'lastFourDigits': '0000',
+                             'merchantCategoryCodeDescription': 'Retail',
+                             'typeOfTransaction': 'T',
+                             'batchNr': index // 100,
+                             'batchSequenceNr': index % 100,
+                             'processingTime': '12:00',
+                             'embossingName': 'J. DOE'})
+    return transactions
+
+
+def to_ynab_transactions(mutations, account_id, import_ids=True):
+    """Converts mutations to the YNAB transactions the service would upload for them.
+
+    Args:
+        mutations (list): The mutation dictionaries of an account, most recent first
+        account_id (str): The id of the YNAB account
+        import_ids (bool): If False the transactions are created as if they were entered by hand
+
+    Returns:
+        transactions (list): The YNAB transaction dictionaries
+
+    """
+    account = SimpleNamespace(id=account_id, name=None, budget=SimpleNamespace(id=None))
+    return _to_payloads([AbnAmroAccountTransaction(AccountTransaction(mutation), account).to_record()
+                         for mutation in mutations],
+                        import_ids)
+
+
+def card_to_ynab_transactions(transactions, account_id, import_ids=True):
+    """Converts credit card transactions to the YNAB transactions the service would upload for them.
+
+    Args:
+        transactions (list): The transaction dictionaries of a card, most recent first
+        account_id (str): The id of the YNAB account
+        import_ids (bool): If False the transactions are created as if they were entered by hand
+
+    Returns:
+        transactions (list): The YNAB transaction dictionaries
+
+    """
+    account = SimpleNamespace(id=account_id, name=None, budget=SimpleNamespace(id=None))
+    return _to_payloads([AbnAmroCreditCardTransaction(CreditCardTransaction(data), account).to_record()
+                         for data in transactions],
+                        import_ids)
+
+
+def _to_payloads(transactions, import_ids):
+    payloads = [transaction.payload for transaction in assign_occurrences(transactions)]
+    if not import_ids:
+        for payload in payloads:
+            payload['import_id'] = None
+    return payloads
+
+
+def write_cookie_file(path, domain):
+    """Writes a cookie file in the netscape format abnamrolib authenticates with.
+
+    Args:
+        path (str): The path of the file
+        domain (str): The domain of the cookies
+
+    Returns:
+        path (str): The path of the file
+
+    """
+    expiry = int((datetime.datetime.now() + datetime.timedelta(days=365)).timestamp())
+    with open(path, 'w', encoding='utf-8') as cookie_file:
+        cookie_file.write('# Netscape HTTP Cookie File\n')
+        for name, value in (('SMSESSION', 'synthetic'), ('XSRF-TOKEN', 'synthetic'), ('dtPC', 'synthetic')):
+            cookie_file.write(f'{domain}\tTRUE\t/\tTRUE\t{expiry}\t{name}\t{value}\n')
+    return path
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: transport.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for transport.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from ynabintegrationslib.lib import SessionManager
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''transport'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+HISTORY_SIZE = 1000
+
+
+class FakeRequest:  # pylint: disable=too-few-public-methods
+    """Models a request received by a fake backend.
+
+    Args:
+        method (str): The HTTP method
+        path (str): The path of the url
+        params (dict): The query parameters, the last value of every repeated one
+        headers (dict): The headers
+        body (bytes): The raw body
+
+    """
+
+    def __init__(self, method, path, params=None, headers=None, body=None):  # pylint: disable=too-many-arguments
+        self.method = method.upper()
+        self.path = path
+        self.params = params or {}
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.body = body or b''
+
+    @property
+    def json(self):
+        """The body parsed as json, None if there is no body."""
+        return json.loads(self.body) if self.body else None
+
+
+class FakeBackend:  # pylint: disable=too-many-instance-attributes
+    """Models an in memory stand in of a remote api that routes requests to handlers.
+
+    Handlers are registered with a method and a regular expression of the path whose named groups are passed to
+    them as keyword arguments. They return a tuple of status code, json serializable payload and optionally a
+    dictionary of headers. All handlers run under a lock so the state of a backend is consistent across threads.
+
+    Latency is added to every request outside the lock, so concurrent requests overlap like they would on a real
+    server. Errors are injected with a seeded random generator, so a run with the same requests fails the same way.
+    The highest number of requests in flight at once is kept, to check the concurrency limits of the clients.
+
+    Args:
+        latency (float): The seconds every request takes
+        error_rate (float): The share of the requests that fail with a server error
+        seed (int): The seed of the error injection
+
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._lock = threading.RLock()
+        self._routes = []
+        self._random = random.Random(seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self._failures = Counter()
+        self.requests = 0
+        self.status_codes = Counter()
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.in_flight = 0
+        self.peak_concurrency = 0
+
+    def route(self, method, pattern, handler):
+        """Registers a handler for requests matching a method and a path.
+
+        Args:
+            method (str): The HTTP method
+            pattern (str): A regular expression that has to match the whole path
+            handler (callable): Called with the FakeRequest and the named groups of the pattern
+
+        """
+        self._routes.append((method.upper(), re.compile(pattern), handler))
+
+    def fail(self, count=1, method=None):
+        """Fails the next requests with a server error regardless of the error rate.
+
+        Args:
+            count (int): The number of requests to fail
+            method (str): The HTTP method of the requests to fail, None for any
+
+        """
+        with self._lock:
+            self._failures[method.upper() if method else None] += count
+
+    def handle(self, request):
+        """Handles a request.
+
+        Args:
+            request (FakeRequest): The request to handle
+
+        Returns:
+            (status_code, payload, headers) (tuple): The status code, the json payload and the headers of the response
+
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                self.requests += 1
+                self.history.append(request)
+                status_code, payload, headers = self._respond(request)
+                self.status_codes[status_code] += 1
+                return status_code, payload, headers
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _is_failed(self, request):
+        for method in (request.method, None):
+            if self._failures[method]:
+                self._failures[method] -= 1
+                return True
+        return bool(self.error_rate) and self._random.random() < self.error_rate
+
+    def _respond(self, request):
+        if self._is_failed(request):
+            return 503, {'error': {'id': '503', 'name': 'service_unavailable', 'detail': 'Injected error'}}, {}
+        for method, pattern, handler in self._routes:
+            match = pattern.fullmatch(request.path)
+            if match and method == request.method:
+                status_code, payload, *headers = handler(request, **match.groupdict())
+                return status_code, payload, headers[0] if headers else {}
+        self._logger.warning('No route for %s "%s"', request.method, request.path)
+        return 404, {'error': {'id': '404', 'name': 'not_found', 'detail': f'No route for {request.path}'}}, {}
+
+
+class InProcessAdapter(BaseAdapter):
+    """Models a transport adapter that serves requests from a fake backend without any network.
+
+    Args:
+        backend (FakeBackend): The backend to serve the requests with
+        prefix (str): The path prefix of the base url the adapter is mounted on, stripped before routing
+
+    """
+
+    def __init__(self, backend, prefix=''):
+        super().__init__()
+        self.backend = backend
+        self.prefix = prefix.rstrip('/')
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ,unused-argument
+        """Sends a prepared request to the backend."""
+        url = urlsplit(request.url)
+        path = url.path[len(self.prefix):] if url.path.startswith(self.prefix) else url.path
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        fake_request = FakeRequest(request.method,
+                                   path,
+                                   dict(parse_qsl(url.query)),
+                                   dict(request.headers),
+                                   body)
+        status_code, payload, headers = self.backend.handle(fake_request)
+        response = Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json', **headers})
+        response._content = json.dumps(payload).encode('utf-8')  # pylint: disable=protected-access
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if response.ok else 'Error'
+        return response
+
+    def close(self):
+        """Nothing to close."""
+
+
+class ForwardingAdapter(HTTPAdapter):
+    """Models a transport adapter that sends the requests for a base url to a fake server on localhost instead.
+
+    Args:
+        base_url (str): The base url the adapter is mounted on
+        target_url (str): The base url of the server to send the requests to
+
+    """
+
+    def __init__(self, base_url, target_url):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.target_url = target_url.rstrip('/')
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        """Sends a prepared request to the server."""
+        if request.url.startswith(self.base_url):
+            request.url = f'{self.target_url}{request.url[len(self.base_url):]}'
+        return super().send(request, **kwargs)
+
+
+class FakeSessionManager(SessionManager):
+    """Models a session manager that serves the urls of fake backends in process or from fake servers.
+
+    Every session mounted on the manager gets an adapter per base url, which takes precedence over the pooled
+    adapters as requests picks the adapter with the longest matching prefix. A backend is served in process, a fake
+    server is sent the requests over localhost, so the clients keep using the real urls either way. Requests to any
+    other url go through the pooled adapters as usual.
+
+    Args:
+        backends (dict): The fake backends or fake servers by the base url they stand in for
+        **kwargs: Any other arguments of the SessionManager
+
+    """
+
+    def __init__(self, backends, **kwargs):
+        self.transports = {base_url: self._create_transport(base_url, backend) for base_url, backend in backends.items()}
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _create_transport(base_url, backend):
+        if isinstance(backend, FakeServer):
+            return ForwardingAdapter(base_url, backend.url)
+        return InProcessAdapter(backend, urlsplit(base_url).path)
+
+    def mount(self, session, prefix='https://', adapter=None):
+        """Mounts the adapter as the manager does along with the in process adapters of the fake backends."""
+        super().mount(session, prefix, adapter)
+        for base_url, transport in self.transports.items():
+            session.mount(base_url, transport)
+        return session
+
+
+class _FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _serve(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        request = FakeRequest(self.command,
+                              url.path,
+                              dict(parse_qsl(url.query)),
+                              dict(self.headers.items()),
+                              self.rfile.read(length) if length else b'')
+        status_code, payload, headers = self.server.backend.handle(request)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status_code)
+        for name, value in {'Content-Type': 'application/json', **headers}.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve  # noqa: N815
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug(format, *args)
+
+
+class FakeServer:
+    """Models a localhost HTTP server serving a fake backend on a thread.
+
+    Unlike the in process adapter, requests to the server go through the real pooled transport, so connection
+    reuse and the rate limited retries are exercised as well.
+
+    Args:
+        backend (FakeBackend): The backend to serve
+        host (str): The address to listen on
+        port (int): The port to listen on, 0 for any free port
+
+    """
+
+    def __init__(self, backend, host='127.0.0.1', port=0):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._server = ThreadingHTTPServer((host, port), _FakeRequestHandler)
+        self._server.daemon_threads = True
+        self._server.backend = backend
+        self._thread = None
+        self.backend = backend
+
+    @property
+    def url(self):
+        """The base url of the server."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Starts serving on a background thread.
+
+        Returns:
+            server (FakeServer): The server
+
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+            self._logger.debug('Serving %s on %s', self.backend.__class__.__name__, self.url)
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
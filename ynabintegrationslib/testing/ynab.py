@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# File: ynab.py
+#
+# Copyright 2019 Costas Tyfoxylos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to
+#  deal in the Software without restriction, including without limitation the
+#  rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+#  sell copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+#  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#  DEALINGS IN THE SOFTWARE.
+#
+
+"""
+Main code for the fake ynab api.
+
+.. _Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+"""
+
+import logging
+import time
+from collections import deque
+
+from .transport import FakeBackend
+
+__author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
+__docformat__ = '''google'''
+__date__ = '''08-07-2019'''
+__copyright__ = '''Copyright 2019, Costas Tyfoxylos'''
+__credits__ = ["Costas Tyfoxylos"]
+__license__ = '''MIT'''
+__maintainer__ = '''Costas Tyfoxylos'''
+__email__ = '''<costas.tyf@gmail.com>'''
+__status__ = '''Development'''  # "Prototype", "Development", "Production".
+
+# This is the main prefix used for logging
+LOGGER_BASENAME = '''ynab'''
+LOGGER = logging.getLogger(LOGGER_BASENAME)
+LOGGER.addHandler(logging.NullHandler())
+
+RATE_LIMIT_PERIOD = 3600
+
+
+def _error(status_code, name, detail):
+    return status_code, {'error': {'id': str(status_code), 'name': name, 'detail': detail}}
+
+
+class FakeYnabBackend(FakeBackend):  # pylint: disable=too-many-instance-attributes
+    """Models an in memory stand in of the YNAB api with the endpoints ynablib and the service use.
+
+    Budgets hold accounts and transactions. Every change bumps the server knowledge of its budget so transactions
+    can be requested by since_date and last_knowledge_of_server, and bulk creation rejects import ids that already
+    exist on an account as duplicates, like YNAB does.
+
+    Like YNAB, every response reports the requests made in the current window in an "X-Rate-Limit" header of the
+    form "used/limit" and requests over the limit are rejected with a 429 until the oldest ones fall out of the
+    window. The limit and the injected faults are plain attributes so they can be changed between steps of a test.
+
+    Args:
+        token (str): The token requests have to be authenticated with, None to accept any
+        rate_limit (int): The number of requests allowed in a window, None for no limit
+        rate_limit_period (int): The seconds of the rate limit window
+        retry_after (int): The seconds reported in the "Retry-After" header of the 429 responses, None for no header
+        **kwargs: Any arguments of the FakeBackend for latency and error injection
+
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 token=None,
+                 rate_limit=None,
+                 rate_limit_period=RATE_LIMIT_PERIOD,
+                 retry_after=None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.token = token
+        self.rate_limit = rate_limit
+        self.rate_limit_period = rate_limit_period
+        self.retry_after = retry_after
+        self._window = deque()
+        self._throttled = 0
+        self._budgets = {}
+        self._ids = 0
+        self.route('GET', r'/v1/budgets', self._get_budgets)
+        self.route('GET', r'/v1/budgets/(?P<budget_id>[^/]+)/accounts', self._get_accounts)
+        self.route('GET', r'/v1/budgets/(?P<budget_id>[^/]+)/transactions', self._get_transactions)
+        self.route('GET',
+                   r'/v1/budgets/(?P<budget_id>[^/]+)/accounts/(?P<account_id>[^/]+)/transactions',
+                   self._get_transactions)
+        self.route('POST', r'/v1/budgets/(?P<budget_id>[^/]+)/transactions', self._create_transactions)
+
+    def _next_id(self, kind):
+        self._ids += 1
+        return f'{kind}-{self._ids:08d}'
+
+    def _is_authorized(self, request):
+        return self.token is None or request.headers.get('Authorization') == f'Bearer {self.token}'
+
+    def throttle(self, count=1):
+        """Rejects the next requests with a 429 regardless of the rate limit.
+
+        Args:
+            count (int): The number of requests to reject
+
+        """
+        with self._lock:
+            self._throttled += count
+
+    def _rate_limit_headers(self):
+        now = time.monotonic()
+        while self._window and self._window[0] <= now - self.rate_limit_period:
+            self._window.popleft()
+        over_limit = self.rate_limit is not None and len(self._window) >= self.rate_limit
+        if not over_limit:
+            self._window.append(now)
+        headers = {'X-Rate-Limit': f'{len(self._window)}/{self.rate_limit}'} if self.rate_limit is not None else {}
+        return over_limit, headers
+
+    def _respond(self, request):
+        if not self._is_authorized(request):
+            return (*_error(401, 'unauthorized', 'Unauthorized'), {})
+        over_limit, headers = self._rate_limit_headers()
+        if over_limit or self._throttled:
+            self._throttled = max(self._throttled - 1, 0)
+            if self.retry_after is not None:
+                headers['Retry-After'] = str(self.retry_after)
+            return (*_error(429, 'too_many_requests', 'Too many requests'), headers)
+        status_code, payload, response_headers = super()._respond(request)
+        return status_code, payload, {**headers, **response_headers}
+
+    def add_budget(self, name):
+        """Adds a budget.
+
+        Args:
+            name (str): The name of the budget
+
+        Returns:
+            budget_id (str): The id of the budget
+
+        """
+        with self._lock:
+            budget_id = self._next_id('budget')
+            self._budgets[budget_id] = {'data': {'id': budget_id, 'name': name},
+                                        'accounts': {},
+                                        'transactions': {},
+                                        'import_ids': set(),
+                                        'server_knowledge': 0}
+            return budget_id
+
+    def add_account(self, budget_id, name):
+        """Adds an account to a budget.
+
+        Args:
+            budget_id (str): The id of the budget
+            name (str): The name of the account
+
+        Returns:
+            account_id (str): The id of the account
+
+        """
+        with self._lock:
+            account_id = self._next_id('account')
+            self._budgets[budget_id]['accounts'][account_id] = {'id': account_id,
+                                                                'name': name,
+                                                                'type': 'checking',
+                                                                'on_budget': True,
+                                                                'closed': False,
+                                                                'deleted': False,
+                                                                'balance': 0}
+            return account_id
+
+    def add_transactions(self, budget_id, transactions):
+        """Adds transactions to a budget as if they were entered on YNAB.
+
+        Args:
+            budget_id (str): The id of the budget
+            transactions (list): Dictionaries with at least account_id, amount and date
+
+        Returns:
+            (created, duplicate_import_ids) (tuple): The created transactions and the import ids that already existed
+
+        """
+        with self._lock:
+            budget = self._budgets[budget_id]
+            budget['server_knowledge'] += 1
+            created, duplicates = [], []
+            for transaction in transactions:
+                import_id = transaction.get('import_id')
+                if import_id and (transaction.get('account_id'), import_id) in budget['import_ids']:
+                    duplicates.append(import_id)
+                    continue
+                if import_id:
+                    budget['import_ids'].add((transaction.get('account_id'), import_id))
+                data = {'memo': None,
+                        'payee_name': None,
+                        'import_id': None,
+                        'cleared': 'uncleared',
+                        'approved': False,
+                        'deleted': False,
+                        **transaction,
+                        'account_name': budget['accounts'].get(transaction.get('account_id'), {}).get('name'),
+                        'id': self._next_id('transaction'),
+                        'server_knowledge': budget['server_knowledge']}
+                budget['transactions'][data['id']] = data
+                created.append(data)
+            return created, duplicates
+
+    def delete_transaction(self, budget_id, transaction_id):
+        """Deletes a transaction so it is reported as deleted to delta requests.
+
+        Args:
+            budget_id (str): The id of the budget
+            transaction_id (str): The id of the transaction
+
+        """
+        with self._lock:
+            budget = self._budgets[budget_id]
+            budget['server_knowledge'] += 1
+            budget['transactions'][transaction_id].update({'deleted': True,
+                                                           'server_knowledge': budget['server_knowledge']})
+
+    def get_transactions(self, budget_id):
+        """Retrieves the transactions of a budget that are not deleted.
+
+        Args:
+            budget_id (str): The id of the budget
+
+        Returns:
+            transactions (list): The transaction dictionaries
+
+        """
+        with self._lock:
+            return [transaction for transaction in self._budgets[budget_id]['transactions'].values()
+                    if not transaction['deleted']]
+
+    def _get_budgets(self, request):  # pylint: disable=unused-argument
+        budgets = [budget['data'] for budget in self._budgets.values()]
+        return 200, {'data': {'budgets': budgets, 'default_budget': None}}
+
+    def _get_accounts(self, request, budget_id):  # pylint: disable=unused-argument
+        budget = self._budgets.get(budget_id)
+        if budget is None:
+            return _error(404, 'resource_not_found', 'Budget not found')
+        return 200, {'data': {'accounts': list(budget['accounts'].values()),
+                              'server_knowledge': budget['server_knowledge']}}
+
+    def _get_transactions(self, request, budget_id, account_id=None):
+        budget = self._budgets.get(budget_id)
+        if budget is None:
+            return _error(404, 'resource_not_found', 'Budget not found')
+        since_date = request.params.get('since_date')
+        knowledge = int(request.params.get('last_knowledge_of_server', 0))
+        transactions = [{key: value for key, value in transaction.items() if key != 'server_knowledge'}
+                        for transaction in budget['transactions'].values()
+                        if transaction['server_knowledge'] > knowledge
+                        and (knowledge or not transaction['deleted'])
+                        and (since_date is None or transaction['date'] >= since_date)
+                        and (account_id is None or transaction['account_id'] == account_id)]
+        return 200, {'data': {'transactions': transactions, 'server_knowledge': budget['server_knowledge']}}
+
+    def _create_transactions(self, request, budget_id):
+        if budget_id not in self._budgets:
+            return _error(404, 'resource_not_found', 'Budget not found')
+        body = request.json or {}
+        transactions = body.get('transactions', [body['transaction']] if 'transaction' in body else None)
+        if not transactions:
+            return _error(400, 'bad_request', 'No transactions provided')
+        if any(transaction.get('account_id') not in self._budgets[budget_id]['accounts']
+               for transaction in transactions):
+            return _error(400, 'bad_request', 'Unknown account')
+        created, duplicates = self.add_transactions(budget_id, transactions)
+        return 201, {'data': {'transaction_ids': [transaction['id'] for transaction in created],
+                              'duplicate_import_ids': duplicates,
+                              'server_knowledge': self._budgets[budget_id]['server_knowledge']}}
@@ -31,14 +31,32 @@ Main code for ynabintegrationslib.
 
 """
 
+import asyncio
+import datetime
+import functools
 import importlib
 import logging
-import datetime
-from collections import deque
-
-from ynablib import Ynab
-
-from .lib import YnabContract, YnabServerTransaction
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib import (ServiceOptions,
+                  assign_occurrences,
+                  iter_with_occurrences,
+                  YnabClient,
+                  YnabContract,
+                  TransactionCache,
+                  BudgetTransactions,
+                  MetadataCache,
+                  RateLimiter,
+                  RateLimitedAdapter,
+                  SessionManager,
+                  UploadResult,
+                  Uploader,
+                  BackfillCheckpoint,
+                  BackfillEngine,
+                  Telemetry,
+                  bind_to_context,
+                  submit_in_context)
+from .lib.backfill import BACKFILL_RANGE_DAYS
 from .ynabintegrationslibexceptions import MultipleBudgets
 
 __author__ = '''Costas Tyfoxylos <costas.tyf@gmail.com>'''
@@ -56,58 +74,110 @@ LOGGER_BASENAME = '''ynabintegrationslib'''
 LOGGER = logging.getLogger(LOGGER_BASENAME)
 LOGGER.addHandler(logging.NullHandler())
 
-TRANSACTIONS_QUEUE_SIZE = 100
+DEFAULT_ASYNC_WORKERS = 32
 
 
-class Service:
-    """Models a service to retrieve transactions and upload them to YNAB."""
+class Service:  # pylint: disable=too-many-instance-attributes
+    """Models a service to retrieve transactions and upload them to YNAB.
 
-    def __init__(self, ynab_token):
+    Args:
+        ynab_token (str): The token to authenticate with YNAB
+        options (ServiceOptions): The tuning options and collaborators of the service, by default the defaults
+
+    """
+
+    def __init__(self, ynab_token, options=None):
         self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
-        self._accounts = []
-        self._contracts = []
-        self._ynab = Ynab(ynab_token)
-        self._transactions = deque(maxlen=TRANSACTIONS_QUEUE_SIZE)
+        self.options = options or ServiceOptions()
+        self._telemetry = Telemetry.from_options(self.options)
+        self._accounts = {}
+        self._contracts = {}
+        self._rate_limiter = self.options.rate_limiter or RateLimiter.for_token(ynab_token)
+        self._sessions = self.options.session_manager or SessionManager()
+        self._ynab = YnabClient(ynab_token, self.options.ynab_url, session_factory=self._create_ynab_session)
+        self._metadata = MetadataCache(self._ynab, self.options.metadata_ttl)
+        self._transactions = TransactionCache(self.options.transactions_cache_size, self.options.transactions_cache_age)
+        self._uploader = Uploader(self._ynab, self._telemetry, self.options, on_uploaded=self._persist_transactions)
+        self._budget_transactions = {}
+        self._store = self.options.transactions_store
+        if self._store:
+            fingerprints = self._store.load(self.options.transactions_cache_size)
+            self._logger.debug('Loaded %s handled transactions from the store', len(fingerprints))
+            self._transactions.load(fingerprints)
+        if self._telemetry.metrics:
+            self._telemetry.metrics.bind(self._rate_limiter, self._sessions, self._metadata, self._transactions)
 
     @property
     def budgets(self):
         """Budgets."""
-        return self._ynab.budgets
+        return self._metadata.budgets
 
-    def get_transactions_for_budget(self, budget_name=None):
+    def _create_ynab_session(self):
+        session = self._sessions.create_session()
+        adapter = self._sessions.create_adapter(RateLimitedAdapter,
+                                                rate_limiter=self._rate_limiter,
+                                                on_response=self._telemetry.on_ynab_response)
+        for prefix in ('https://', 'http://'):
+            self._sessions.mount(session, prefix, adapter)
+        return session
+
+    @property
+    def telemetry(self):
+        """The reports, hooks, tracer, profiler and metrics of the cycles of the service."""
+        return self._telemetry
+
+    @property
+    def session_manager(self):
+        """The pooled HTTP layer of the service."""
+        return self._sessions
+
+    @property
+    def metadata_cache(self):
+        """The cache of the budgets and accounts, invalidated with metadata_cache.invalidate()."""
+        return self._metadata
+
+    def get_transactions_for_budget(self, budget_name=None, since_date=None):
         """Gets the transactions for a budget.
 
         Args:
             budget_name (str): The name of the budget to get the transactions for
+            since_date (str): An ISO formatted date to only get the transactions on or after it
 
         Returns:
-            transactions (list): A list of YnabTransaction objects for the account.
+            transactions (list): A list of TransactionRecord objects for the budget.
 
         """
-        if len(self.budgets) > 1 and budget_name is None:
+        budget = self._get_budget(budget_name)
+        if not budget:
+            return []
+        budget_transactions = self._get_budget_transactions(budget)
+        # Syncs of different accounts ask for different windows, so the widest one is kept for the delta requests.
+        budget_transactions.refresh(since_date, shrink=False)
+        return budget_transactions.get_transactions(since_date)
+
+    def _get_budget(self, budget_name):
+        budgets = self.budgets
+        if len(budgets) > 1 and budget_name is None:
             self._logger.error('There are multiple budgets and no budget name was provided')
             raise MultipleBudgets
         if budget_name is None:
             self._logger.debug('No budget name provided returning the only budget registered')
-            budget = self.budgets[0]
-        else:
-            self._logger.debug('Trying to retrieve budget with name "%s"', budget_name)
-            budget = next((budget for budget in self.budgets
-                           if budget.name.lower() == budget_name.lower()), None)
-        if not budget:
-            return []
-        return [YnabServerTransaction(transaction, transaction.account)
-                for transaction in budget.transactions]
+            return budgets[0]
+        self._logger.debug('Trying to retrieve budget with name "%s"', budget_name)
+        return self._metadata.get_budget_by_name(budget_name)
+
+    def _get_budget_transactions(self, budget):
+        return self._budget_transactions.setdefault(budget.id, BudgetTransactions(self._ynab, budget))
 
     @property
     def accounts(self):
         """Accounts."""
-        return self._accounts
+        return list(self._accounts.values())
 
     @property
     def contracts(self):
         """Contracts."""
-        return self._contracts
+        return list(self._contracts.values())
 
     def get_contract_by_name(self, name):
         """Retrieves a contract by name.
@@ -119,8 +189,7 @@ class Service:
             contract (Contract): A contract if a match is found else None
 
         """
-        return next((contract for contract in self.contracts
-                     if contract.name.lower() == name.lower()), None)
+        return self._contracts.get(name.casefold())
 
     def get_account_by_name(self, name):
         """Retrieves an account by name.
@@ -132,8 +201,7 @@ class Service:
             account (Account): An account if a match is found else None
 
         """
-        return next((account for account in self.accounts
-                     if account.ynab_account_name.lower() == name.lower()), None)
+        return self._accounts.get(name.casefold())
 
     def get_transactions_for_ynab_account(self, account_name):
         """Gets the transactions for a YNAB account.
@@ -142,14 +210,16 @@ class Service:
             account_name (str): The name of the account in YNAB to get transactions for.
 
         Returns:
-            transactions (list): A list of YnabServerTransaction objects
+            transactions (list): A list of TransactionRecord objects for the account.
 
         """
         account = self.get_account_by_name(account_name)
         if not account:
             return []
-        return [YnabServerTransaction(transaction, transaction.account)
-                for transaction in account.transactions]
+        budget_transactions = self._get_budget_transactions(account.ynab_account.budget)
+        budget_transactions.refresh(shrink=False)
+        return [transaction for transaction in budget_transactions.get_transactions()
+                if transaction.account_id == account.ynab_account.id]
 
     def register_contract(self, name, bank, contract_type, credentials):
         """Registers an account in the service.
@@ -164,13 +234,35 @@ class Service:
             bool (bool) : True on success, False otherwise
 
         """
+        if name.casefold() in self._contracts:
+            self._logger.error('A contract with name "%s" is already registered', name)
+            return False
         try:
-            self._contracts.append(YnabContract(name, bank, contract_type, credentials))
+            self._contracts[name.casefold()] = YnabContract(name,
+                                                            bank,
+                                                            contract_type,
+                                                            credentials,
+                                                            session_manager=self._sessions)
             return True
         except Exception:  # pylint: disable=broad-except
             self._logger.exception('Problem registering contract')
             return False
 
+    def unregister_contract(self, name):
+        """Unregisters a contract from the service.
+
+        Args:
+            name: The friendly name of the contract to unregister
+
+        Returns:
+            bool (bool) : True if the contract was registered, False otherwise
+
+        """
+        if self._contracts.pop(name.casefold(), None) is None:
+            self._logger.error('Could not get contract by name "%s"', name)
+            return False
+        return True
+
     def register_account(self, contract_name, budget_name, ynab_account_name, account_id=None):
         """Registers an account in the service.
 
@@ -188,26 +280,37 @@ class Service:
         if not ynab_contract:
             self._logger.error('Could not get contract by name "%s"', contract_name)
             return False
+        if ynab_account_name.casefold() in self._accounts:
+            self._logger.error('An account with name "%s" is already registered', ynab_account_name)
+            return False
         try:
             account_wrapper = getattr(importlib.import_module('ynabintegrationslib.adapters'),
                                       f'{ynab_contract.bank}{ynab_contract.type}')
             account = ynab_contract.contract.get_account(account_id)
-            self._accounts.append(account_wrapper(account,
-                                                  self._ynab,
-                                                  budget_name,
-                                                  ynab_account_name))
+            self._accounts[ynab_account_name.casefold()] = account_wrapper(account,
+                                                                           self._ynab,
+                                                                           budget_name,
+                                                                           ynab_account_name,
+                                                                           metadata_cache=self._metadata)
             return True
         except Exception:  # pylint: disable=broad-except
             self._logger.exception('Problem registering account')
             return False
 
-    def _filter_transaction(self, transaction):
-        conditions = [transaction in self._transactions,
-                      (hasattr(transaction, 'is_reserved') and transaction.is_reserved),
-                      transaction.date is None]
-        # ICS Credit card creates an unusable transaction with no date like
-        # "Incasso okt 2019 betreffende uw creditcard ICS-klantnummer XXXXXXX"
-        return any(conditions)
+    def unregister_account(self, name):
+        """Unregisters an account from the service.
+
+        Args:
+            name: The name of the account in YNAB to unregister
+
+        Returns:
+            bool (bool) : True if the account was registered, False otherwise
+
+        """
+        if self._accounts.pop(name.casefold(), None) is None:
+            self._logger.error('Could not get account by name "%s"', name)
+            return False
+        return True
 
     @staticmethod
     def _to_list(transactions):
@@ -215,91 +318,583 @@ class Service:
             transactions = [transactions]
         return transactions
 
-    def get_latest_transactions(self):
-        """Retrieves the latest transactions from all accounts.
+    def _get_account_latest_transactions(self, account):
+        name = account.ynab_account.name
+        self._logger.debug('Getting transactions for account "%s"', name)
+        with self._telemetry.span('account.get_latest_transactions', account=name) as span:
+            with self._telemetry.stage('fetch', name):
+                fetched = list(account.get_latest_transactions())
+            with self._telemetry.stage('filter', name):
+                transactions = assign_occurrences(fetched)
+                transactions = [transaction for transaction in transactions if transaction not in self._transactions]
+            span.set_attributes({'transactions': len(fetched), 'transactions.new': len(transactions)})
+        self._telemetry.count('fetched', len(fetched), name)
+        self._telemetry.count('filtered', len(fetched) - len(transactions), name)
+        return transactions
 
-        Returns:
-            transactions (Transaction): A list of transactions to upload to YNAB.
+    def _try_get_account_latest_transactions(self, account):
+        # A failing account is reported on the cycle without cancelling the others.
+        try:
+            return self._get_account_latest_transactions(account)
+        except Exception:  # pylint: disable=broad-except
+            self._logger.exception('Problem retrieving transactions for account "%s"', account.ynab_account.name)
+            self._telemetry.fail_account(account.ynab_account.name)
+            return []
 
-        """
-        first_run = False
-        if not self._transactions:
-            first_run = True
+    def _get_accounts(self, names=None):
+        if names is None:
+            return self.accounts
+        accounts = []
+        for name in names:
+            account = self.get_account_by_name(name)
+            if not account:
+                self._logger.error('Could not get account by name "%s"', name)
+                continue
+            accounts.append(account)
+        return accounts
+
+    def _get_accounts_latest_transactions_concurrently(self, accounts):
+        with ThreadPoolExecutor(max_workers=self.options.max_workers) as executor:
+            futures = [submit_in_context(executor, self._try_get_account_latest_transactions, account)
+                       for account in accounts]
+        # Results are merged in the order the accounts were registered, so the outcome does not depend on
+        # which bank answered first.
+        return [transaction for future in futures for transaction in future.result()]
+
+    def _get_accounts_latest_transactions(self, accounts=None):
+        accounts = self.accounts if accounts is None else accounts
+        if self.options.concurrent_fetching:
+            return self._get_accounts_latest_transactions_concurrently(accounts)
         transactions = []
-        for account in self.accounts:
-            self._logger.debug('Getting transactions for account "%s"', account.ynab_account.name)
-            for transaction in account.get_latest_transactions():
-                if not self._filter_transaction(transaction):
-                    transactions.append(transaction)
+        for account in accounts:
+            transactions.extend(self._try_get_account_latest_transactions(account))
+        return transactions
+
+    @property
+    def _is_first_run(self):
+        return not self._transactions.added
+
+    def _persist_transactions(self, transactions):
+        if self._store:
+            self._store.add([transaction.fingerprint for transaction in transactions])
+
+    def _cache_latest_transactions(self, transactions, first_run):
         self._logger.debug('Caching %s transactions', len(transactions))
         self._transactions.extend(transactions)
         if first_run:
             self._logger.info('First run detected, discarding transactions until now')
+            self._persist_transactions(transactions)
             return []
         return transactions
 
+    def get_latest_transactions(self):
+        """Retrieves the latest transactions from all accounts.
+
+        Returns:
+            transactions (Transaction): A list of transactions to upload to YNAB.
+
+        """
+        return self._telemetry.run_cycle('get_latest_transactions', self._get_latest_transactions)
+
+    def _get_latest_transactions(self):
+        first_run = self._is_first_run
+        transactions = self._get_accounts_latest_transactions()
+        return self._cache_latest_transactions(transactions, first_run)
+
     def get_all_latest_transactions(self):
         """Retrieves the latest transactions from all accounts.
 
+        Accounts that fail are logged and skipped whether they are fetched concurrently or not, and are listed in
+        the failed_accounts of the report of the cycle, telemetry.last_cycle_report.
+
         Returns:
             transactions (Transaction): A list of transactions to upload to YNAB.
 
         """
-        transactions = []
-        for account in self.accounts:
-            self._logger.debug('Getting transactions for account "%s"', account.ynab_account.name)
-            for transaction in account.get_latest_transactions():
-                if not self._filter_transaction(transaction):
-                    transactions.append(transaction)
+        return self._telemetry.run_cycle('get_all_latest_transactions', self._get_accounts_latest_transactions)
+
+    def _get_server_transactions_for(self, bank_transactions, budget_name):
+        if not bank_transactions:
+            return []
+        if self.options.server_side_dedup:
+            self._logger.debug('Skipping the budget download, duplicates are rejected by YNAB on their import id')
+            return []
+        since_date = min(transaction.date for transaction in bank_transactions)
+        account_ids = {transaction.account_id for transaction in bank_transactions}
+        self._logger.debug('Getting transactions for Ynab budget since "%s" for %s accounts',
+                           since_date,
+                           len(account_ids))
+        with self._telemetry.stage('budget'), \
+                self._telemetry.span('ynab.get_budget_transactions', since_date=since_date) as span:
+            server_transactions = self.get_transactions_for_budget(budget_name, since_date)
+            span.set_attribute('transactions', len(server_transactions))
+        return [transaction for transaction in server_transactions if transaction.account_id in account_ids]
+
+    def _difference(self, bank_transactions, server_transactions):
+        with self._telemetry.stage('diff'):
+            transactions = set(bank_transactions) - set(server_transactions)
+        self._telemetry.count('deduped', len(bank_transactions) - len(transactions))
         return transactions
 
-    def upload_latest_transactions(self, budget_name=None):
-        """Uploads latest transactions to YNAB."""
+    def upload_latest_transactions(self, budget_name=None, accounts=None):
+        """Uploads latest transactions to YNAB.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+            accounts (list): The names of the accounts in YNAB to upload the latest transactions of, None for all
+
+        Returns:
+            result (UploadResult): The result of the upload
+
+        """
+        return self._telemetry.run_cycle('upload_latest_transactions',
+                                         self._upload_latest_transactions,
+                                         budget_name,
+                                         self._get_accounts(accounts))
+
+    def _upload_latest_transactions(self, budget_name, accounts=None):
+        if self.options.streaming:
+            return self._stream_latest_transactions(budget_name, accounts)
         self._logger.debug('Getting all latest transactions for all bank accounts')
-        bank_transactions = self.get_all_latest_transactions()
-        self._logger.debug('Getting all transactions for Ynab budget')
-        server_transactions = self.get_transactions_for_budget(budget_name)
-        self.upload_transactions(set(bank_transactions) - set(server_transactions))
+        bank_transactions = self._get_accounts_latest_transactions(accounts)
+        server_transactions = self._get_server_transactions_for(bank_transactions, budget_name)
+        return self.upload_transactions(self._difference(bank_transactions, server_transactions))
+
+    def _stream_latest_transactions(self, budget_name, accounts=None):
+        self._logger.debug('Streaming the latest transactions of all bank accounts')
+        buffer = self._uploader.create_buffer()
+        for account in self.accounts if accounts is None else accounts:
+            # A batch of latest transactions is bounded by what the bank returns for a single account.
+            transactions = self._try_get_account_latest_transactions(account)
+            server_keys = self._get_server_keys_for(transactions, budget_name)
+            with self._telemetry.stage('diff'):
+                missing = list(self._exclude_known(transactions, server_keys))
+            buffer.extend(missing)
+        return buffer.flush()
+
+    def _exclude_known(self, transactions, server_keys):
+        deduped = 0
+        try:
+            for transaction in transactions:
+                if transaction.comparison_key in server_keys:
+                    deduped += 1
+                    continue
+                yield transaction
+        finally:
+            self._telemetry.count('deduped', deduped)
+
+    def _get_server_keys_for(self, bank_transactions, budget_name):
+        if not bank_transactions or self.options.server_side_dedup:
+            return set()
+        budget = self._get_budget(budget_name)
+        if not budget:
+            return set()
+        since_date = min(transaction.date for transaction in bank_transactions)
+        account_ids = {transaction.account_id for transaction in bank_transactions}
+        budget_transactions = self._get_budget_transactions(budget)
+        with self._telemetry.stage('budget'), \
+                self._telemetry.span('ynab.get_budget_transactions', since_date=since_date) as span:
+            # The accounts have different windows so a wider local copy is kept for the rest of the accounts.
+            budget_transactions.refresh(since_date, shrink=False)
+            server_transactions = budget_transactions.get_transactions(since_date)
+            span.set_attribute('transactions', len(server_transactions))
+            return {transaction.comparison_key for transaction in server_transactions
+                    if transaction.account_id in account_ids}
+
+    def _iter_account_transactions_until(self, account, marker_date):
+        name = account.ynab_account.name
+        self._logger.debug('Trying to retrieve all transactions until "%s" for account "%s"', marker_date, name)
+        fetched = 0
+        try:
+            # The booking order of the bank can differ from the order of the dates, so the adapter pages by the
+            # dates of the transactions instead of the history being cut at the first one before the marker.
+            for transaction in account.get_transactions_for_date_range(marker_date, datetime.date.today().isoformat()):
+                fetched += 1
+                yield transaction
+        finally:
+            self._telemetry.count('fetched', fetched, name)
+
+    def _get_all_budget_transactions(self, budget_name):
+        with self._telemetry.stage('budget'), self._telemetry.span('ynab.get_budget_transactions') as span:
+            server_transactions = self.get_transactions_for_budget(budget_name)
+            span.set_attribute('transactions', len(server_transactions))
+            return server_transactions
+
+    def _get_account_transactions_until(self, account, marker_date):
+        name = account.ynab_account.name
+        with self._telemetry.stage('fetch', name), \
+                self._telemetry.span('account.transactions', account=name, marker_date=marker_date) as span:
+            transactions = assign_occurrences(list(self._iter_account_transactions_until(account, marker_date)))
+            span.set_attribute('transactions', len(transactions))
+            return transactions
 
     def upload_all_missing_transactions(self, budget_name=None):
-        """Uploads latest transactions to YNAB."""
+        """Uploads all transactions missing from YNAB since the first transaction of the budget.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+
+        Returns:
+            result (UploadResult): The result of the upload
+
+        """
+        return self._telemetry.run_cycle('upload_all_missing_transactions',
+                                         self._upload_all_missing_transactions,
+                                         budget_name)
+
+    def _upload_all_missing_transactions(self, budget_name):
         self._logger.debug('Getting all first Ynab transaction for marker date')
-        server_transactions = self.get_transactions_for_budget(budget_name)
-        first_transaction = server_transactions[0]
-        self._logger.debug('Trying to retrieve all transactions after "%s"', first_transaction.date)
-        marker_date = datetime.datetime.strptime(first_transaction.date, "%Y-%m-%d").date()
+        server_transactions = self._get_all_budget_transactions(budget_name)
+        if not server_transactions:
+            self._logger.info('No transactions in the budget to get the first date from, nothing to upload')
+            return UploadResult()
+        first_date = min(transaction.date for transaction in server_transactions)
+        self._logger.debug('Trying to retrieve all transactions after "%s"', first_date)
+        if self.options.streaming:
+            return self._stream_missing_transactions(server_transactions, first_date)
         transactions_to_upload = set()
         for account in self.accounts:
-            transactions = []
-            self._logger.debug('Trying to retrieve all transactions until "%s" for account "%s"',
-                               first_transaction.date,
-                               account.ynab_account.name)
-            for transaction in account.transactions:
-                transaction_date = datetime.datetime.strptime(transaction.date, "%Y-%m-%d").date()
-                if transaction_date < marker_date:
-                    break
-                transactions.append(transaction)
-            transactions_to_upload.update(set(transactions) - set(server_transactions))
+            transactions = self._get_account_transactions_until(account, first_date)
+            transactions_to_upload.update(self._difference(transactions, server_transactions))
         self._logger.debug('Uploading all missing transactions to Ynab')
-        self.upload_transactions(transactions_to_upload)
+        return self.upload_transactions(transactions_to_upload)
+
+    def backfill(self, budget_name=None, checkpoint_file=None, range_days=BACKFILL_RANGE_DAYS):
+        """Uploads all transactions missing from YNAB since the first transaction of the budget, range by range.
+
+        The history of every account of the budget is split in ranges of dates that are retrieved and uploaded on
+        max_workers threads. Completed ranges are saved per budget on the checkpoint file so an interrupted backfill
+        resumes where it stopped when called again with the same file.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+            checkpoint_file (str): The path of the file to save the completed ranges on, None to not save them
+            range_days (int): The number of days of every range
+
+        Returns:
+            result (UploadResult): The result of the upload
+
+        """
+        engine = BackfillEngine(self,
+                                checkpoint=BackfillCheckpoint(checkpoint_file),
+                                range_days=range_days,
+                                max_workers=self.options.max_workers)
+        return self._telemetry.run_cycle('backfill', engine.run, budget_name)
+
+    def _stream_missing_transactions(self, server_transactions, marker_date):
+        server_keys = {transaction.comparison_key for transaction in server_transactions}
+        buffer = self._uploader.create_buffer()
+        for account in self.accounts:
+            transactions = iter_with_occurrences(self._iter_account_transactions_until(account, marker_date))
+            # Fetching, filtering, comparing and the uploads of full buffers are interleaved when streaming, so they
+            # are timed as one stage.
+            name = account.ynab_account.name
+            with self._telemetry.stage('fetch', name), \
+                    self._telemetry.span('account.transactions', account=name, marker_date=marker_date):
+                buffer.extend(self._exclude_known(transactions, server_keys))
+        self._logger.debug('Uploading the rest of the missing transactions to Ynab')
+        return buffer.flush()
 
     def upload_transactions(self, transactions):
         """Uploads the provided transaction objects to YNAB.
 
+        The transactions are split per budget in chunks of at most upload_chunk_size, which are uploaded in
+        parallel if concurrent_uploads is set.
+
         Args:
             transactions (list|Transaction): A list of transaction objects or a single transaction object
 
         Returns:
-            boolean (bool): True on success, False otherwise
+            result (UploadResult): The result per chunk, which evaluates to True if all chunks were uploaded
 
         """
+        return self._telemetry.run_cycle('upload_transactions', self._upload_transactions, transactions)
+
+    def _upload_transactions(self, transactions):
         if not transactions:
             self._logger.debug('No transactions to upload')
-            return True
-        budgets = {}
-        self._logger.debug('Batching transactions per budget id.')
-        for transaction in self._to_list(transactions):
-            budgets.setdefault(transaction.account.budget.id, []).append(transaction.payload)
-        self._logger.debug('Uploading all transactions')
-        return all([self._ynab.upload_transactions(budget_id, payloads)
-                    for budget_id, payloads in budgets.items()])
+            return UploadResult()
+        return self._uploader.upload(self._to_list(transactions))
+
+
+class AsyncService:
+    """Models an asyncio native counterpart of the service to retrieve transactions and upload them to YNAB.
+
+    All bank fetches, YNAB reads and uploads are awaitables. The blocking calls of the underlying libraries are
+    offloaded on a bounded thread pool shared by all accounts, so a single process can drive many accounts
+    concurrently without a thread per account.
+
+    Args:
+        service (Service): The service to drive
+        max_workers (int): The maximum number of blocking calls that can be in flight at the same time
+
+    """
+
+    # The async service is a thin driver around the internals of the synchronous one.
+    # pylint: disable=protected-access
+
+    def __init__(self, service, max_workers=DEFAULT_ASYNC_WORKERS):
+        self._logger = logging.getLogger(f'{LOGGER_BASENAME}.{self.__class__.__name__}')
+        self._service = service
+        self._telemetry = service.telemetry
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @classmethod
+    async def create(cls, ynab_token, options=None, max_workers=DEFAULT_ASYNC_WORKERS):
+        """Creates an async service without blocking the event loop on the YNAB authentication.
+
+        Args:
+            ynab_token (str): The token to authenticate with YNAB
+            options (ServiceOptions): The options of the underlying Service
+            max_workers (int): The maximum number of blocking calls that can be in flight at the same time
+
+        Returns:
+            service (AsyncService): The async service
+
+        """
+        loop = asyncio.get_running_loop()
+        service = await loop.run_in_executor(None, functools.partial(Service, ynab_token, options))
+        return cls(service, max_workers=max_workers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Shuts down the thread pool used for the blocking calls."""
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, bind_to_context(function, *args, **kwargs))
+
+    @property
+    def service(self):
+        """The underlying synchronous service."""
+        return self._service
+
+    @property
+    def accounts(self):
+        """Accounts."""
+        return self._service.accounts
+
+    @property
+    def contracts(self):
+        """Contracts."""
+        return self._service.contracts
+
+    async def get_budgets(self):
+        """Retrieves the budgets.
+
+        Returns:
+            budgets (list): A list of the budgets on YNAB
+
+        """
+        return await self._run(lambda: self._service.budgets)
+
+    async def get_transactions_for_budget(self, budget_name=None, since_date=None):
+        """Gets the transactions for a budget.
+
+        Args:
+            budget_name (str): The name of the budget to get the transactions for
+            since_date (str): An ISO formatted date to only get the transactions on or after it
+
+        Returns:
+            transactions (list): A list of TransactionRecord objects for the budget.
+
+        """
+        return await self._run(self._service.get_transactions_for_budget, budget_name, since_date)
+
+    async def register_contract(self, name, bank, contract_type, credentials):
+        """Registers a contract in the service.
+
+        Args:
+            name: The friendly name to identify the account by
+            bank: The bank of the account
+            contract_type: The type of the contract
+            credentials: A dictionary with the required credentials to initialize the contract
+
+        Returns:
+            bool (bool) : True on success, False otherwise
+
+        """
+        return await self._run(self._service.register_contract, name, bank, contract_type, credentials)
+
+    async def register_account(self, contract_name, budget_name, ynab_account_name, account_id=None):
+        """Registers an account in the service.
+
+        Args:
+            contract_name: The friendly name of the contract the account is part of
+            budget_name: The name of the budget in YNAB the account is connected with
+            ynab_account_name: The name of the account in YNAB that the account is associated with
+            account_id: The id of the account to be identified by
+
+        Returns:
+            bool (bool) : True on success, False otherwise
+
+        """
+        return await self._run(self._service.register_account,
+                               contract_name,
+                               budget_name,
+                               ynab_account_name,
+                               account_id)
+
+    async def unregister_contract(self, name):
+        """Unregisters a contract from the service.
+
+        Args:
+            name: The friendly name of the contract to unregister
+
+        Returns:
+            bool (bool) : True if the contract was registered, False otherwise
+
+        """
+        return self._service.unregister_contract(name)
+
+    async def unregister_account(self, name):
+        """Unregisters an account from the service.
+
+        Args:
+            name: The name of the account in YNAB to unregister
+
+        Returns:
+            bool (bool) : True if the account was registered, False otherwise
+
+        """
+        return self._service.unregister_account(name)
+
+    async def _gather_per_account(self, function, *args, accounts=None):
+        accounts = self.accounts if accounts is None else accounts
+        results = await asyncio.gather(*[self._run(function, account, *args) for account in accounts],
+                                       return_exceptions=True)
+        transactions = []
+        for account, result in zip(accounts, results):
+            if isinstance(result, Exception):
+                self._logger.error('Problem retrieving transactions for account "%s"',
+                                   account.ynab_account.name,
+                                   exc_info=result)
+                self._telemetry.fail_account(account.ynab_account.name)
+                continue
+            transactions.extend(result)
+        return transactions
+
+    async def get_all_latest_transactions(self):
+        """Retrieves the latest transactions from all accounts concurrently.
+
+        Accounts that fail are logged and skipped, and are listed in the failed_accounts of the report of the cycle.
+
+        Returns:
+            transactions (Transaction): A list of transactions to upload to YNAB.
+
+        """
+        return await self._telemetry.run_cycle_async('get_all_latest_transactions',
+                                                     self._gather_per_account,
+                                                     self._service._get_account_latest_transactions)
+
+    async def get_latest_transactions(self):
+        """Retrieves the latest transactions from all accounts concurrently.
+
+        Returns:
+            transactions (Transaction): A list of transactions to upload to YNAB.
+
+        """
+        return await self._telemetry.run_cycle_async('get_latest_transactions', self._get_latest_transactions)
+
+    async def _get_latest_transactions(self):
+        first_run = self._service._is_first_run
+        transactions = await self.get_all_latest_transactions()
+        return self._service._cache_latest_transactions(transactions, first_run)
+
+    async def upload_latest_transactions(self, budget_name=None, accounts=None):
+        """Uploads latest transactions to YNAB.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+            accounts (list): The names of the accounts in YNAB to upload the latest transactions of, None for all
+
+        Returns:
+            result (UploadResult): The result of the upload
+
+        """
+        return await self._telemetry.run_cycle_async('upload_latest_transactions',
+                                                     self._upload_latest_transactions,
+                                                     budget_name,
+                                                     self._service._get_accounts(accounts))
+
+    async def _upload_latest_transactions(self, budget_name, accounts):
+        if self._service.options.streaming:
+            return await self._run(self._service._stream_latest_transactions, budget_name, accounts)
+        self._logger.debug('Getting all latest transactions for the bank accounts')
+        bank_transactions = await self._gather_per_account(self._service._get_account_latest_transactions,
+                                                           accounts=accounts)
+        server_transactions = await self._run(self._service._get_server_transactions_for,
+                                              bank_transactions,
+                                              budget_name)
+        return await self.upload_transactions(self._service._difference(bank_transactions, server_transactions))
+
+    async def upload_all_missing_transactions(self, budget_name=None):
+        """Uploads all transactions missing from YNAB since the first transaction of the budget.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+
+        Returns:
+            result (UploadResult): The result of the upload
+
+        """
+        return await self._telemetry.run_cycle_async('upload_all_missing_transactions',
+                                                     self._upload_all_missing_transactions,
+                                                     budget_name)
+
+    async def _upload_all_missing_transactions(self, budget_name):
+        if self._service.options.streaming:
+            return await self._run(self._service.upload_all_missing_transactions, budget_name)
+        self._logger.debug('Getting all first Ynab transaction for marker date')
+        server_transactions = await self._run(self._service._get_all_budget_transactions, budget_name)
+        if not server_transactions:
+            self._logger.info('No transactions in the budget to get the first date from, nothing to upload')
+            return UploadResult()
+        first_date = min(transaction.date for transaction in server_transactions)
+        transactions = await self._gather_per_account(self._service._get_account_transactions_until, first_date)
+        self._logger.debug('Uploading all missing transactions to Ynab')
+        return await self.upload_transactions(self._service._difference(transactions, server_transactions))
+
+    async def backfill(self, budget_name=None, checkpoint_file=None, range_days=BACKFILL_RANGE_DAYS):
+        """Uploads all transactions missing from YNAB since the first transaction of the budget, range by range.
+
+        Args:
+            budget_name (str): The name of the budget to compare the transactions with
+            checkpoint_file (str): The path of the file to save the completed ranges on, None to not save them
+            range_days (int): The number of days of every range
+
+        Returns:
+            result (UploadResult): The result of the upload
+
+        """
+        return await self._run(self._service.backfill, budget_name, checkpoint_file, range_days)
+
+    async def upload_transactions(self, transactions):
+        """Uploads the provided transaction objects to YNAB, all chunks of all budgets concurrently.
+
+        Args:
+            transactions (list|Transaction): A list of transaction objects or a single transaction object
+
+        Returns:
+            result (UploadResult): The result per chunk, which evaluates to True if all chunks were uploaded
+
+        """
+        return await self._telemetry.run_cycle_async('upload_transactions',
+                                                     self._upload_transactions,
+                                                     transactions)
+
+    async def _upload_transactions(self, transactions):
+        if not transactions:
+            self._logger.debug('No transactions to upload')
+            return UploadResult()
+        chunks = self._service._uploader.batch_chunks(self._service._to_list(transactions))
+        self._logger.debug('Uploading all transactions in %s chunks', len(chunks))
+        results = await asyncio.gather(*[self._run(self._service._uploader.upload_chunk, budget_id, chunk_)
+                                         for budget_id, chunk_ in chunks])
+        return UploadResult(list(results))
@@ -52,3 +52,11 @@ class InvalidAccount(Exception):
 
 class MultipleBudgets(Exception):
     """There are multiple budgets on YNAB."""
+
+
+class MissingDependency(Exception):
+    """An optional dependency that is required for the feature is not installed."""
+
+
+class InvalidConfiguration(Exception):
+    """The configuration is not valid."""